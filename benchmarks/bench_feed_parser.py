@@ -0,0 +1,159 @@
+"""
+Benchmark the lxml fast-path feed parser against feedparser.
+
+The feeds listed in the metadata JSON files (i.e. the feeds we archive)
+are downloaded once, or read from a directory of saved feeds, and parsed
+with both parsers. The script reports the speedup and whether the fields
+used by `PromoteBlogPost._process_feed` are identical.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_feed_parser.py
+    python benchmarks/bench_feed_parser.py --save-dir /tmp/feeds
+    python benchmarks/bench_feed_parser.py --feeds-dir /tmp/feeds
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import feedparser
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+
+from helper.fetch_feed import fetch_feed_bounded  # noqa: E402
+from helper.parse_feed import (  # noqa: E402
+    UnsupportedFeedError,
+    parse_feed_fast,
+)
+from lxml import etree  # noqa: E402
+
+META_DATA_FILES = [
+    'metadata/pyladies_meta_data.json',
+    'metadata/rladies_meta_data.json',
+]
+FIELDS = ['title', 'link', 'published', 'id', 'category', 'summary']
+
+
+def feed_urls(meta_data_files):
+    """Collect all RSS feed URLs from the metadata JSON files."""
+    urls = []
+    for meta_data_file in meta_data_files:
+        with open(meta_data_file, encoding='utf-8') as f:
+            for feed in json.load(f):
+                urls.extend(url for url in feed['rss_feed'] or [] if url)
+    return sorted(set(urls))
+
+
+def file_name(url):
+    """Turn a feed URL into a file name for saved feeds."""
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}".strip('/').replace('/', '_') + '.xml'
+
+
+def load_bodies(args):
+    """Return a dict of feed name -> raw feed document."""
+    if args.feeds_dir:
+        return {
+            path.name: path.read_bytes()
+            for path in sorted(Path(args.feeds_dir).glob('*.xml'))
+        }
+
+    bodies = {}
+    for url in feed_urls(args.json_file):
+        try:
+            bodies[url] = fetch_feed_bounded(url)
+        except requests.RequestException as e:
+            print(f"Skipping {url}: {e}")
+            continue
+        if args.save_dir:
+            save_dir = Path(args.save_dir)
+            save_dir.mkdir(parents=True, exist_ok=True)
+            (save_dir / file_name(url)).write_bytes(bodies[url])
+    return bodies
+
+
+def best_of(func, body, repeat):
+    """Return the best wall time of `repeat` runs and the last result."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(body)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def compare(fast_entries, slow_entries):
+    """Count field mismatches between both parsers."""
+    mismatches = []
+    if len(fast_entries) != len(slow_entries):
+        mismatches.append(
+            f"entries: {len(fast_entries)} != {len(slow_entries)}"
+        )
+    for i, (fast, slow) in enumerate(zip(fast_entries, slow_entries)):
+        for field in FIELDS:
+            if fast.get(field) != slow.get(field):
+                mismatches.append(f"[{i}] {field}")
+        fast_tags = [tag['term'] for tag in fast.get('tags', [])]
+        slow_tags = [tag['term'] for tag in slow.get('tags', [])]
+        if fast_tags != slow_tags:
+            mismatches.append(f"[{i}] tags")
+        fast_media = [m['url'] for m in fast.get('media_content', [])]
+        slow_media = [m['url'] for m in slow.get('media_content', [])]
+        if fast_media != slow_media:
+            mismatches.append(f"[{i}] media_content")
+    return mismatches
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--json-file', nargs='+', default=META_DATA_FILES)
+    parser.add_argument('--feeds-dir', help='Read saved feeds (*.xml)')
+    parser.add_argument('--save-dir', help='Save downloaded feeds here')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    bodies = load_bodies(args)
+
+    total_fast = total_slow = 0.0
+    fallbacks = 0
+    feeds_with_mismatches = 0
+
+    print(f"{'feed':60} {'entries':>7} {'fast ms':>9} "
+          f"{'feedparser ms':>14} {'speedup':>8}  parity")
+    for name, body in bodies.items():
+        slow_time, slow = best_of(feedparser.parse, body, args.repeat)
+        try:
+            fast_time, fast = best_of(parse_feed_fast, body, args.repeat)
+        except (etree.XMLSyntaxError, UnsupportedFeedError) as e:
+            fallbacks += 1
+            print(f"{name[:60]:60} fallback to feedparser ({e})")
+            continue
+
+        total_fast += fast_time
+        total_slow += slow_time
+        mismatches = compare(fast, slow.entries)
+        if mismatches:
+            feeds_with_mismatches += 1
+        print(
+            f"{name[:60]:60} {len(fast):>7} {fast_time * 1000:>9.2f} "
+            f"{slow_time * 1000:>14.2f} {slow_time / fast_time:>7.1f}x  "
+            f"{'ok' if not mismatches else ', '.join(mismatches[:5])}"
+        )
+
+    print('')
+    print(f"Feeds: {len(bodies)} (fallbacks: {fallbacks}, "
+          f"with mismatches: {feeds_with_mismatches})")
+    if total_fast:
+        print(f"Total: fast {total_fast * 1000:.1f} ms, feedparser "
+              f"{total_slow * 1000:.1f} ms, speedup "
+              f"{total_slow / total_fast:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
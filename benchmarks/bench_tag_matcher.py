@@ -0,0 +1,132 @@
+"""
+Benchmark the facet-based tag matcher against the old split() matcher.
+
+Posts are read from recorded `app.bsky.feed.searchPosts` responses (JSON
+files with a `posts` list) or, without recordings, generated. Each post
+is matched against the followed tags with both matchers. The script
+reports the timings and the posts on which the matchers disagree.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_tag_matcher.py --tags pyladies python
+    python benchmarks/bench_tag_matcher.py --search-file search.json
+
+A search response can be recorded with the Bluesky client:
+
+    client.app.bsky.feed.search_posts(params={'q': 'pyladies'}).model_dump_json()
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+
+from helper.match_tags import matching_tags, tag_set  # noqa: E402
+
+WORDS = ['community', 'meetup', 'talk', 'slides', 'data', 'welcome',
+         'conference', 'package', 'release', 'workshop']
+TEXT_TAGS = ['#pyladies', '#PyLadies!', '(#python)', '#rstats,',
+             '#RLadies', '#python3', '#100DaysOfCode', '#datascience.']
+
+
+def load_records(search_files):
+    """Return the post records of recorded search responses."""
+    records = []
+    for search_file in search_files:
+        with open(search_file, encoding='utf-8') as f:
+            records.extend(post['record'] for post in json.load(f)['posts'])
+    return records
+
+
+def generate_records(count, seed=0):
+    """Generate post records, half of them with tag facets."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        text_tags = rng.sample(TEXT_TAGS, rng.randint(0, 3))
+        words = rng.sample(WORDS, 6) + text_tags
+        rng.shuffle(words)
+        record = {'text': ' '.join(words)}
+        if i % 2:
+            record['facets'] = [
+                {'features': [{
+                    '$type': 'app.bsky.richtext.facet#tag',
+                    'tag': tag.strip('#(),.!'),
+                }]}
+                for tag in text_tags
+            ]
+        records.append(record)
+    return records
+
+
+def split_matcher(record, tags):
+    """The matcher BoostTags used before: one split() per configured tag."""
+    matches = set()
+    for tag in tags:
+        tags_in_post = {
+            t.strip("#").lower()
+            for t in record['text'].split()
+            if t.startswith("#")
+        }
+        if tag.lower() in tags_in_post:
+            matches.add(tag.lower())
+    return frozenset(matches)
+
+
+def best_of(func, repeat):
+    """Return the best wall time of `repeat` runs and the last result."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--search-file', nargs='+', default=[],
+                        help='Recorded searchPosts responses (JSON)')
+    parser.add_argument('--tags', nargs='+',
+                        default=['pyladies', 'python', 'rstats', 'rladies'])
+    parser.add_argument('--posts', type=int, default=10_000,
+                        help='Number of generated posts without recordings')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    records = (load_records(args.search_file) if args.search_file
+               else generate_records(args.posts))
+    followed = tag_set(args.tags)
+
+    old_time, old = best_of(
+        lambda: [split_matcher(record, args.tags) for record in records],
+        args.repeat
+    )
+    new_time, new = best_of(
+        lambda: [matching_tags(record, followed) for record in records],
+        args.repeat
+    )
+
+    differences = [
+        (record['text'], sorted(old_tags), sorted(new_tags))
+        for record, old_tags, new_tags in zip(records, old, new)
+        if old_tags != new_tags
+    ]
+    print(f"Posts: {len(records)}, tags: {len(args.tags)}")
+    print(f"split() matcher: {old_time * 1000:.1f} ms, "
+          f"matched {sum(map(bool, old))}")
+    print(f"facet matcher:   {new_time * 1000:.1f} ms, "
+          f"matched {sum(map(bool, new))}")
+    print(f"Speedup: {old_time / new_time:.1f}x")
+    print(f"Posts matched differently: {len(differences)}")
+    for text, old_tags, new_tags in differences[:10]:
+        print(f"  {text[:60]!r}: {old_tags} -> {new_tags}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,881 @@
+"""
+Local stand-ins for the Bluesky XRPC and Mastodon APIs the bots use.
+
+One HTTP server answers both APIs, plus the blog feeds and images the
+bots download, so the bots can be run end to end without posting to
+real accounts:
+
+    Bluesky (base_url http://HOST:PORT/xrpc)
+        com.atproto.server.createSession / getSession / refreshSession
+        com.atproto.identity.resolveHandle
+        com.atproto.repo.uploadBlob / createRecord / applyWrites
+        app.bsky.actor.getProfile
+        app.bsky.feed.searchPosts / getPosts / getTimeline
+        app.bsky.notification.listNotifications / updateSeen
+    Mastodon (api_base_url http://HOST:PORT)
+        /api/v1/apps, /oauth/token, /api/v1/accounts/verify_credentials
+        /api/v1/statuses (+ /reblog, /favourite), /api/v1|v2/media
+        /api/v1/notifications, /api/v1/timelines/tag/<tag>
+    Blogs
+        /feeds/rss.xml, /feeds/atom.xml   fixture feeds linking back here
+        /blog/...                         pages and images of the feeds
+
+Posts, notifications and statuses are built from the benchmark fixtures
+(benchmarks/fixtures), repeated up to `--posts` entries. Every response
+can be delayed (`--latency`, `--jitter`, per endpoint with
+`--endpoint-latency`), a share of requests fails with a 5xx error
+(`--error-rate`), and each token gets a request budget per window that is
+announced in `ratelimit-*` (Bluesky) and `X-RateLimit-*` (Mastodon)
+headers and answered with 429 once it is used up (`--rate-limit`,
+`--window`). GET /_stats returns the per-endpoint request statistics,
+POST /_reset clears them.
+
+Usage (from the repository root):
+
+    python benchmarks/fake_servers.py --port 8080 --latency 0.05 \\
+        --error-rate 0.01 --rate-limit 3000 --window 300
+"""
+import argparse
+import base64
+import copy
+import hashlib
+import json
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+POSTS = 500
+MASTODON_DOMAIN = 'example.social'
+MASTODON_ID_BASE = 113_000_000_000_000_000
+SCOPES = 'read write follow push'
+BLOG_HOSTS = ['https://example-blog.org', 'https://example-quarto.org']
+# 1x1 transparent PNG served for every image of the fake blogs
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk'
+    '+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+TAG_PATTERN = re.compile(r'#(\w+)')
+
+
+def default_options():
+    """Options of a server without latency, errors or rate limits."""
+    return {
+        'latency': 0.0,
+        'jitter': 0.0,
+        'endpoint_latency': {},
+        'error_rate': 0.0,
+        'rate_limit': None,
+        'window': 300,
+        'posts': POSTS,
+        'seed': 2024,
+    }
+
+
+def _b64url(data: dict) -> str:
+    raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def fake_jwt(did: str, scope: str, lifetime: int) -> str:
+    """Unsigned JWT with the claims the atproto client reads."""
+    now = int(time.time())
+    header = _b64url({'typ': 'at+jwt', 'alg': 'ES256K'})
+    payload = _b64url({
+        'scope': scope,
+        'sub': did,
+        'iat': now,
+        'exp': now + lifetime,
+        'jti': hashlib.sha256(f'{did}{now}{random.random()}'.encode())
+        .hexdigest()[:16],
+    })
+    return f'{header}.{payload}.c2lnbmF0dXJl'
+
+
+def jwt_subject(token: str) -> str:
+    """DID a fake JWT was issued to ('' for other tokens)."""
+    if token.count('.') != 2:
+        return ''
+    payload = token.split('.')[1]
+    raw = base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4))
+    return json.loads(raw).get('sub', '')
+
+
+def did_for(handle: str) -> str:
+    """Stable DID of a handle."""
+    digest = hashlib.sha256(handle.lower().encode('utf-8')).hexdigest()
+    return f'did:plc:{digest[:24]}'
+
+
+def fake_cid(*parts) -> str:
+    """CID-shaped identifier derived from `parts`."""
+    digest = hashlib.sha256(
+        '/'.join(str(part) for part in parts).encode('utf-8')
+    ).hexdigest()
+    return f'bafyrei{digest[:52]}'
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of `values` (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Corpus:
+    """
+    Posts, notifications and statuses served by the fake APIs, built
+    from the fixtures and repeated with unique URIs up to `size` entries.
+
+    Args:
+        size (int): Number of posts (and of statuses).
+    """
+    def __init__(self, size=POSTS):
+        with open(FIXTURES_DIR / 'search_posts.json', encoding='utf-8') as f:
+            posts = json.load(f)['posts']
+        with open(FIXTURES_DIR / 'notifications.json', encoding='utf-8') as f:
+            notifications = json.load(f)['notifications']
+
+        start = datetime.fromisoformat(posts[0]['indexedAt'])
+        self.posts = [
+            self._copy_entry(posts, i, start, 'app.bsky.feed.post')
+            for i in range(size)
+        ]
+        self.notifications = [
+            self._copy_entry(notifications, i, start, 'app.bsky.feed.post')
+            for i in range(size)
+        ]
+        self.posts_by_uri = {post['uri']: post for post in self.posts}
+        self.statuses = [
+            self._status(post, size - i) for i, post in enumerate(self.posts)
+        ]
+        self.mastodon_notifications = [
+            {
+                'id': status['id'],
+                'type': 'mention',
+                'created_at': status['created_at'],
+                'account': status['account'],
+                'status': status,
+            }
+            for status in self.statuses
+        ]
+
+    @staticmethod
+    def _copy_entry(entries, i, start, collection):
+        """Copy of `entries[i % len]` with a unique URI, CID and time."""
+        entry = copy.deepcopy(entries[i % len(entries)])
+        if i >= len(entries):
+            did = entry['author']['did']
+            entry['uri'] = f'at://{did}/{collection}/3x{i:011d}'
+            entry['cid'] = fake_cid(entry['uri'])
+        indexed_at = (start - timedelta(minutes=3 * i)).isoformat()
+        entry['indexedAt'] = indexed_at
+        entry['record']['createdAt'] = indexed_at
+        return entry
+
+    @staticmethod
+    def _status(post, number):
+        """Mastodon status with the text and tags of a Bluesky post."""
+        status_id = str(MASTODON_ID_BASE + number)
+        username = post['author']['handle'].split('.')[0]
+        text = post['record']['text']
+        return {
+            'id': status_id,
+            'uri': f'https://{MASTODON_DOMAIN}/users/{username}/statuses/'
+                   f'{status_id}',
+            'url': f'https://{MASTODON_DOMAIN}/@{username}/{status_id}',
+            'created_at': post['indexedAt'],
+            'content': f'<p>{text}</p>',
+            'visibility': 'public',
+            'sensitive': False,
+            'spoiler_text': '',
+            'language': 'en',
+            'favourited': False,
+            'reblogged': False,
+            'reblogs_count': post['repostCount'],
+            'favourites_count': post['likeCount'],
+            'replies_count': post['replyCount'],
+            'media_attachments': [],
+            'mentions': [],
+            'emojis': [],
+            'tags': [
+                {'name': tag.lower(),
+                 'url': f'https://{MASTODON_DOMAIN}/tags/{tag.lower()}'}
+                for tag in TAG_PATTERN.findall(text)
+            ],
+            'account': {
+                'id': str(int(fake_cid(username)[7:15], 16)),
+                'username': username,
+                'acct': f'{username}@{MASTODON_DOMAIN}',
+                'display_name': post['author']['displayName'],
+                'url': f'https://{MASTODON_DOMAIN}/@{username}',
+                'created_at': '2023-01-01T00:00:00.000Z',
+                'bot': False,
+                'locked': False,
+            },
+        }
+
+
+class FakeApi:
+    """
+    Request handling of the fake APIs, independent of the HTTP server.
+
+    Args:
+        options (dict): See `default_options()`.
+    """
+    def __init__(self, options=None):
+        self.options = {**default_options(), **(options or {})}
+        self.corpus = Corpus(self.options['posts'])
+        self.random = random.Random(self.options['seed'])
+        self.lock = threading.Lock()
+        self.base_url = ''
+        self.reset()
+
+    def reset(self):
+        """Forget created records, budgets and statistics."""
+        with self.lock:
+            self.counter = 0
+            self.records = {}  # did -> number of created records
+            self.reposts = {}  # did -> reposted subject URIs
+            self.boosts = {}  # token -> reblogged / favourited status ids
+            self.media = {}
+            self.budgets = {}  # token -> [window start, requests]
+            self.timings = {}  # endpoint -> [seconds]
+            self.statuses = {}  # endpoint -> {status code: count}
+
+    def next_id(self):
+        """Unique increasing number."""
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    # Cross-cutting behaviour ---------------------------------------------
+
+    def delay(self, endpoint):
+        """Sleep for the configured latency of `endpoint`."""
+        latency = self.options['endpoint_latency'].get(
+            endpoint, self.options['latency']
+        )
+        jitter = self.options['jitter']
+        with self.lock:
+            latency += self.random.uniform(0, jitter) if jitter else 0.0
+        if latency > 0:
+            time.sleep(latency)
+
+    def injected_error(self):
+        """5xx status code for a failing request, None otherwise."""
+        if not self.options['error_rate']:
+            return None
+        with self.lock:
+            if self.random.random() >= self.options['error_rate']:
+                return None
+            return self.random.choice([500, 502, 503])
+
+    def take_budget(self, token):
+        """
+        Count a request against the budget of `token`.
+
+        Returns:
+            tuple: (allowed, limit, remaining, reset) with `reset` the
+                Unix time the window ends; None if there is no limit.
+        """
+        limit = self.options['rate_limit']
+        if not limit:
+            return None
+        window = self.options['window']
+        now = time.time()
+        with self.lock:
+            budget = self.budgets.setdefault(token, [now, 0])
+            if now - budget[0] >= window:
+                budget[0], budget[1] = now, 0
+            allowed = budget[1] < limit
+            if allowed:
+                budget[1] += 1
+            return allowed, limit, limit - budget[1], budget[0] + window
+
+    def record(self, endpoint, status, seconds):
+        """Add a request to the statistics."""
+        with self.lock:
+            self.timings.setdefault(endpoint, []).append(seconds)
+            counts = self.statuses.setdefault(endpoint, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def stats(self):
+        """Per-endpoint request count, status codes and latency."""
+        with self.lock:
+            return {
+                endpoint: {
+                    'requests': len(timings),
+                    'statuses': {
+                        str(code): count for code, count
+                        in sorted(self.statuses[endpoint].items())
+                    },
+                    'mean_seconds': statistics.fmean(timings),
+                    'p50_seconds': percentile(timings, 0.50),
+                    'p95_seconds': percentile(timings, 0.95),
+                    'p99_seconds': percentile(timings, 0.99),
+                }
+                for endpoint, timings in sorted(self.timings.items())
+            }
+
+    # Bluesky -------------------------------------------------------------
+
+    def _session(self, identifier):
+        did = did_for(identifier)
+        return {
+            'accessJwt': fake_jwt(did, 'com.atproto.access', 2 * 60 * 60),
+            'refreshJwt': fake_jwt(did, 'com.atproto.refresh', 24 * 60 * 60),
+            'handle': identifier,
+            'did': did,
+            'active': True,
+        }
+
+    @staticmethod
+    def _page(items, query, default_limit=50):
+        """Offset-paginated slice of `items` and the next cursor."""
+        limit = int(query.get('limit', [default_limit])[0])
+        offset = int(query.get('cursor', ['0'])[0] or 0)
+        page = items[offset:offset + limit]
+        cursor = str(offset + limit) if offset + limit < len(items) else None
+        return page, cursor
+
+    def _with_viewer(self, post, did):
+        """Post with the viewer state of the account `did`."""
+        with self.lock:
+            reposted = post['uri'] in self.reposts.get(did, ())
+        if not reposted:
+            return post
+        return {
+            **post,
+            'viewer': {'repost': f'at://{did}/app.bsky.feed.repost/x'},
+        }
+
+    def _create(self, did, collection, record):
+        """Store a record and return its strong reference."""
+        number = self.next_id()
+        uri = f'at://{did}/{collection}/3z{number:011d}'
+        with self.lock:
+            self.records[did] = self.records.get(did, 0) + 1
+            if collection == 'app.bsky.feed.repost':
+                self.reposts.setdefault(did, set()).add(
+                    record['subject']['uri']
+                )
+        return {'uri': uri, 'cid': fake_cid(uri)}
+
+    def bluesky(self, method, nsid, query, body, did):
+        """
+        Answer an XRPC request.
+
+        Returns:
+            tuple: (status code, JSON payload or None)
+        """
+        posts = self.corpus.posts
+        if nsid == 'com.atproto.server.createSession':
+            return 200, self._session(body['identifier'])
+        if nsid in ('com.atproto.server.refreshSession',
+                    'com.atproto.server.getSession'):
+            handle = f"{did.rsplit(':', 1)[-1]}.bsky.social"
+            return 200, {**self._session(handle), 'did': did}
+        if nsid == 'com.atproto.identity.resolveHandle':
+            return 200, {'did': did_for(query['handle'][0])}
+        if nsid == 'app.bsky.actor.getProfile':
+            actor = query['actor'][0]
+            return 200, {
+                'did': actor if actor.startswith('did:') else did_for(actor),
+                'handle': actor,
+                'displayName': actor.split('.')[0],
+            }
+        if nsid == 'com.atproto.repo.uploadBlob':
+            return 200, {'blob': {
+                '$type': 'blob',
+                'ref': {'$link': fake_cid('blob', self.next_id())},
+                'mimeType': 'image/png',
+                'size': len(body or b''),
+            }}
+        if nsid == 'com.atproto.repo.createRecord':
+            return 200, self._create(did, body['collection'], body['record'])
+        if nsid == 'com.atproto.repo.applyWrites':
+            return 200, {'results': [
+                {
+                    '$type': 'com.atproto.repo.applyWrites#createResult',
+                    **self._create(did, write['collection'], write['value']),
+                }
+                for write in body['writes']
+            ]}
+        if nsid == 'app.bsky.feed.searchPosts':
+            tags = [tag.lower() for tag in query.get('tag', [])]
+            q = query.get('q', [''])[0].lower().lstrip('#')
+            terms = tags or [q]
+            matches = [
+                post for post in posts
+                if any(f'#{term}' in post['record']['text'].lower()
+                       for term in terms)
+            ]
+            page, cursor = self._page(matches, query, 25)
+            return 200, {
+                'posts': [self._with_viewer(post, did) for post in page],
+                'hitsTotal': len(matches),
+                'cursor': cursor,
+            }
+        if nsid == 'app.bsky.feed.getPosts':
+            return 200, {'posts': [
+                self._with_viewer(self.corpus.posts_by_uri[uri], did)
+                for uri in query.get('uris', [])
+                if uri in self.corpus.posts_by_uri
+            ]}
+        if nsid == 'app.bsky.feed.getTimeline':
+            page, cursor = self._page(posts, query)
+            return 200, {
+                'feed': [{'post': self._with_viewer(post, did)}
+                         for post in page],
+                'cursor': cursor,
+            }
+        if nsid == 'app.bsky.notification.listNotifications':
+            reasons = query.get('reasons', [])
+            notifications = [
+                notification for notification in self.corpus.notifications
+                if not reasons or notification['reason'] in reasons
+            ]
+            page, cursor = self._page(notifications, query)
+            return 200, {'notifications': page, 'cursor': cursor}
+        if nsid == 'app.bsky.notification.updateSeen':
+            return 200, None
+        return 501, {
+            'error': 'MethodNotImplemented',
+            'message': f'{nsid} is not implemented by the fake server',
+        }
+
+    # Mastodon ------------------------------------------------------------
+
+    @staticmethod
+    def _newer_page(items, query, default_limit):
+        """
+        Page of items (newest first) as Mastodon pages with `min_id`
+        (the oldest items newer than it) or `max_id`.
+        """
+        limit = int(query.get('limit', [default_limit])[0])
+        min_id = query.get('min_id', [None])[0]
+        max_id = query.get('max_id', [None])[0]
+        if max_id:
+            items = [item for item in items if int(item['id']) < int(max_id)]
+        if min_id:
+            newer = [item for item in items if int(item['id']) > int(min_id)]
+            return newer[-limit:]
+        return items[:limit]
+
+    def _status_for(self, status, token):
+        """Status with the reblogged/favourited state of `token`."""
+        with self.lock:
+            done = self.boosts.get(token, {})
+            reblogged = status['id'] in done.get('reblog', ())
+            favourited = status['id'] in done.get('favourite', ())
+        if not (reblogged or favourited):
+            return status
+        return {**status, 'reblogged': reblogged, 'favourited': favourited}
+
+    @staticmethod
+    def _account(token):
+        """Account of the bot logged in with `token`."""
+        digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        username = f'bot{digest[:6]}'
+        return {
+            'id': str(int(digest[6:14], 16)),
+            'username': username,
+            'acct': username,
+            'display_name': username,
+            'url': f'https://{MASTODON_DOMAIN}/@{username}',
+            'created_at': '2023-01-01T00:00:00.000Z',
+            'bot': True,
+            'locked': False,
+        }
+
+    def _media(self, media_id):
+        return {
+            'id': media_id,
+            'type': 'image',
+            'url': f'{self.base_url}/blog/media/{media_id}.png',
+            'preview_url': f'{self.base_url}/blog/media/{media_id}.png',
+            'description': None,
+        }
+
+    def mastodon(self, method, path, query, token):
+        """
+        Answer a Mastodon API request.
+
+        Returns:
+            tuple: (status code, JSON payload)
+        """
+        parts = path.strip('/').split('/')
+        statuses = self.corpus.statuses
+        if path == '/api/v1/apps':
+            number = self.next_id()
+            return 200, {
+                'id': str(number),
+                'name': 'community-bot',
+                'client_id': f'client-{number}',
+                'client_secret': f'secret-{number}',
+                'redirect_uri': 'urn:ietf:wg:oauth:2.0:oob',
+            }
+        if path == '/oauth/token':
+            return 200, {
+                'access_token': f'token-{self.next_id()}',
+                'token_type': 'Bearer',
+                'scope': SCOPES,
+                'created_at': int(time.time()),
+            }
+        if path == '/api/v1/accounts/verify_credentials':
+            return 200, self._account(token)
+        if path in ('/api/v1/instance', '/api/v2/instance'):
+            return 200, {
+                'uri': MASTODON_DOMAIN,
+                'domain': MASTODON_DOMAIN,
+                'title': 'Fake Mastodon',
+                'version': '4.3.0',
+                'api_versions': {'mastodon': 2},
+            }
+        if parts[:3] == ['api', 'v1', 'timelines'] and len(parts) == 5:
+            tags = {parts[4].lower()} | {
+                tag.lower() for tag in query.get('any[]', [])
+            }
+            matches = [
+                status for status in statuses
+                if tags & {tag['name'] for tag in status['tags']}
+            ]
+            return 200, [
+                self._status_for(status, token)
+                for status in self._newer_page(matches, query, 20)
+            ]
+        if path == '/api/v1/notifications':
+            return 200, [
+                {**notification,
+                 'status': self._status_for(notification['status'], token)}
+                for notification in self._newer_page(
+                    self.corpus.mastodon_notifications, query, 40
+                )
+            ]
+        if path == '/api/v1/statuses' and method == 'POST':
+            number = self.next_id()
+            status_id = str(MASTODON_ID_BASE * 2 + number)
+            return 200, {
+                **statuses[0],
+                'id': status_id,
+                'uri': f'https://{MASTODON_DOMAIN}/statuses/{status_id}',
+                'url': f'https://{MASTODON_DOMAIN}/@bot/{status_id}',
+                'account': self._account(token),
+                'tags': [],
+            }
+        if parts[:3] == ['api', 'v1', 'statuses'] and len(parts) == 5:
+            status_id, action = parts[3], parts[4]
+            status = next(
+                (status for status in statuses if status['id'] == status_id),
+                None
+            )
+            if status is None or action not in ('reblog', 'favourite'):
+                return 404, {'error': 'Record not found'}
+            with self.lock:
+                self.boosts.setdefault(token, {}).setdefault(
+                    action, set()
+                ).add(status_id)
+            return 200, self._status_for(status, token)
+        if path in ('/api/v1/media', '/api/v2/media') and method == 'POST':
+            media = self._media(str(self.next_id()))
+            with self.lock:
+                self.media[media['id']] = media
+            return 200, media
+        if parts[:3] == ['api', 'v1', 'media'] and len(parts) == 4:
+            with self.lock:
+                media = self.media.get(parts[3])
+            if media is None:
+                return 404, {'error': 'Record not found'}
+            return 200, media
+        return 404, {'error': 'Record not found'}
+
+    # Blogs ---------------------------------------------------------------
+
+    def blog(self, path):
+        """
+        Feeds and pages of the fake blogs.
+
+        Returns:
+            tuple: (status code, content type, body)
+        """
+        if path.startswith('/feeds/'):
+            fixture = FIXTURES_DIR / Path(path).name
+            if fixture.suffix != '.xml' or not fixture.is_file():
+                return 404, 'text/plain', b'Not found'
+            body = fixture.read_text(encoding='utf-8')
+            for host in BLOG_HOSTS:
+                body = body.replace(host, f'{self.base_url}/blog')
+            return 200, 'application/rss+xml', body.encode('utf-8')
+        if path.endswith(('.png', '.jpg', '.jpeg')):
+            return 200, 'image/png', PNG
+        return 200, 'text/html', b'<html><body>Blog post</body></html>'
+
+
+class Handler(BaseHTTPRequestHandler):
+    """HTTP front end of a `FakeApi` (`server.api`)."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self._handle('GET')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self._handle('POST')
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _token(self):
+        authorization = self.headers.get('Authorization', '')
+        return authorization.removeprefix('Bearer ') or self.client_address[0]
+
+    def _send(self, status, payload=None, content_type='application/json',
+              headers=None):
+        if isinstance(payload, bytes):
+            body = payload
+        elif payload is None:
+            # Procedures without output answer with an empty body
+            body, content_type = b'', None
+        else:
+            body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        api = self.server.api
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        url = url._replace(path=url.path.rstrip('/') or '/')
+        query = parse_qs(url.query)
+        body = self._read_body()
+
+        if url.path == '/_stats':
+            self._send(200, api.stats())
+            return
+        if url.path == '/_reset' and method == 'POST':
+            api.reset()
+            self._send(200, {})
+            return
+
+        if url.path.startswith('/xrpc/'):
+            platform = 'bluesky'
+            endpoint = url.path.removeprefix('/xrpc/')
+        elif url.path.startswith(('/api/', '/oauth/', '/.well-known/')):
+            platform = 'mastodon'
+            endpoint = re.sub(r'/\d+', '/:id', url.path)
+            endpoint = re.sub(r'(/timelines/tag)/[^/]+', r'\1/:tag', endpoint)
+        else:
+            platform = 'blog'
+            endpoint = 'feeds' if url.path.startswith('/feeds/') else 'blog'
+
+        api.delay(endpoint)
+        status = self._respond(api, platform, method, endpoint, url.path,
+                               query, body)
+        api.record(f'{platform} {endpoint}', status,
+                   time.perf_counter() - start)
+
+    def _respond(self, api, platform, method, endpoint, path, query, body):
+        """Send the response and return its status code."""
+        if platform == 'blog':
+            status, content_type, payload = api.blog(path)
+            self._send(status, payload, content_type)
+            return status
+
+        token = self._token()
+        headers = {}
+        budget = api.take_budget(token)
+        if budget is not None:
+            allowed, limit, remaining, reset = budget
+            if platform == 'bluesky':
+                headers = {
+                    'ratelimit-limit': str(limit),
+                    'ratelimit-remaining': str(remaining),
+                    'ratelimit-reset': str(int(reset)),
+                    'ratelimit-policy': f"{limit};w={api.options['window']}",
+                }
+            else:
+                headers = {
+                    'X-RateLimit-Limit': str(limit),
+                    'X-RateLimit-Remaining': str(remaining),
+                    'X-RateLimit-Reset': datetime.fromtimestamp(
+                        reset, timezone.utc
+                    ).isoformat(),
+                }
+            if not allowed:
+                headers['Retry-After'] = str(max(1, int(reset - time.time())))
+                self._send(429, {
+                    'error': 'RateLimitExceeded',
+                    'message': 'Rate Limit Exceeded',
+                }, headers=headers)
+                return 429
+
+        error = api.injected_error()
+        if error is not None:
+            self._send(error, {
+                'error': 'InternalServerError',
+                'message': 'Injected failure',
+            }, headers=headers)
+            return error
+
+        if platform == 'bluesky':
+            did = jwt_subject(token)
+            if endpoint != 'com.atproto.repo.uploadBlob' and body:
+                body = json.loads(body)
+            status, payload = api.bluesky(method, endpoint, query, body, did)
+        else:
+            if body and path != '/api/v1/media' and path != '/api/v2/media':
+                query = {**query, **self._form(body)}
+            status, payload = api.mastodon(method, path, query, token)
+        self._send(status, payload, headers=headers)
+        return status
+
+    def _form(self, body):
+        """Parameters of a form or JSON encoded request body."""
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('application/json'):
+            return {
+                key: value if isinstance(value, list) else [value]
+                for key, value in json.loads(body).items()
+            }
+        return parse_qs(body.decode('utf-8'))
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threading HTTP server that ignores clients closing connections."""
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeServer:
+    """
+    Fake APIs served from a background thread.
+
+    Args:
+        options (dict): See `default_options()`.
+        host (str): Interface to listen on.
+        port (int): Port (0 picks a free one).
+    """
+    def __init__(self, options=None, host='127.0.0.1', port=0):
+        self.api = FakeApi(options)
+        self.httpd = QuietHTTPServer((host, port), Handler)
+        self.httpd.api = self.api
+        self.url = f'http://{host}:{self.httpd.server_address[1]}'
+        self.api.base_url = self.url
+        self.thread = None
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_endpoint_latency(values):
+    """Parse `ENDPOINT=SECONDS` pairs."""
+    latencies = {}
+    for value in values or []:
+        endpoint, _, seconds = value.partition('=')
+        latencies[endpoint] = float(seconds)
+    return latencies
+
+
+def add_server_arguments(parser):
+    """Add the options of the fake server to an argument parser."""
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds every response is delayed')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Additional random delay of up to SECONDS')
+    parser.add_argument(
+        '--endpoint-latency',
+        nargs='+',
+        metavar='ENDPOINT=SECONDS',
+        help='Latency of single endpoints, e.g. '
+             'com.atproto.repo.uploadBlob=0.5 /api/v2/media=0.8',
+    )
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Share of requests failing with a 5xx error')
+    parser.add_argument('--rate-limit', type=int,
+                        help='Requests per token and window (default: none)')
+    parser.add_argument('--window', type=int, default=300,
+                        help='Rate limit window in seconds')
+    parser.add_argument('--posts', type=int, default=POSTS,
+                        help='Posts, notifications and statuses served')
+    parser.add_argument('--seed', type=int, default=2024)
+
+
+def server_options(args):
+    """Server options from parsed `add_server_arguments` arguments."""
+    return {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'endpoint_latency': parse_endpoint_latency(args.endpoint_latency),
+        'error_rate': args.error_rate,
+        'rate_limit': args.rate_limit,
+        'window': args.window,
+        'posts': args.posts,
+        'seed': args.seed,
+    }
+
+
+def main():
+    """Serve the fake APIs until interrupted."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeServer(server_options(args), args.host, args.port)
+    print(f"Bluesky base_url:      {server.url}/xrpc")
+    print(f"Mastodon api_base_url: {server.url}")
+    print(f"Feeds:                 {server.url}/feeds/rss.xml, "
+          f"{server.url}/feeds/atom.xml")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""
+Load test of the bots against the local fake APIs (fake_servers.py).
+
+Runs PromoteBlogPost, BoostTags and BoostMentions on Bluesky and
+Mastodon end to end: `--accounts` bot accounts work in parallel and each
+of them runs the bot `--runs` times (every run with its own state, so
+each run finds new posts). Per scenario the harness reports
+
+- the throughput (runs and API requests per second),
+- the latency of whole runs (p50 / p95 / p99),
+- per endpoint the number of requests, the status codes and the server
+  side latency (p50 / p95 / p99), including the injected delay.
+
+Session caches, state, archives and downloaded images are written to a
+temporary directory, and the bots only talk to the fake server. By
+default the server is started in-process with the latency, error rate
+and rate limit given here; `--url` targets a server started separately
+with `python benchmarks/fake_servers.py`.
+
+The bots' client-side rate limiters are lifted by default, so that the
+server (`--rate-limit`) decides when requests are throttled; `--paced`
+keeps the default budgets (Mastodon allows one write per second, so
+boosting runs take minutes).
+
+Usage (from the repository root):
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --scenarios boost_tags --platforms bluesky \\
+        --accounts 8 --runs 5 --latency 0.05 --jitter 0.05 --error-rate 0.02
+    python benchmarks/load_test.py --rate-limit 100 --window 10 \\
+        --output load.json
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'src'))
+
+from fake_servers import (  # noqa: E402
+    FakeServer,
+    add_server_arguments,
+    percentile,
+    server_options,
+)
+
+SCENARIOS = ['promote_blog', 'boost_tags', 'boost_mentions']
+PLATFORMS = ['bluesky', 'mastodon']
+TAGS = ['rladies', 'pyladies', 'rstats', 'python']
+FEEDS = ['rss', 'atom']
+UNPACED_LIMIT = (1000.0, 1000)  # requests per second, burst
+
+
+def import_bots():
+    """
+    Import the bots. The session cache and state directories are read
+    when the helpers are imported, so this runs after they were set.
+    """
+    return {
+        'promote_blog': importlib.import_module('promote_blog_post')
+        .PromoteBlogPost,
+        'boost_tags': importlib.import_module('boost_tags').BoostTags,
+        'boost_mentions': importlib.import_module('boost_mentions')
+        .BoostMentions,
+    }
+
+
+def unpace():
+    """Lift the client-side budgets of the bots' rate limiters."""
+    rate_limit = importlib.import_module('helper.rate_limit')
+    for limits in rate_limit.DEFAULT_LIMITS.values():
+        for endpoint_class in limits:
+            limits[endpoint_class] = UNPACED_LIMIT
+
+
+def write_blogs(server_url, blogs):
+    """
+    Write the metadata file PromoteBlogPost reads, listing `blogs` blogs
+    whose feeds are served by the fake server.
+    """
+    Path('metadata').mkdir(exist_ok=True)
+    feeds = [
+        {
+            'name': f'Blog {i}',
+            'rss_feed': [f'{server_url}/feeds/{FEEDS[i % len(FEEDS)]}.xml'],
+            'bluesky': f'blog{i}.bsky.social',
+            'mastodon': f'@blog{i}@example.social',
+        }
+        for i in range(blogs)
+    ]
+    with open('metadata/load_meta_data.json', 'w', encoding='utf-8') as f:
+        json.dump(feeds, f, indent=2)
+
+
+def bot_config(scenario, platform, server_url, account, run):
+    """Configuration of one bot run against the fake server."""
+    config = importlib.import_module('config')
+    config_dict = {
+        'platform': platform,
+        'client_name': f'load{account}_run{run}',
+        'username': (
+            f'load{account}.bsky.social' if platform == 'bluesky'
+            else f'load{account}'
+        ),
+        'password': 'load-test',
+    }
+    if platform == 'bluesky':
+        config_dict['base_url'] = f'{server_url}/xrpc'
+        config_dict['api_base_url'] = 'bluesky'
+    else:
+        config_dict['api_base_url'] = server_url
+        config_dict['mastodon_visibility'] = config.MASTODON_VISIBILITY
+        config_dict['boost_workers'] = config.BOOST_WORKERS
+
+    if scenario == 'promote_blog':
+        counter = f'metadata/load{account}_counter.txt'
+        if not Path(counter).exists():
+            Path(counter).write_text('', encoding='utf-8')
+        config_dict.update({
+            'archive': f'load{account}_run{run}',
+            'images': 'images',
+            'counter': counter,
+            'json_file': 'metadata/load_meta_data.json',
+            'gen_ai_support': False,
+            'feed_max_bytes': config.FEED_MAX_BYTES,
+            'feed_max_entries': config.FEED_MAX_ENTRIES,
+        })
+    elif scenario == 'boost_tags':
+        config_dict.update({
+            'tags': TAGS,
+            'search_mode': 'incremental',
+            'search_max_pages': 10,
+            'search_workers': config.SEARCH_WORKERS,
+        })
+    return config_dict
+
+
+def run_bot(bot_class, scenario, config_dict):
+    """Run one bot and return its duration in seconds."""
+    start = time.perf_counter()
+    bot = bot_class(config_dict=config_dict, no_dry_run=True)
+    if scenario == 'promote_blog':
+        bot.process_images = True
+        bot.promote_blog_post()
+    elif scenario == 'boost_tags':
+        bot.boost_tags()
+    else:
+        bot.boost_mentions()
+    return time.perf_counter() - start
+
+
+class Stats:
+    """Request statistics of an in-process or a separate fake server."""
+    def __init__(self, server=None, url=None):
+        self.server = server
+        self.url = url
+
+    def reset(self):
+        """Clear the statistics (and records) of the server."""
+        if self.server is not None:
+            self.server.api.reset()
+        else:
+            requests.post(f'{self.url}/_reset', timeout=10)
+
+    def fetch(self):
+        """Per-endpoint statistics since the last reset."""
+        if self.server is not None:
+            return self.server.api.stats()
+        return requests.get(f'{self.url}/_stats', timeout=10).json()
+
+
+def run_scenario(bots, stats, scenario, platform, server_url, args):
+    """
+    Run a scenario with all accounts in parallel.
+
+    Returns:
+        dict: Runs, failures, throughput, latencies and endpoint stats.
+    """
+    stats.reset()
+    durations = []
+    failures = []
+
+    def account_runs(account):
+        for run in range(args.runs):
+            config_dict = bot_config(
+                scenario, platform, server_url, account, run
+            )
+            try:
+                durations.append(
+                    run_bot(bots[scenario], scenario, config_dict)
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                failures.append(f'{type(e).__name__}: {str(e)[:160]}')
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.accounts) as executor:
+        list(executor.map(account_runs, range(args.accounts)))
+    wall = time.perf_counter() - start
+
+    endpoints = stats.fetch()
+    api_requests = sum(
+        endpoint['requests'] for name, endpoint in endpoints.items()
+        if not name.startswith('blog ')
+    )
+    return {
+        'scenario': scenario,
+        'platform': platform,
+        'runs': len(durations) + len(failures),
+        'failed_runs': len(failures),
+        'failures': sorted(set(failures)),
+        'wall_seconds': wall,
+        'runs_per_second': (len(durations) + len(failures)) / wall,
+        'requests': api_requests,
+        'requests_per_second': api_requests / wall,
+        'run_p50_seconds': percentile(durations, 0.50),
+        'run_p95_seconds': percentile(durations, 0.95),
+        'run_p99_seconds': percentile(durations, 0.99),
+        'run_mean_seconds': statistics.fmean(durations) if durations else 0,
+        'endpoints': endpoints,
+    }
+
+
+def print_result(result):
+    """Print the summary of a scenario."""
+    print(
+        f"\n{result['scenario']} on {result['platform']}: "
+        f"{result['runs']} runs ({result['failed_runs']} failed) in "
+        f"{result['wall_seconds']:.2f} s, "
+        f"{result['runs_per_second']:.2f} runs/s, "
+        f"{result['requests_per_second']:.1f} requests/s"
+    )
+    print(
+        f"  run latency  p50 {result['run_p50_seconds'] * 1000:8.1f} ms"
+        f"  p95 {result['run_p95_seconds'] * 1000:8.1f} ms"
+        f"  p99 {result['run_p99_seconds'] * 1000:8.1f} ms"
+    )
+    print(f"  {'endpoint':52} {'requests':>8} {'non-2xx':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, endpoint in result['endpoints'].items():
+        errors = sum(
+            count for code, count in endpoint['statuses'].items()
+            if not code.startswith('2')
+        )
+        print(
+            f"  {name[:52]:52} {endpoint['requests']:>8} {errors:>8} "
+            f"{endpoint['p50_seconds'] * 1000:>8.1f} "
+            f"{endpoint['p95_seconds'] * 1000:>8.1f} "
+            f"{endpoint['p99_seconds'] * 1000:>8.1f}"
+        )
+    for failure in result['failures']:
+        print(f"  failed: {failure}")
+
+
+def main():
+    """Start the fake server and run the scenarios."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                        default=SCENARIOS)
+    parser.add_argument('--platforms', nargs='+', choices=PLATFORMS,
+                        default=PLATFORMS)
+    parser.add_argument('--accounts', type=int, default=2,
+                        help='Bot accounts running in parallel')
+    parser.add_argument('--runs', type=int, default=2,
+                        help='Runs per account and scenario')
+    parser.add_argument('--blogs', type=int, default=4,
+                        help='Blogs listed for PromoteBlogPost')
+    parser.add_argument('--url',
+                        help='Use a separately started fake server')
+    parser.add_argument('--paced', action='store_true',
+                        help="Keep the bots' client-side rate limits")
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--verbose', action='store_true',
+                        help="Show the bots' log output")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    output = Path(args.output).resolve() if args.output else None
+
+    work_dir = tempfile.mkdtemp(prefix='community-bots-load-')
+    os.environ['SESSION_CACHE_DIR'] = os.path.join(work_dir, '.sessions')
+    os.environ['STATE_DIR'] = os.path.join(work_dir, '.state')
+    # PromoteBlogPost writes archives, images and counters relative to
+    # the working directory
+    os.chdir(work_dir)
+
+    bots = import_bots()
+    if not args.paced:
+        unpace()
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    server = None
+    if args.url:
+        server_url = args.url.rstrip('/')
+        stats = Stats(url=server_url)
+    else:
+        server = FakeServer(server_options(args)).start()
+        server_url = server.url
+        stats = Stats(server=server)
+    write_blogs(server_url, args.blogs)
+    print(f"Fake server at {server_url}, working directory {work_dir}")
+
+    results = []
+    try:
+        for platform in args.platforms:
+            for scenario in args.scenarios:
+                result = run_scenario(
+                    bots, stats, scenario, platform, server_url, args
+                )
+                print_result(result)
+                results.append(result)
+    finally:
+        if server is not None:
+            server.stop()
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'options': vars(args), 'results': results}, f,
+                      indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
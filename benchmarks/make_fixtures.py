@@ -0,0 +1,308 @@
+"""
+Generate the fixtures of the benchmark suite (benchmarks/fixtures).
+
+The fixtures mirror the payloads the bots process: an RSS 2.0 feed (with
+categories, content:encoded and media:content), an Atom feed (Hugo /
+Quarto style, images in the summary), a YouTube channel feed, the
+contributor JSON files of the awesome-*-blogs repositories (built from
+the names and handles in metadata/*_meta_data.json), and recorded-style
+`app.bsky.feed.searchPosts` and `app.bsky.notification.listNotifications`
+responses. They are generated with a fixed seed, so re-running the
+script reproduces them byte for byte.
+
+Real recordings can replace any of the files as long as the format is
+kept (see bench_feed_parser.py --save-dir and bench_tag_matcher.py for
+recording feeds and searches).
+
+Usage (from the repository root):
+
+    python benchmarks/make_fixtures.py
+"""
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+META_DATA_FILES = [
+    'metadata/pyladies_meta_data.json',
+    'metadata/rladies_meta_data.json',
+]
+SEED = 2024
+ENTRIES = 50
+START = datetime(2025, 6, 30, 9, 0, tzinfo=timezone.utc)
+
+WORDS = ['data', 'package', 'release', 'community', 'workshop', 'tidy',
+         'pandas', 'models', 'plot', 'shiny', 'quarto', 'testing', 'api',
+         'notes', 'tutorial', 'conference', 'meetup', 'career', 'python',
+         'visualization', 'spatial', 'text', 'learning', 'statistics']
+CATEGORIES = ['rstats', 'python', 'R', 'Data Science', 'ggplot2',
+              'machine-learning', 'tidyverse', 'pandas', 'Community',
+              'Quarto', 'Shiny', 'tutorial']
+HASHTAGS = ['pyladies', 'PyLadies', 'rladies', 'RLadies', 'python',
+            'rstats', 'datascience', '100DaysOfCode', 'opensource']
+
+
+def sentence(rng, words=12):
+    """A random sentence."""
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def paragraph(rng, sentences=4):
+    """A random paragraph."""
+    return '. '.join(sentence(rng) for _ in range(sentences)) + '.'
+
+
+def rss_feed(rng, entries=ENTRIES):
+    """RSS 2.0 feed like the ones generated by blogdown/WordPress."""
+    items = []
+    for i in range(entries):
+        published = START - timedelta(days=9 * i, hours=rng.randint(0, 23))
+        categories = ''.join(
+            f'<category>{escape(category)}</category>'
+            for category in rng.sample(CATEGORIES, rng.randint(0, 4))
+        )
+        image = f'https://example-blog.org/post/{i}/featured.png'
+        media = (
+            f'<media:content url="{image}" medium="image"/>' if i % 3 == 0
+            else ''
+        )
+        body = (
+            f'<p>{paragraph(rng)}</p><img src="{image}" alt="Figure {i}"/>'
+            f'<p>{paragraph(rng, 8)}</p>'
+        )
+        items.append(
+            f'<item><title>{escape(sentence(rng, 6))}</title>'
+            f'<link>https://example-blog.org/post/{i}/</link>'
+            f'<pubDate>{published.strftime("%a, %d %b %Y %H:%M:%S %z")}'
+            f'</pubDate>'
+            f'<guid>https://example-blog.org/post/{i}/</guid>'
+            f'{categories}'
+            f'<description>{escape(paragraph(rng, 2))}</description>'
+            f'<content:encoded>{escape(body)}</content:encoded>{media}'
+            f'</item>'
+        )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" '
+        'xmlns:content="http://purl.org/rss/1.0/modules/content/" '
+        'xmlns:media="http://search.yahoo.com/mrss/"><channel>'
+        '<title>Example blog</title><link>https://example-blog.org/</link>'
+        '<description>Posts</description>'
+        + '\n'.join(items)
+        + '</channel></rss>\n'
+    )
+
+
+def atom_feed(rng, entries=ENTRIES):
+    """Atom feed like the ones generated by Hugo and Quarto."""
+    items = []
+    for i in range(entries):
+        published = START - timedelta(days=11 * i, hours=rng.randint(0, 23))
+        categories = ''.join(
+            f'<category term="{escape(category)}"/>'
+            for category in rng.sample(CATEGORIES, rng.randint(0, 3))
+        )
+        summary = (
+            f'<p>{paragraph(rng)}</p>'
+            f'<img src="https://example-quarto.org/posts/{i}/thumb.jpg" '
+            f'alt="Thumbnail {i}"/>'
+        )
+        items.append(
+            f'<entry><title>{escape(sentence(rng, 7))}</title>'
+            f'<link href="https://example-quarto.org/posts/{i}/"/>'
+            f'<id>https://example-quarto.org/posts/{i}/</id>'
+            f'<published>{published.isoformat()}</published>'
+            f'<updated>{published.isoformat()}</updated>{categories}'
+            f'<summary type="html">{escape(summary)}</summary></entry>'
+        )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">'
+        '<title>Example Quarto blog</title>'
+        '<link href="https://example-quarto.org/"/>'
+        '<id>https://example-quarto.org/</id>'
+        f'<updated>{START.isoformat()}</updated>'
+        + '\n'.join(items)
+        + '</feed>\n'
+    )
+
+
+def youtube_feed(rng, entries=15):
+    """YouTube channel feed (the API returns the latest 15 videos)."""
+    items = []
+    for i in range(entries):
+        video_id = ''.join(
+            rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJ0123456789_-')
+            for _ in range(11)
+        )
+        published = START - timedelta(days=14 * i)
+        items.append(
+            f'<entry><id>yt:video:{video_id}</id>'
+            f'<yt:videoId>{video_id}</yt:videoId>'
+            f'<yt:channelId>UCexamplechannel</yt:channelId>'
+            f'<title>{escape(sentence(rng, 8))}</title>'
+            f'<link rel="alternate" '
+            f'href="https://www.youtube.com/watch?v={video_id}"/>'
+            f'<author><name>R-Ladies Example</name></author>'
+            f'<published>{published.isoformat()}</published>'
+            f'<updated>{published.isoformat()}</updated>'
+            f'<media:group><media:title>{escape(sentence(rng, 8))}'
+            f'</media:title>'
+            f'<media:thumbnail '
+            f'url="https://i.ytimg.com/vi/{video_id}/hqdefault.jpg" '
+            f'width="480" height="360"/>'
+            f'<media:description>{escape(paragraph(rng, 3))}'
+            f'</media:description></media:group></entry>'
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" '
+        'xmlns:media="http://search.yahoo.com/mrss/" '
+        'xmlns="http://www.w3.org/2005/Atom">'
+        '<title>R-Ladies Example</title>'
+        + '\n'.join(items)
+        + '</feed>\n'
+    )
+
+
+def contributors(rng):
+    """Contributor JSON files of the awesome-*-blogs repositories."""
+    files = []
+    for meta_data_file in META_DATA_FILES:
+        with open(meta_data_file, encoding='utf-8') as f:
+            for feed in json.load(f):
+                rss_feed = (feed['rss_feed'] or [''])[0]
+                content = {
+                    'title': f"{feed['name']}'s blog",
+                    'url': rss_feed.rsplit('/', 1)[0] if rss_feed else '',
+                    'authors': [{
+                        'name': feed['name'],
+                        'social_media': [{
+                            'mastodon': feed.get('mastodon', ''),
+                            'bluesky': feed.get('bluesky', ''),
+                        }],
+                    }],
+                    'language': rng.choice(['en', 'en', 'en', 'es', 'pt']),
+                    'type': 'blog',
+                }
+                key = (
+                    'rss_feed_youtube' if 'youtube.com' in rss_feed
+                    else 'rss_feed'
+                )
+                if rss_feed:
+                    content[key] = rss_feed
+                files.append(content)
+    return files
+
+
+def _post_record(rng, i):
+    """Post record with text, tag facets (most posts) and langs."""
+    tags = rng.sample(HASHTAGS, rng.randint(1, 3))
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 30))]
+    text = ' '.join(words) + ' ' + ' '.join(f'#{tag}' for tag in tags)
+    record = {
+        '$type': 'app.bsky.feed.post',
+        'createdAt': (START - timedelta(minutes=7 * i)).isoformat(),
+        'langs': ['en'],
+        'text': text,
+    }
+    if i % 5:
+        facets = []
+        for tag in tags:
+            start = len(text.encode('utf-8')) - len(
+                text[text.index(f'#{tag}'):].encode('utf-8')
+            )
+            facets.append({
+                '$type': 'app.bsky.richtext.facet',
+                'features': [{
+                    '$type': 'app.bsky.richtext.facet#tag',
+                    'tag': tag,
+                }],
+                'index': {
+                    'byteStart': start,
+                    'byteEnd': start + len(f'#{tag}'.encode('utf-8')),
+                },
+            })
+        record['facets'] = facets
+    return record
+
+
+def _author(rng, i):
+    handle = f'user{rng.randint(1, 400)}.bsky.social'
+    return {
+        'did': f'did:plc:{i:024d}',
+        'handle': handle,
+        'displayName': handle.split('.')[0].title(),
+        'viewer': {'muted': False, 'blockedBy': False},
+        'labels': [],
+    }
+
+
+def search_posts(rng, posts=100):
+    """`app.bsky.feed.searchPosts` response."""
+    results = []
+    for i in range(posts):
+        author = _author(rng, i)
+        uri = f"at://{author['did']}/app.bsky.feed.post/3l{i:011d}"
+        results.append({
+            'uri': uri,
+            'cid': f'bafyreib{i:051d}',
+            'author': author,
+            'record': _post_record(rng, i),
+            'replyCount': rng.randint(0, 5),
+            'repostCount': rng.randint(0, 20),
+            'likeCount': rng.randint(0, 80),
+            'indexedAt': (START - timedelta(minutes=7 * i)).isoformat(),
+            'viewer': (
+                {'repost': f'at://did:plc:bot/app.bsky.feed.repost/{i}'}
+                if i % 9 == 0 else {}
+            ),
+            'labels': [],
+        })
+    return {'posts': results, 'hitsTotal': posts, 'cursor': str(posts)}
+
+
+def notifications(rng, count=100):
+    """`app.bsky.notification.listNotifications` response."""
+    results = []
+    for i in range(count):
+        author = _author(rng, i)
+        reason = rng.choice(['mention', 'mention', 'like', 'repost',
+                             'follow', 'reply'])
+        results.append({
+            'uri': f"at://{author['did']}/app.bsky.feed.post/3m{i:011d}",
+            'cid': f'bafyreic{i:051d}',
+            'author': author,
+            'reason': reason,
+            'record': _post_record(rng, i),
+            'isRead': i > 20,
+            'indexedAt': (START - timedelta(minutes=13 * i)).isoformat(),
+            'labels': [],
+        })
+    return {'notifications': results, 'cursor': None}
+
+
+def main():
+    """Write all fixtures."""
+    rng = random.Random(SEED)
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    (FIXTURES_DIR / 'rss.xml').write_text(rss_feed(rng), encoding='utf-8')
+    (FIXTURES_DIR / 'atom.xml').write_text(atom_feed(rng), encoding='utf-8')
+    (FIXTURES_DIR / 'youtube.xml').write_text(
+        youtube_feed(rng), encoding='utf-8'
+    )
+    for name, payload in [
+        ('contributors.json', contributors(rng)),
+        ('search_posts.json', search_posts(rng)),
+        ('notifications.json', notifications(rng)),
+    ]:
+        with open(FIXTURES_DIR / name, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1)
+            f.write('\n')
+    print(f"Wrote fixtures to {FIXTURES_DIR}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Local WebSocket stand-in for Bluesky Jetstream and the Mastodon streaming
+API that replays recorded events.
+
+Events are read from a JSON Lines file, one message per line, exactly as
+the stream sent them. Jetstream events carry `time_us`, and a `cursor`
+in the connection URL skips the events up to it, like Jetstream does.
+With `--close-after` the connection is dropped after that many messages
+to exercise reconnecting and resuming.
+
+Usage (from the repository root):
+
+    # record 200 Jetstream post events
+    python benchmarks/replay_stream.py --record \\
+        "wss://jetstream2.us-east.bsky.network/subscribe?wantedCollections=app.bsky.feed.post" \\
+        --count 200 --events /tmp/jetstream.jsonl
+
+    # replay them and point the bot at the stand-in
+    python benchmarks/replay_stream.py --events /tmp/jetstream.jsonl --close-after 50
+    STREAMING_URL=ws://localhost:8765/subscribe python src/boost_tags.py --stream
+"""
+import argparse
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+from websockets.sync.server import serve
+
+
+def load_events(path):
+    """Read the recorded messages of a JSON Lines file."""
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def record(url, count, path):
+    """Record `count` messages of a stream to a JSON Lines file."""
+    with connect(url) as websocket, open(path, 'w', encoding='utf-8') as f:
+        for _ in range(count):
+            f.write(websocket.recv() + '\n')
+    print(f"Recorded {count} messages to {path}")
+
+
+def make_handler(events, close_after=None, delay=0.0):
+    """
+    Return a connection handler replaying `events`.
+
+    Args:
+        events (list[str]): Recorded messages.
+        close_after (int | None): Close the connection after this many
+            messages (the client is expected to reconnect).
+        delay (float): Seconds between two messages.
+    """
+    def handler(websocket):
+        query = parse_qs(urlsplit(websocket.request.path).query)
+        cursor = int(query.get('cursor', ['0'])[0])
+        sent = 0
+        try:
+            for message in events:
+                time_us = json.loads(message).get('time_us')
+                if cursor and time_us is not None and time_us <= cursor:
+                    continue
+                websocket.send(message)
+                sent += 1
+                if close_after and sent >= close_after:
+                    return
+                if delay:
+                    time.sleep(delay)
+            # Keep the connection open like a quiet stream
+            for _ in websocket:
+                pass
+        except ConnectionClosed:
+            pass
+
+    return handler
+
+
+def start_server(events, host='localhost', port=0, **kwargs):
+    """
+    Serve `events` in a background thread.
+
+    Returns:
+        tuple: (server, URL of the server)
+    """
+    server = serve(make_handler(events, **kwargs), host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bound_port = server.socket.getsockname()[1]
+    return server, f'ws://{host}:{bound_port}'
+
+
+def main():
+    """Record a stream or replay recorded events."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--events', required=True,
+                        help='JSON Lines file with recorded messages')
+    parser.add_argument('--record', metavar='URL',
+                        help='Record messages of this stream instead')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--close-after', type=int)
+    parser.add_argument('--delay', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.count, args.events)
+        return
+
+    events = load_events(args.events)
+    with serve(
+        make_handler(events, args.close_after, args.delay),
+        args.host,
+        args.port
+    ) as server:
+        print(f"Replaying {len(events)} messages on "
+              f"ws://{args.host}:{args.port}")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
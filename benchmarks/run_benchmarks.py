@@ -0,0 +1,480 @@
+"""
+Benchmark suite over the checked-in fixtures (benchmarks/fixtures).
+
+Times the hot functions of the bots at several corpus sizes, without
+network access:
+
+    load_feed                       parse RSS / Atom / YouTube feeds
+    get_number_of_archive_entries   count feed and archive entries
+    _process_feed                   walk a feed against its archive
+    define_tags                     build the hashtags of a blog post
+    build_post_bluesky              build a Bluesky post with facets
+    _get_media_content              find the image of an entry
+    extract_info                    read a contributor JSON file
+    matching_tags                   tag matching of _boost_tags_bluesky
+
+Corpora larger than a fixture are built by repeating its entries with
+unique links. Each benchmark is run `--repeat` times with enough calls
+per run to take ~20 ms; the minimum and median time per call are
+reported.
+
+Results can be written as JSON (`--output`) and compared against a
+stored baseline (`--baseline`, default benchmarks/baseline.json). Every
+run of a benchmark is followed by a run of a pure-Python calibration
+loop, and the median ratio of the two is compared. This keeps a baseline
+recorded on another machine comparable and cancels out load changes
+while the suite runs; the ratios to the baseline are further divided by
+their median over the suite. A benchmark more than `--threshold` slower than
+the baseline is timed again (`--retries` times) and only reported as a
+regression if every re-run is too slow as well, so a single noisy run
+on a shared runner does not fail the check. Regressions make the script
+exit with 1.
+
+Usage (from the repository root):
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --filter feed --sizes 10 1000
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --save-baseline
+"""
+import argparse
+import copy
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from lxml import etree
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'src'))
+
+from atproto import models  # noqa: E402
+
+import promote_blog_post  # noqa: E402
+from get_rss_data import RSSData  # noqa: E402
+from helper.match_tags import matching_tags, tag_set  # noqa: E402
+from helper.parse_feed import parse_feed  # noqa: E402
+from promote_blog_post import PromoteBlogPost  # noqa: E402
+
+FIXTURES_DIR = ROOT / 'benchmarks' / 'fixtures'
+BASELINE_FILE = ROOT / 'benchmarks' / 'baseline.json'
+SIZES = [10, 100, 1000]
+REPEAT = 15
+TARGET_SECONDS = 0.02  # duration of one timed run
+THRESHOLD = 0.25  # relative slowdown reported as regression
+RETRIES = 2  # re-runs of a benchmark before reporting it as regression
+MIN_SHIFT_SAMPLES = 5  # benchmarks needed to cancel the machine drift
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+FEEDS = ['rss', 'atom', 'youtube']
+
+
+def fixture(name):
+    """Raw bytes of a fixture."""
+    return (FIXTURES_DIR / name).read_bytes()
+
+
+def scaled_feed(body, size):
+    """
+    Feed document with `size` entries, repeating the entries of `body`
+    with unique links and ids.
+    """
+    root = etree.fromstring(body)
+    if root.tag == 'rss':
+        parent = root.find('channel')
+        entries = parent.findall('item')
+    else:
+        parent = root
+        entries = root.findall(f'{ATOM_NS}entry')
+    for entry in entries:
+        parent.remove(entry)
+
+    for i in range(size):
+        entry = copy.deepcopy(entries[i % len(entries)])
+        suffix = f'?copy={i // len(entries)}' if i >= len(entries) else ''
+        for elem in entry.iter():
+            if elem.tag in ('link', 'guid', f'{ATOM_NS}id'):
+                elem.text = (elem.text or '') + suffix
+            elif elem.tag == f'{ATOM_NS}link':
+                elem.set('href', elem.get('href') + suffix)
+        parent.append(entry)
+    return etree.tostring(root, xml_declaration=True, encoding='utf-8')
+
+
+def scaled(items, size):
+    """`size` items, cycling through `items`."""
+    return [items[i % len(items)] for i in range(size)]
+
+
+def feed_entries(size):
+    """Parsed entries of all fixture feeds, `size` in total."""
+    entries = []
+    for name in FEEDS:
+        entries.extend(parse_feed(fixture(f'{name}.xml')))
+    entries = scaled(entries, size)
+    # Unique links, as in a real archive
+    return [
+        type(entry)({**entry, 'link': f"{entry['link']}#{i}"})
+        for i, entry in enumerate(entries)
+    ]
+
+
+def blog_bot(client_name='rladies_bot'):
+    """PromoteBlogPost in dry-run mode without generative AI."""
+    bot = PromoteBlogPost(
+        config_dict={
+            'platform': 'bluesky',
+            'client_name': client_name,
+            'gen_ai_support': False,
+        },
+        no_dry_run=False
+    )
+    return bot
+
+
+def blog_entry(entry):
+    """Entry dict as built by `_process_feed`."""
+    return {
+        'title': entry.title,
+        'link': entry.link,
+        'pub_date': entry.published,
+        'tags': [tag['term'] for tag in entry.get('tags', [])],
+        'media_content': [],
+        'summary': entry.get('summary', ''),
+    }
+
+
+# Benchmarks: name -> function(size) returning the callable to time
+
+
+def bench_load_feed(feed):
+    """Benchmark `load_feed` on a feed of the given fixture."""
+    def setup(size):
+        body = scaled_feed(fixture(f'{feed}.xml'), size)
+        promote_blog_post.fetch_feed_bounded = lambda *args: body
+        return lambda: PromoteBlogPost.load_feed(f'{feed}.xml', [])
+    return setup
+
+
+def bench_get_number_of_archive_entries(size):
+    """Benchmark `get_number_of_archive_entries`."""
+    d = feed_entries(size)
+    archive = {'link': [entry['link'] for entry in d]}
+    return lambda: PromoteBlogPost.get_number_of_archive_entries(d, archive)
+
+
+def bench_process_feed(size):
+    """
+    Benchmark `_process_feed` on a feed whose entries are all archived
+    except the newest (the usual state between two runs).
+    """
+    bot = blog_bot()
+    bot.process_images = True
+    d = feed_entries(size)
+    links = [entry['link'] for entry in d[1:]]
+
+    def run():
+        bot._process_feed(None, 0, {
+            'rss_feed_archive': {'link': list(links)},
+            'number_of_entries_feed': len(d),
+            'feed': {'name': 'benchmark'},
+            'd': d,
+        })
+    return run
+
+
+def bench_define_tags(size):
+    """Benchmark `define_tags`."""
+    bot = blog_bot()
+    entries = [blog_entry(entry) for entry in feed_entries(size)]
+
+    def run():
+        for entry in entries:
+            bot.define_tags(entry)
+    return run
+
+
+def bench_build_post_bluesky(size):
+    """Benchmark `build_post_bluesky` (DID passed in, no summary)."""
+    bot = blog_bot()
+    entries = [blog_entry(entry) for entry in feed_entries(size)]
+    tags = [bot.define_tags(entry) for entry in entries]
+
+    def run():
+        for entry, entry_tags in zip(entries, tags):
+            bot.build_post_bluesky(
+                f"Check out this post by Jane: {entry['title']}",
+                'jane.bsky.social',
+                entry_tags,
+                entry,
+                did='did:plc:benchmark'
+            ).build_facets()
+    return run
+
+
+def bench_get_media_content(size):
+    """Benchmark `_get_media_content`."""
+    entries = feed_entries(size)
+
+    def run():
+        for entry in entries:
+            PromoteBlogPost._get_media_content(entry)
+    return run
+
+
+def bench_extract_info(size):
+    """Benchmark `extract_info` over contributor JSON files."""
+    contents = scaled(json.loads(fixture('contributors.json')), size)
+
+    def run():
+        for content in contents:
+            RSSData.extract_info(content)
+    return run
+
+
+def bench_matching_tags(size):
+    """Benchmark the tag matching of `_boost_tags_bluesky`."""
+    response = models.AppBskyFeedSearchPosts.Response.model_validate(
+        json.loads(fixture('search_posts.json'))
+    )
+    posts = scaled(response.posts, size)
+    followed = tag_set(['rladies', 'pyladies', 'rstats', 'python'])
+
+    def run():
+        for post in posts:
+            matching_tags(post.record, followed)
+    return run
+
+
+BENCHMARKS = {
+    **{f'load_feed[{feed}]': bench_load_feed(feed) for feed in FEEDS},
+    'get_number_of_archive_entries': bench_get_number_of_archive_entries,
+    '_process_feed': bench_process_feed,
+    'define_tags': bench_define_tags,
+    'build_post_bluesky': bench_build_post_bluesky,
+    '_get_media_content': bench_get_media_content,
+    'extract_info': bench_extract_info,
+    'matching_tags': bench_matching_tags,
+}
+
+
+def calibration_workload():
+    """Fixed pure-Python workload the benchmarks are normalized by."""
+    total = 0
+    for i in range(200_000):
+        total += i % 7
+    return total
+
+
+def timed_run(func, number):
+    """Seconds per call of `number` calls of `func`."""
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number
+
+
+def time_callable(func, repeat=REPEAT):
+    """
+    Time `func`: `repeat` runs of as many calls as fit into
+    `TARGET_SECONDS`, each followed by a run of the calibration
+    workload.
+
+    Returns:
+        dict: 'min_seconds' and 'median_seconds' per call, 'number' of
+            calls per run, 'repeat', the median 'calibration_seconds'
+            and the median ratio of the runs to their calibration run
+            ('normalized').
+    """
+    first = timed_run(func, 1)
+    number = max(1, int(TARGET_SECONDS / first)) if first else 1000
+    calibration_workload()
+
+    timings = []
+    calibrations = []
+    for _ in range(repeat):
+        timings.append(timed_run(func, number))
+        calibrations.append(timed_run(calibration_workload, 1))
+    return {
+        'min_seconds': min(timings),
+        'median_seconds': statistics.median(timings),
+        'number': number,
+        'repeat': repeat,
+        'calibration_seconds': statistics.median(calibrations),
+        'normalized': statistics.median(
+            timing / calibration
+            for timing, calibration in zip(timings, calibrations)
+        ),
+    }
+
+
+def git_commit():
+    """Current commit of the repository (or None)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names, sizes, repeat):
+    """Run the benchmarks and return the results document."""
+    results = []
+    for name in names:
+        for size in sizes:
+            func = BENCHMARKS[name](size)
+            timing = time_callable(func, repeat)
+            results.append({'name': name, 'size': size, **timing})
+            seconds = timing['median_seconds']
+            print(f"{name:32} {size:>6} {seconds * 1000:>11.3f}"
+                  f" ms {seconds / size * 1e6:>10.2f} µs/item")
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'calibration_seconds': statistics.median(
+                result['calibration_seconds'] for result in results
+            ),
+        },
+        'results': results,
+    }
+
+
+def confirmed_ratio(result, reference, shift, threshold, repeat, retries):
+    """
+    Ratio of a benchmark to the baseline, divided by the median ratio of
+    the suite (`shift`). A benchmark slower than `threshold` is timed
+    again, up to `retries` times with twice the runs, until a run is
+    within `threshold`.
+
+    Returns:
+        float: Lowest ratio of all runs.
+    """
+    ratio = result['normalized'] / reference['normalized'] / shift
+    for _ in range(retries):
+        if ratio <= 1 + threshold:
+            break
+        func = BENCHMARKS[result['name']](result['size'])
+        timing = time_callable(func, 2 * repeat)
+        ratio = min(
+            ratio, timing['normalized'] / reference['normalized'] / shift
+        )
+    return ratio
+
+
+def compare(document, baseline, threshold, repeat=REPEAT, retries=RETRIES):
+    """
+    Compare normalized times against the baseline, timing benchmarks
+    slower than `threshold` again before reporting them.
+
+    With at least `MIN_SHIFT_SAMPLES` benchmarks, the ratios are divided
+    by their median, which cancels a drift of the whole machine against
+    the baseline that the calibration loop does not catch.
+
+    Returns:
+        list[dict]: Benchmarks slower than the baseline by more than
+            `threshold` in every run.
+    """
+    base = {
+        (result['name'], result['size']): result
+        for result in baseline['results']
+    }
+    ratios = [
+        result['normalized'] / base[key]['normalized']
+        for result in document['results']
+        if (key := (result['name'], result['size'])) in base
+    ]
+    shift = 1.0
+    if len(ratios) >= MIN_SHIFT_SAMPLES:
+        shift = statistics.median(ratios)
+    document['meta']['baseline_shift'] = shift
+
+    regressions = []
+    print('')
+    print(f"Median ratio to the baseline: {shift:.2f}x")
+    print(f"{'benchmark':32} {'size':>6} {'vs baseline':>12}")
+    for result in document['results']:
+        reference = base.get((result['name'], result['size']))
+        if reference is None:
+            print(f"{result['name']:32} {result['size']:>6} {'new':>12}")
+            continue
+        ratio = confirmed_ratio(
+            result, reference, shift, threshold, repeat, retries
+        )
+        result['baseline_ratio'] = ratio
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(result)
+            flag = '  regression'
+        print(f"{result['name']:32} {result['size']:>6} {ratio:>11.2f}x"
+              f"{flag}")
+    return regressions
+
+
+def main():
+    """Run the suite and compare it against the baseline."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--filter', nargs='+',
+                        help='Only run benchmarks containing one of these')
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help='Baseline to compare against')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='Relative slowdown reported as regression')
+    parser.add_argument('--retries', type=int, default=RETRIES,
+                        help='Re-runs of a slow benchmark before reporting '
+                             'it as regression')
+    args = parser.parse_args()
+
+    # The bots log every post they build; keep the output readable
+    logging.disable(logging.CRITICAL)
+
+    names = [
+        name for name in BENCHMARKS
+        if not args.filter or any(part in name for part in args.filter)
+    ]
+    print(f"{'benchmark':32} {'size':>6} {'per call':>14} {'per item':>13}")
+    document = run_benchmarks(names, args.sizes, args.repeat)
+
+    regressions = []
+    if args.save_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+            f.write('\n')
+        print(f"\nBaseline saved to {BASELINE_FILE}")
+    elif Path(args.baseline).is_file():
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(
+            document, baseline, args.threshold, args.repeat, args.retries
+        )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+            f.write('\n')
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmarks regressed by more than "
+              f"{args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,25 @@
 """Module to boost mentions that tag the community bots"""
 
+import argparse
+import asyncio
 import os
 import logging
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 import config
-from helper.login_mastodon import login_mastodon
-from helper.login_bluesky import login_bluesky
+from helper.batch_repost import reposted_by_viewer
+from helper.platform_adapter import adapter_for
+from helper.profiling import add_profile_arguments, profile_stage, profiled
+from helper.repost_ledger import RepostLedger, ledger_name
+from helper.state_store import load_state, save_state
 
 load_dotenv()
 
+MASTODON_PAGE_LIMIT = 80  # maximum page size of Mastodon notifications
+BLUESKY_PAGE_LIMIT = 100  # maximum page size of Bluesky notifications
+MAX_PAGES = 10
+
 
 class BoostMentions():
     """
@@ -27,7 +37,8 @@ class BoostMentions():
         """
         Method to boost mentions on social media platforms.
         """
-        self.set_up_config_dict()
+        if self.config_dict is None:
+            self.set_up_config_dict()
 
         self.logger.info("==========================")
         client_name = self.config_dict.get("client_name")
@@ -36,81 +47,215 @@ class BoostMentions():
         self.logger.info(' > Connecting to %s',
                          self.config_dict['api_base_url'])
 
-        if self.config_dict["platform"] == "mastodon":
-            account, client = login_mastodon(self.config_dict)
-            notifications = client.notifications(types=['mention'])
-            self.logger.info(' > Fetched account data for %s',
-                             account.acct)
+        asyncio.run(self._boost_mentions(adapter_for(self.config_dict)))
 
-            self.logger.info(
-                ' > Beginning search-loop and toot and boost toots'
-            )
-            self.logger.info('------------------------')
-
-            self.logger.info(" > Reading statuses to identify tootable status")
-            for notification in notifications:
-                if not notification.status.favourited and \
-                        notification.status.account.acct != account.acct:
-                    # Boost and favorite the new status
-                    try:
-                        self.logger.info(
-                            "   * Boosting new toot by %s viewable at: %s",
-                            notification.account.username,
-                            notification.status.url,
-                        )
-                        client.status_reblog(notification.status.id)
-                        client.status_favourite(notification.status.id)
-                    except Exception as e:
-                        self.logger.info(
-                            "   * Boosting new toot by %s did not work: %s ",
-                            notification.account.username,
-                            e,
-                        )
-        elif self.config_dict["platform"] == "bluesky":
-            client = login_bluesky(self.config_dict)
-            self.logger.info(" > Fetched account data")
-
-            self.logger.info(" > Beginning search-loop and repost posts")
-            self.logger.info("------------------------")
-
-            self.logger.info(
-                " > Reading statuses to identify postable statuses"
+    async def _boost_mentions(self, adapter):
+        """
+        Boost the new mentions through the platform adapter and record
+        them in the ledger.
+        """
+        profile_stage("login")
+        await adapter.login()
+        self.logger.info(" > Fetched account data")
+
+        self.logger.info(" > Beginning search-loop and boost posts")
+        self.logger.info("------------------------")
+
+        profile_stage("fetch")
+        seen_at = datetime.now(timezone.utc).isoformat()
+        state = load_state(self._state_name())
+        with RepostLedger(ledger_name(self.config_dict)) as ledger:
+            if adapter.platform == "mastodon":
+                mark_key = "min_id"
+                posts, marks = await self._new_mentions_mastodon(
+                    adapter, state, ledger
+                )
+            else:
+                mark_key = "mark"
+                posts, marks = await self._new_mentions_bluesky(
+                    adapter, state, ledger
+                )
+
+            profile_stage("boost")
+            failed = set()
+            for result in await adapter.boost(posts):
+                if result["ok"]:
+                    ledger.add(result["uri"])
+                    self.logger.info("   * Boosted post %s", result["uri"])
+                else:
+                    failed.add(result["uri"])
+                    self.logger.info(
+                        "   * Boosting post %s did not work because of %s "
+                        "- going to the next post.",
+                        result["uri"],
+                        result["error"],
+                    )
+            ledger.prune()
+        self._advance_mark(state, mark_key, marks, failed)
+        save_state(self._state_name(), state)
+
+        await adapter.mark_seen(seen_at)
+        self.logger.info(
+            'Successfully process notification. Last seen at: %s',
+            seen_at
+        )
+
+    def _state_name(self):
+        """Name of the state file holding the last processed mention."""
+        return (
+            f"boost_mentions_{self.config_dict.get('platform')}_"
+            f"{self.config_dict.get('client_name')}"
+        )
+
+    @staticmethod
+    def _advance_mark(state, mark_key, marks, failed):
+        """
+        Move the mark to the newest mention before the oldest one whose
+        boost failed, so that failed mentions are fetched again.
+
+        Args:
+            state (dict): State holding the mark under `mark_key`.
+            mark_key (str): Key of the mark in `state`.
+            marks (list): (mark, post uri) of the new mentions, oldest
+                first.
+            failed (set): URIs of the posts whose boost failed.
+        """
+        for mark, uri in marks:
+            if uri in failed:
+                break
+            state[mark_key] = mark
+
+    async def _new_mentions_mastodon(self, adapter, state, ledger):
+        """
+        Fetch the mentions newer than the last processed one, paging
+        forward with `min_id`. Without a mark (first run) only the newest
+        page is read.
+
+        Args:
+            adapter (MastodonAdapter): Logged in Mastodon adapter.
+            state (dict): Holds the last processed notification id
+                ('min_id').
+            ledger (RepostLedger): Posts boosted before.
+
+        Returns:
+            tuple: Statuses of the new mentions to boost, and the marks
+                of the new mentions with their status URIs, oldest first
+                (see `_advance_mark`).
+        """
+        min_id = state.get("min_id")
+        max_pages = MAX_PAGES if min_id else 1
+        notifications = []
+        for _ in range(max_pages):
+            page = await adapter.list_notifications(
+                types=['mention'],
+                min_id=min_id,
+                limit=MASTODON_PAGE_LIMIT
             )
-            last_seen_at = client.get_current_time_iso()
-            response = client.app.bsky.notification.list_notifications()
-            timeline = client.get_timeline(algorithm='reverse-chronological')
-            cids = [post.post.cid for post in timeline.feed]
+            if not page:
+                break
+            notifications.extend(page)
+            min_id = max((n.id for n in page), key=int)
+            if len(page) < MASTODON_PAGE_LIMIT:
+                break
+
+        self.logger.info(' > Found %s new mentions', len(notifications))
+        marks = [
+            (str(notification.id), notification.status.uri)
+            for notification in sorted(notifications, key=lambda n: int(n.id))
+        ]
+
+        statuses = []
+        for notification in notifications:
+            if not notification.status.favourited and \
+                    notification.status.uri not in ledger and \
+                    notification.status.account.acct != adapter.account.acct:
+                self.logger.info(
+                    "   * Boosting new toot by %s viewable at: %s",
+                    notification.account.username,
+                    notification.status.url,
+                )
+                statuses.append(notification.status)
+        return statuses, marks
+
+    async def _new_mentions_bluesky(self, adapter, state, ledger):
+        """
+        Fetch the mentions newer than the last processed one, paging back
+        with the cursor until the mark is reached. Without a mark (first
+        run) only the newest page is read.
+
+        Args:
+            adapter (BlueskyAdapter): Logged in Bluesky adapter.
+            state (dict): Holds 'indexed_at' and 'uri' of the last
+                processed mention ('mark').
+            ledger (RepostLedger): Posts reposted before.
 
+        Returns:
+            tuple: New mention notifications to repost, oldest first,
+                and the marks of the new mentions with their URIs,
+                oldest first (see `_advance_mark`). If the pages ran out
+                before the mark was reached, no marks are returned and
+                the mark is kept (the mentions in between would be
+                skipped otherwise).
+        """
+        mark = state.get("mark")
+        max_pages = MAX_PAGES if mark else 1
+        notifications = []
+        cursor = None
+        reached_mark = False
+        # Whether all mentions since the mark were read
+        new_mentions_complete = True
+        for _ in range(max_pages):
+            response = await adapter.list_notifications(
+                reasons=["mention"],
+                limit=BLUESKY_PAGE_LIMIT,
+                cursor=cursor
+            )
             for notification in response.notifications:
-                if (
-                    notification.reason == "mention"
-                    and notification.cid not in cids
+                if mark and (
+                    notification.uri == mark["uri"]
+                    or notification.indexed_at < mark["indexed_at"]
                 ):
-                    try:
-                        self.logger.info(
-                            "   * Reposted post reference: %s",
-                            client.repost(
-                                uri=notification.uri,
-                                cid=notification.cid
-                            )
-                        )
-                    except Exception as e:
-                        self.logger.info(
-                            """
-                            * Reposting new post with URI %s
-                            and CID %s did not work because of %s -
-                            going to the next post.
-                            """,
-                            notification.uri,
-                            notification.cid,
-                            e,
-                        )
-
-            client.app.bsky.notification.update_seen({'seen_at': last_seen_at})
-            self.logger.info(
-                'Successfully process notification. Last seen at: %s',
-                last_seen_at
+                    reached_mark = True
+                    break
+                notifications.append(notification)
+            cursor = response.cursor
+            if reached_mark or not cursor:
+                break
+        else:
+            if mark:
+                self.logger.warning(
+                    " > Stopped after %s pages before reaching the last "
+                    "processed mention; keeping its mark.",
+                    max_pages
+                )
+                new_mentions_complete = False
+
+        self.logger.info(' > Found %s new mentions', len(notifications))
+        marks = [
+            (
+                {"indexed_at": notification.indexed_at,
+                 "uri": notification.uri},
+                notification.uri,
             )
+            for notification in reversed(notifications)
+        ] if new_mentions_complete else []
+
+        mentions = {
+            notification.uri: notification
+            for notification in reversed(notifications)
+            if notification.reason == "mention"
+            and notification.uri not in ledger
+        }
+        # Posts reposted before they were recorded in the ledger
+        reposted = await asyncio.to_thread(
+            reposted_by_viewer,
+            adapter.client,
+            mentions
+        )
+        for uri in reposted:
+            ledger.add(uri)
+            del mentions[uri]
+        return list(mentions.values()), marks
 
     def set_up_config_dict(self):
         """
@@ -130,10 +275,18 @@ class BoostMentions():
                 'BOT_CLIENTCRED_SECRET'
             )
             self.config_dict["timeline_depth_limit"] = 40
+            self.config_dict["boost_workers"] = int(
+                os.getenv("BOOST_WORKERS", str(config.BOOST_WORKERS))
+            )
         else:
             self.config_dict["api_base_url"] = "bluesky"
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     boost_mentions_handler = BoostMentions(config_dict=None, no_dry_run=True)
-    boost_mentions_handler.boost_mentions()
+    with profiled("boost_mentions", args.profile, args.profile_dir):
+        boost_mentions_handler.boost_mentions()
@@ -1,13 +1,31 @@
 """Module to boost posts containing specific tags using community bots."""
 
-import time
+import argparse
+import asyncio
+import json
 import os
 import logging
+import threading
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 import config
 from helper.login_bluesky import login_bluesky
+from helper.match_tags import matching_tags, tag_set
+from helper.platform_adapter import MASTODON_TIMELINE_LIMIT, adapter_for
+from helper.profiling import add_profile_arguments, profile_stage, profiled
+from helper.repost_ledger import RepostLedger, ledger_name
+from helper.state_store import load_state, save_state
+from helper.tag_stream import (
+    JETSTREAM_URL,
+    CursorSaver,
+    RepostQueue,
+    jetstream_post,
+    jetstream_url,
+    mastodon_status,
+    mastodon_streaming_url,
+    stream_events,
+)
 
 # Try to import platform-specific exceptions; provide safe fallbacks if unavailable.
 try:
@@ -28,11 +46,15 @@ except ImportError:  # pragma: no cover - optional dependency
 
 load_dotenv()
 
+# Tags per Mastodon hashtag timeline request: one in the path and up to
+# four more in `any[]` (the server ignores additional ones)
+TAGS_PER_REQUEST = 5
+
 
 class BoostTags:
     """
     Handles boosting of posts containing specified tags across different platforms.
-    Currently supports Bluesky. Mastodon support is stubbed.
+    Supports Bluesky and Mastodon.
     """
 
     def __init__(self, config_dict: dict | None = None, no_dry_run: bool = True) -> None:
@@ -50,28 +72,127 @@ class BoostTags:
         self.config_dict = config_dict
         self.no_dry_run = no_dry_run
 
-    def repost_tags_mastodon(self, client) -> None:
+    async def repost_tags_mastodon(self, adapter) -> None:
         """
-        Repost Mastodon statuses containing the configured tags.
+        Boost and favourite new Mastodon statuses containing the
+        configured tags.
 
-        Args:
-            client: Authenticated Mastodon client instance.
+        Several tags are covered by one hashtag timeline request (`any[]`),
+        and the requests of all tag groups run concurrently. Per tag, the
+        newest processed status id is persisted, so that only newer
+        statuses are fetched (`min_id`) on the next run.
 
-        Notes:
-            Currently non-functional since account fetching is commented out.
+        Args:
+            adapter (MastodonAdapter): Logged in Mastodon adapter.
         """
-        if "tags" not in self.config_dict:
+        tags = self._configured_tags()
+        if not tags:
             self.logger.warning("No tags configured for Mastodon reposts.")
             return
 
-        for tag in self.config_dict["tags"]:
-            tag = tag.lower().strip("# ")
-            self.logger.info("Reading timeline for new toots tagged #%s", tag)
+        state_name = self._state_name()
+        state = load_state(state_name)
+
+        profile_stage("fetch")
+        statuses = await self._fetch_tagged_statuses(adapter, tags, state)
+
+        profile_stage("boost")
+        with RepostLedger(ledger_name(self.config_dict)) as ledger:
+            to_boost = [
+                status for status in statuses
+                if self._should_boost_mastodon(status, adapter.account, ledger)
+            ]
+            results = await adapter.boost(to_boost)
+            for result in results:
+                if result["ok"]:
+                    ledger.add(result["uri"])
+            ledger.prune()
+
+        save_state(state_name, state)
+        self.logger.info(
+            "Boosted %s of %s new statuses.",
+            sum(result["ok"] for result in results),
+            len(statuses)
+        )
+
+    async def _fetch_tagged_statuses(self, adapter, tags, state) -> list:
+        """
+        Fetch the new statuses of all tags, one request chain per group
+        of `TAGS_PER_REQUEST` tags, concurrently.
+
+        Returns:
+            list: New statuses without duplicates, oldest first.
+        """
+        groups = await asyncio.gather(*(
+            self._fetch_new_statuses(
+                adapter, tags[i:i + TAGS_PER_REQUEST], state
+            )
+            for i in range(0, len(tags), TAGS_PER_REQUEST)
+        ))
+        statuses = {}
+        for group in groups:
+            for status in group:
+                statuses.setdefault(status.id, status)
+        return sorted(statuses.values(), key=lambda s: int(s.id))
+
+    def _should_boost_mastodon(self, status, account, ledger) -> bool:
+        """Skip own, already boosted and ignored servers' statuses."""
+        domain = urlparse(status.url).netloc
+        return (
+            not getattr(status, "favourited", False)
+            and not getattr(status, "reblogged", False)
+            and status.uri not in ledger
+            and domain not in config.IGNORE_SERVERS
+            and getattr(status.account, "acct", None) != account.acct
+        )
+
+    def _boost_status(self, runner, adapter, status, ledger) -> bool:
+        """
+        Boost and favourite a status as it arrives from the stream, on
+        the event loop of `runner` the adapter was logged in on.
+        """
+        self.logger.info(
+            "Boosting toot by %s (%s)",
+            status.account.username,
+            status.url,
+        )
+        result = runner.run(adapter.boost([status]))[0]
+        if result["ok"]:
+            ledger.add(status.uri)
+        return result["ok"]
+
+    async def _fetch_new_statuses(self, adapter, tags, state) -> list:
+        """
+        Fetch the statuses containing any of `tags` that are newer than
+        the persisted marks, paging forward with `min_id`.
+
+        Args:
+            adapter (MastodonAdapter): Logged in Mastodon adapter.
+            tags (list): Up to `TAGS_PER_REQUEST` tags.
+            state (dict): Per-tag newest processed status ids; the marks
+                of `tags` are moved to the newest status found.
 
+        Returns:
+            list: New statuses.
+        """
+        marks = [state.get(tag.lower(), {}).get("min_id") for tag in tags]
+        # A tag without a mark (first run) only looks at the newest page
+        min_id = None if None in marks else min(marks, key=int)
+        max_pages = self.config_dict.get("search_max_pages", 10)
+        if min_id is None:
+            max_pages = 1
+        self.logger.info(
+            "Reading timeline for new toots tagged %s",
+            ", ".join(f"#{tag}" for tag in tags)
+        )
+
+        new_statuses = []
+        for _ in range(max_pages):
             try:
-                statuses = client.timeline_hashtag(
-                    tag,
-                    limit=self.config_dict.get("timeline_depth_limit", 40),
+                page = await adapter.search(
+                    tags[0],
+                    min_id=min_id,
+                    any_tags=tags[1:]
                 )
             except (
                 MastodonNetworkError,
@@ -79,32 +200,30 @@ class BoostTags:
                 ConnectionError,
                 TimeoutError
             ) as e:
-                # NOTE: Replace/extend with library-specific 
-                # exceptions as needed.
                 self.logger.error(
-                    "Network/API error when fetching statuses: %s. Retrying...",
+                    "Network/API error when fetching statuses: %s.",
                     e
                 )
-                time.sleep(30)
-                continue
-
-            time.sleep(0.1)  # rate limiting
+                page = None
+            if not page:
+                break
+            new_statuses.extend(page)
+            min_id = max((status.id for status in page), key=int)
+            if len(page) < MASTODON_TIMELINE_LIMIT:
+                break
+        else:
+            if None not in marks:
+                self.logger.warning(
+                    "Stopped after %s pages before reaching the newest toot.",
+                    max_pages
+                )
 
-            for status in statuses:
-                domain = urlparse(status.url).netloc
-                if (
-                    not getattr(status, "favourited", False)
-                    and domain not in config.IGNORE_SERVERS
-                    and getattr(status.account, "acct", None) != self.config_dict.get("username")
-                ):
-                    self.logger.info(
-                        "Boosting toot by %s tagged #%s (%s)",
-                        status.account.username,
-                        tag,
-                        status.url,
-                    )
-                    client.status_reblog(status.id)
-                    client.status_favourite(status.id)
+        if new_statuses:
+            newest = str(max((status.id for status in new_statuses), key=int))
+            for tag in tags:
+                state[tag.lower()] = {"min_id": newest}
+        self.logger.info("Found %s new toots", len(new_statuses))
+        return new_statuses
 
     def boost_tags(self) -> None:
         """
@@ -124,10 +243,9 @@ class BoostTags:
         self.logger.info("Connecting to %s", self.config_dict["api_base_url"])
 
         if platform == "mastodon":
-            self._boost_tags_mastodon()
-            self.logger.warning("Mastodon support is currently not implemented.")
+            asyncio.run(self._boost_tags_mastodon())
         elif platform == "bluesky":
-            self._boost_tags_bluesky()
+            asyncio.run(self._boost_tags_bluesky())
         else:
             self.logger.error("Unsupported platform: %s", platform)
 
@@ -139,6 +257,12 @@ class BoostTags:
             "username": os.getenv("USERNAME"),
             "client_name": os.getenv("CLIENT_NAME", "CommunityBot"),
             "tags": os.getenv("TAGS_TO_BOOST", "").split(","),
+            "search_mode": os.getenv("SEARCH_MODE", "incremental"),
+            "search_max_pages": 10,
+            "search_workers": int(
+                os.getenv("SEARCH_WORKERS", str(config.SEARCH_WORKERS))
+            ),
+            "streaming_url": os.getenv("STREAMING_URL"),
         }
         if self.config_dict["platform"] == "mastodon":
             self.config_dict.update({
@@ -147,68 +271,366 @@ class BoostTags:
                 "access_token": os.getenv("ACCESS_TOKEN"),
                 "client_cred_file": os.getenv("BOT_CLIENTCRED_SECRET"),
                 "timeline_depth_limit": 40,
+                "boost_workers": int(
+                    os.getenv("BOOST_WORKERS", str(config.BOOST_WORKERS))
+                ),
             })
         else:
             self.config_dict["api_base_url"] = "bluesky"
 
-    def _boost_tags_mastodon(self) -> None:
-        """Handle reposting tags on Mastodon."""
-        # # Commented because it wasn't fully working
-
-        # account, client = login_mastodon(config_dict)
-        # self.logger.info(f" > Fetched account data for {account.acct}")
+    async def _boost_tags_mastodon(self) -> None:
+        """Handle boosting tags on Mastodon."""
+        if not self.no_dry_run:
+            self.logger.info("Dry-run mode: no boosts will be made.")
+            return
 
-        # repost_tags_mastodon(client, config_dict)
-        self.logger.info(
-            """
-            This feature currently doesn't work for Mastodon.
-            It's deployed using AWS.
-            """
-        )
+        profile_stage("login")
+        adapter = await adapter_for(self.config_dict).login()
+        self.logger.info("Fetched account data for %s", adapter.account.acct)
+        await self.repost_tags_mastodon(adapter)
+        self.logger.info("Finished processing Mastodon boosts.")
 
-    def _boost_tags_bluesky(self) -> None:
+    async def _boost_tags_bluesky(self) -> None:
         """Handle reposting tags on Bluesky."""
         if not self.no_dry_run:
             self.logger.info("Dry-run mode: no reposts will be made.")
             return
 
-        client = login_bluesky(self.config_dict)
+        profile_stage("login")
+        tags = self._configured_tags()
+        # The searches are bounded by `search_workers`
+        adapter = await adapter_for(
+            self.config_dict,
+            max_concurrency=self.config_dict.get("search_workers", 1)
+        ).login()
         self.logger.info("Fetched Bluesky account data.")
         self.logger.info("Starting search-loop for reposting.")
 
-        timeline = client.get_timeline(algorithm="reverse-chronological")
-        seen_cids = {post.post.cid for post in timeline.feed}
-
-        for tag in self.config_dict["tags"]:
-            response = client.app.bsky.feed.search_posts(
-                params={"q": tag, "tag": [tag], "sort": "top", "limit": 50}
+        with RepostLedger(ledger_name(self.config_dict)) as ledger:
+            incremental = self.config_dict.get("search_mode") == "incremental"
+            state_name = self._state_name()
+            state = load_state(state_name) if incremental else {}
+
+            followed = tag_set(tags)
+            # Searches run concurrently; their results are merged so that a
+            # post carrying several followed tags is reposted only once,
+            # and the reposts are then written in batches.
+            profile_stage("search")
+            searches = await asyncio.gather(
+                *(
+                    self._search_tag_bluesky(adapter, tag, state, incremental)
+                    for tag in tags
+                ),
+                return_exceptions=True
             )
+            candidates = set()
+            to_repost = []
+            for tag, posts in zip(tags, searches):
+                if isinstance(posts, AtProtocolError):
+                    self.logger.error("Search for #%s failed: %s", tag, posts)
+                    continue
+                if isinstance(posts, BaseException):
+                    raise posts
+
+                for post in posts:
+                    if post.uri in candidates:
+                        continue
+                    candidates.add(post.uri)
+                    if not matching_tags(post.record, followed):
+                        continue
+
+                    if post.uri in ledger:
+                        continue
+                    # Search results carry the account's viewer state
+                    if post.viewer and post.viewer.repost:
+                        ledger.add(post.uri)
+                        continue
+                    to_repost.append(post)
+
+            profile_stage("repost")
+            await self._repost_bluesky(adapter, to_repost, ledger)
+            if incremental:
+                save_state(state_name, state)
+            ledger.prune()
+        self.logger.info("Finished processing Bluesky reposts.")
+
+    def stream_tags(self, stop_event: threading.Event | None = None) -> None:
+        """
+        Long-running alternative to `boost_tags`: subscribe to the
+        platform's stream of new posts and boost matching posts as they
+        arrive, until `stop_event` is set (or the process is interrupted).
+
+        Bluesky posts come from Jetstream, Mastodon statuses from the
+        hashtag streams of the streaming API. The stream URL can be
+        overridden with `streaming_url` (e.g. to replay recorded events).
+
+        Args:
+            stop_event (threading.Event | None): Stops the stream when set.
+        """
+        if self.config_dict is None and self.no_dry_run:
+            self._load_config_from_env()
+        stop_event = stop_event or threading.Event()
+
+        platform = self.config_dict.get("platform")
+        self.logger.info(
+            "Streaming posts for %s",
+            self.config_dict.get("client_name", "Unknown")
+        )
+        try:
+            if platform == "mastodon":
+                self._stream_tags_mastodon(stop_event)
+            elif platform == "bluesky":
+                self._stream_tags_bluesky(stop_event)
+            else:
+                self.logger.error("Unsupported platform: %s", platform)
+        except KeyboardInterrupt:
+            self.logger.info("Stopping the stream.")
+
+    def _stream_tags_bluesky(self, stop_event: threading.Event) -> None:
+        """Repost matching posts from Jetstream, resuming at the cursor."""
+        client = login_bluesky(self.config_dict)
+        followed = tag_set(self._configured_tags())
+        own_did = client.me.did
+        state_name = f"{self._state_name()}_stream"
+        state = load_state(state_name)
+        base_url = self.config_dict.get("streaming_url") or JETSTREAM_URL
+
+        with RepostLedger(ledger_name(self.config_dict)) as ledger:
+            def repost(item):
+                uri, cid = item
+                try:
+                    if not self.no_dry_run:
+                        self.logger.info("Dry-run: would repost %s", uri)
+                        return
+                    client.repost(uri=uri, cid=cid)
+                    ledger.add(uri)
+                    self.logger.info("Reposted %s", uri)
+                finally:
+                    queued.discard(uri)
+
+            writer = RepostQueue(repost)
+            saver = CursorSaver(lambda: save_state(state_name, state))
+            queued = set()
+            try:
+                for event in stream_events(
+                    lambda: jetstream_url(base_url, state.get("cursor")),
+                    stop_event
+                ):
+                    if event.get("time_us"):
+                        state["cursor"] = event["time_us"]
+                    post = jetstream_post(event)
+                    if post is not None:
+                        uri, cid, record = post
+                        if (
+                            event.get("did") != own_did
+                            and uri not in queued
+                            and matching_tags(record, followed)
+                            and uri not in ledger
+                        ):
+                            queued.add(uri)
+                            writer.put((uri, cid))
+                    saver.tick()
+            finally:
+                writer.close()
+                saver.flush()
+                ledger.prune()
+
+    def _stream_tags_mastodon(self, stop_event: threading.Event) -> None:
+        """
+        Boost statuses from the hashtag streams. On every (re)connect the
+        statuses missed in between are fetched from the hashtag timelines
+        starting at the persisted `min_id` marks.
+        """
+        # The boosts run on the event loop of this runner, in the writer
+        # thread only (the catch-up runs in the stream's thread)
+        runner = asyncio.Runner()
+        adapter = runner.run(adapter_for(self.config_dict).login())
+        access_token = adapter.client.access_token
+        tags = self._configured_tags()
+        state_name = self._state_name()
+        state = load_state(state_name)
+        url = (
+            self.config_dict.get("streaming_url")
+            or mastodon_streaming_url(self.config_dict["api_base_url"])
+        )
+
+        with RepostLedger(ledger_name(self.config_dict)) as ledger:
+            def boost(status):
+                try:
+                    if not self.no_dry_run:
+                        self.logger.info("Dry-run: would boost %s", status.url)
+                        return
+                    self._boost_status(runner, adapter, status, ledger)
+                finally:
+                    queued.discard(status.id)
+
+            writer = RepostQueue(boost)
+            saver = CursorSaver(lambda: save_state(state_name, state))
+            queued = set()
+
+            def enqueue(status):
+                if status.id not in queued and self._should_boost_mastodon(
+                    status, adapter.account, ledger
+                ):
+                    queued.add(status.id)
+                    writer.put(status)
+
+            async def catch_up():
+                # Every reconnect runs its own event loop (and adapter)
+                reader = await adapter_for(self.config_dict).login()
+                return await self._fetch_tagged_statuses(reader, tags, state)
+
+            def subscribe(websocket):
+                for tag in tags:
+                    websocket.send(json.dumps(
+                        {"type": "subscribe", "stream": "hashtag", "tag": tag}
+                    ))
+                for status in asyncio.run(catch_up()):
+                    enqueue(status)
+                saver.flush()
+
+            try:
+                for message in stream_events(
+                    lambda: url,
+                    stop_event,
+                    on_connect=subscribe,
+                    headers={"Authorization": f"Bearer {access_token}"},
+                ):
+                    if message.get("event") != "update":
+                        continue
+                    status = mastodon_status(message["payload"])
+                    for tag in message.get("stream", [])[1:]:
+                        mark = state.get(tag.lower(), {}).get("min_id")
+                        if mark is None or int(status.id) > int(mark):
+                            state[tag.lower()] = {"min_id": str(status.id)}
+                    enqueue(status)
+                    saver.tick()
+            finally:
+                writer.close()
+                runner.close()
+                saver.flush()
+                ledger.prune()
+
+    def _configured_tags(self) -> list:
+        """Configured tags without '#' and duplicates, in their given order."""
+        tags = self.config_dict.get("tags", [])
+        if isinstance(tags, str):
+            tags = tags.split(",")
+        unique_tags = {}
+        for tag in tags:
+            tag = tag.strip().lstrip("#")
+            if tag:
+                unique_tags.setdefault(tag.lower(), tag)
+        return list(unique_tags.values())
+
+    async def _search_tag_bluesky(self, adapter, tag: str, state: dict,
+                                  incremental: bool) -> list:
+        """Search the posts tagged with `tag`."""
+        if incremental:
+            return await self._search_new_posts_bluesky(adapter, tag, state)
+        response = await adapter.search(tag, sort="top", limit=50)
+        return response.posts
+
+    async def _repost_bluesky(self, adapter, posts: list, ledger) -> None:
+        """Repost posts in batches and record them in the ledger."""
+        results = await adapter.boost(posts)
+        for post, result in zip(posts, results):
+            if result["ok"]:
+                ledger.add(post.uri)
+                self.logger.info(
+                    "Reposted post by %s (ref: %s)",
+                    post.author.handle, result["repost_uri"]
+                )
+            else:
+                self.logger.error(
+                    "Failed to repost URI %s, CID %s: %s",
+                    post.uri,
+                    post.cid,
+                    result["error"],
+                )
+
+    def _state_name(self) -> str:
+        """Name of the state file holding the per-tag high-water marks."""
+        return (
+            f"boost_tags_{self.config_dict.get('platform')}_"
+            f"{self.config_dict.get('client_name')}"
+        )
+
+    async def _search_new_posts_bluesky(self, adapter, tag: str,
+                                        state: dict) -> list:
+        """
+        Search posts tagged with `tag` sorted by latest and page with the
+        cursor until the high-water mark of the previous run is reached.
+
+        Args:
+            adapter (BlueskyAdapter): Logged in Bluesky adapter.
+            tag (str): Tag to search for.
+            state (dict): Per-tag high-water marks; the mark of `tag` is
+                moved to the newest post found, unless the pages ran out
+                before the mark was reached (the posts in between would
+                be skipped otherwise).
+
+        Returns:
+            list: New posts, oldest first.
+        """
+        mark = state.get(tag.lower())
+        max_pages = self.config_dict.get("search_max_pages", 10)
+        if mark is None:
+            # First run: only look at the newest page
+            max_pages = 1
+
+        new_posts = []
+        cursor = None
+        reached_mark = False
+        # Whether all posts since the mark were read
+        new_posts_complete = True
+        for _ in range(max_pages):
+            response = await adapter.search(tag, cursor=cursor)
+
             for post in response.posts:
-                tags_in_post = {
-                    t.strip("#").lower()
-                    for t in post.record.text.split()
-                    if t.startswith("#")
-                }
-
-                if tag.lower() in tags_in_post and post.cid not in seen_cids:
-                    try:
-                        result = client.repost(uri=post.uri, cid=post.cid)
-                        self.logger.info(
-                            "Reposted post by %s (ref: %s)",
-                            post.author.handle, result
-                        )
-                    except AtProtocolError as e:
-                        self.logger.error(
-                            "Failed to repost URI %s, CID %s: %s",
-                            post.uri,
-                            post.cid,
-                            e,
-                        )
-                    time.sleep(0.1)  # avoid hammering API
+                if mark and (
+                    post.cid == mark["cid"]
+                    or post.indexed_at < mark["indexed_at"]
+                ):
+                    reached_mark = True
+                    break
+                new_posts.append(post)
 
-        self.logger.info("Finished processing Bluesky reposts.")
+            cursor = response.cursor
+            if reached_mark or not cursor:
+                break
+        else:
+            if mark is not None:
+                self.logger.warning(
+                    "Stopped after %s pages for #%s before reaching the "
+                    "last processed post; keeping its mark.",
+                    max_pages,
+                    tag
+                )
+                new_posts_complete = False
+
+        self.logger.info("Found %s new posts tagged #%s", len(new_posts), tag)
+        if new_posts and new_posts_complete:
+            state[tag.lower()] = {
+                "indexed_at": new_posts[0].indexed_at,
+                "cid": new_posts[0].cid,
+            }
+        return list(reversed(new_posts))
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Run as a daemon boosting posts from the platform's stream",
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     bot = BoostTags()
-    bot.boost_tags()
+    with profiled("boost_tags", args.profile, args.profile_dir):
+        if args.stream:
+            bot.stream_tags()
+        else:
+            bot.boost_tags()
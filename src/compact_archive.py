@@ -0,0 +1,377 @@
+"""
+Module to compact the archive of posted links and downloaded images.
+
+- Every `file.json` is deduplicated and normalized to `{"link": [...]}`.
+- Archive directories that no feed in the metadata maps to anymore are
+  merged into the directory of the matching feed.
+- Downloaded blog images are dropped once the entry they were downloaded
+  for is in the archive (they are only needed until the post is sent),
+  as well as anniversary images no event references. Images of entries
+  not posted yet are kept.
+
+Usage (from the repository root):
+
+    python src/compact_archive.py            # report only
+    python src/compact_archive.py --apply    # compact the archive
+"""
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+from helper.image_manifest import MANIFEST_NAME
+from promote_blog_post import IMAGE_LINKS_NAME, PromoteBlogPost
+
+ARCHIVE_ROOT = Path('archive')
+EVENTS_FILE = Path('metadata/events.json')
+ANNIVERSARY_IMAGES = 'anniversary_images'
+
+
+class CompactArchive:
+    """
+    Class to handle compacting the archive directories.
+    """
+    def __init__(self, config_dict=None, no_dry_run=True):
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+        self.config_dict = config_dict or {}
+        self.no_dry_run = no_dry_run
+
+        self.archive_root = Path(
+            self.config_dict.get('archive_root', ARCHIVE_ROOT)
+        )
+        self.stats = {
+            'files_normalized': 0,
+            'duplicates_removed': 0,
+            'directories_merged': 0,
+            'images_removed': 0,
+            'bytes_before': 0,
+            'bytes_after': 0,
+        }
+        # Dry runs change nothing, so the space they would reclaim is
+        # estimated from the files that would be removed or rewritten.
+        self.bytes_estimate = 0
+        self.merged_files = set()
+
+    def compact_archive(self):
+        """
+        Compact all archives and image directories and report the result.
+        """
+        self.stats['bytes_before'] = self.directory_size(self.archive_root)
+        load_time_before = self.measure_load_time()
+
+        for archive_dir in self.archive_directories():
+            self.merge_orphaned_directories(archive_dir)
+            for archive_file in sorted(archive_dir.rglob('file.json')):
+                self.normalize_archive_file(archive_file)
+
+        for images_dir in self.image_directories():
+            if images_dir.name == ANNIVERSARY_IMAGES:
+                self.prune_anniversary_images(images_dir)
+            else:
+                self.prune_blog_images(images_dir)
+            self.remove_empty_directories(images_dir)
+
+        self.stats['bytes_after'] = self.directory_size(self.archive_root)
+        load_time_after = self.measure_load_time()
+        self.report(load_time_before, load_time_after)
+
+    def archive_directories(self):
+        """Directories holding `file.json` archives of posted links."""
+        return sorted(
+            path for path in self.archive_root.iterdir()
+            if path.is_dir() and '_archive_directory' in path.name
+        )
+
+    def image_directories(self):
+        """Directories holding downloaded images."""
+        return sorted(
+            path for path in self.archive_root.iterdir()
+            if path.is_dir() and path.name.endswith('_images')
+        )
+
+    @staticmethod
+    def normalize_links(rss_feed_archive):
+        """
+        Return the deduplicated list of links of an archive, accepting the
+        legacy shapes (a bare list of links, or a single link string).
+
+        Returns:
+            list[str] | None: Links in first-seen order or None if the
+                shape is unknown.
+        """
+        if isinstance(rss_feed_archive, dict):
+            links = rss_feed_archive.get('link')
+        else:
+            links = rss_feed_archive
+        if isinstance(links, str):
+            links = [links]
+        if not isinstance(links, list):
+            return None
+
+        return list(dict.fromkeys(
+            link.strip()
+            for link in links
+            if isinstance(link, str) and link.strip()
+        ))
+
+    @staticmethod
+    def read_archive(archive_file):
+        """Read an archive file, returning None if it is not valid JSON."""
+        try:
+            with archive_file.open('rb') as fp:
+                return json.load(fp)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def write_json(self, path, data):
+        """
+        Write `data` as indented JSON and record how much smaller the file
+        gets (the write is skipped in dry runs).
+        """
+        text = json.dumps(data, ensure_ascii=False, indent=4)
+        old_size = path.stat().st_size if path.is_file() else 0
+        self.bytes_estimate += old_size - len(text.encode('utf-8'))
+        if not self.no_dry_run:
+            return
+        with path.open('w', encoding='utf-8') as fp:
+            fp.write(text)
+
+    def write_archive(self, archive_file, links):
+        """Write links in the normalized archive format."""
+        self.write_json(archive_file, {'link': links})
+
+    def normalize_archive_file(self, archive_file):
+        """Deduplicate and normalize a single `file.json`."""
+        if archive_file in self.merged_files:
+            return
+        rss_feed_archive = self.read_archive(archive_file)
+        links = self.normalize_links(rss_feed_archive)
+        if links is None:
+            self.logger.warning('Unknown archive format: %s', archive_file)
+            return
+
+        if rss_feed_archive == {'link': links}:
+            return
+
+        number_of_links = len(rss_feed_archive.get('link', [])) \
+            if isinstance(rss_feed_archive, dict) else len(rss_feed_archive)
+        self.stats['files_normalized'] += 1
+        self.stats['duplicates_removed'] += max(
+            number_of_links - len(links), 0
+        )
+        self.logger.info('Normalizing %s', archive_file)
+        self.write_archive(archive_file, links)
+
+    def expected_archive_paths(self, archive_dir):
+        """
+        Archive paths (relative to `archive/`) the blog bot reads for the
+        feeds in the matching metadata file, keyed by feed name slug.
+        """
+        bot = archive_dir.name.split('_', 1)[0]
+        meta_data_file = Path(f'metadata/{bot}_meta_data.json')
+        if not meta_data_file.is_file():
+            return {}
+
+        with meta_data_file.open(encoding='utf-8') as fp:
+            feeds = json.load(fp)
+
+        promote_blog_post = PromoteBlogPost(
+            config_dict={'archive': archive_dir.name},
+            no_dry_run=False
+        )
+        expected = {}
+        for feed in feeds:
+            if not feed.get('rss_feed'):
+                continue
+            feed = promote_blog_post.get_folder_path(dict(feed))
+            slug = feed['name'].lower().replace(' ', '-')
+            expected[slug] = Path(feed['ARCHIVE'][0])
+        return expected
+
+    def merge_target(self, orphan, expected):
+        """
+        Find the archive directory an orphaned directory belongs to: the
+        feed with the same name slug, otherwise the only feed of the same
+        domain.
+        """
+        relative = orphan.relative_to(self.archive_root)
+        if len(relative.parts) < 2:
+            return None
+        domain = relative.parts[1]
+        for part in reversed(relative.parts[2:]):
+            if part in expected:
+                return expected[part]
+
+        same_domain = [
+            path for path in expected.values()
+            if path.relative_to(self.archive_root).parts[1] == domain
+        ]
+        if len(same_domain) == 1:
+            return same_domain[0]
+        return None
+
+    def merge_orphaned_directories(self, archive_dir):
+        """Merge archive directories that no feed maps to anymore."""
+        expected = self.expected_archive_paths(archive_dir)
+        if not expected:
+            return
+        expected_paths = set(expected.values())
+
+        for archive_file in sorted(archive_dir.rglob('file.json')):
+            orphan = archive_file.parent
+            if orphan in expected_paths:
+                continue
+
+            target = self.merge_target(orphan, expected)
+            if target is None or target == orphan:
+                self.logger.info('No feed found for orphan %s', orphan)
+                continue
+
+            orphan_links = self.normalize_links(
+                self.read_archive(archive_file)
+            ) or []
+            target_file = target / 'file.json'
+            target_links = self.normalize_links(
+                self.read_archive(target_file)
+            ) or []
+
+            self.logger.info('Merging %s into %s', orphan, target)
+            self.stats['directories_merged'] += 1
+            if self.no_dry_run:
+                target.mkdir(parents=True, exist_ok=True)
+            self.write_archive(
+                target_file,
+                list(dict.fromkeys(target_links + orphan_links))
+            )
+            self.merged_files.add(archive_file)
+            self.bytes_estimate += archive_file.stat().st_size
+            if self.no_dry_run:
+                archive_file.unlink()
+                self.remove_empty_directories(archive_dir)
+
+    def remove_file(self, path):
+        """Remove an image file and record it."""
+        self.stats['images_removed'] += 1
+        self.logger.info('Removing %s', path)
+        self.bytes_estimate += path.stat().st_size
+        if self.no_dry_run:
+            path.unlink()
+
+    def posted_links(self, images_dir):
+        """
+        Links in the archives of the bot an image directory belongs to
+        (all platforms), i.e. the entries that were posted.
+        """
+        bot = images_dir.name.split('_', 1)[0]
+        links = set()
+        for archive_dir in self.archive_directories():
+            if archive_dir.name.split('_', 1)[0] != bot:
+                continue
+            for archive_file in archive_dir.rglob('file.json'):
+                links.update(
+                    self.normalize_links(self.read_archive(archive_file))
+                    or []
+                )
+        return links
+
+    def prune_blog_images(self, images_dir):
+        """
+        Drop downloaded blog images whose entry is in the archive. Images
+        of entries not posted yet are kept; images without a recorded
+        entry are dropped (they get downloaded again if needed).
+        """
+        index_file = images_dir / IMAGE_LINKS_NAME
+        image_links = self.read_archive(index_file)
+        if not isinstance(image_links, dict):
+            image_links = {}
+        posted = self.posted_links(images_dir)
+
+        pending = {}
+        for path in sorted(images_dir.rglob('*')):
+            if not path.is_file() or path == index_file:
+                continue
+            image = path.relative_to(images_dir).as_posix()
+            link = image_links.get(image)
+            if link is None or link in posted:
+                self.remove_file(path)
+            else:
+                pending[image] = link
+
+        if index_file.is_file():
+            self.write_json(index_file, pending)
+
+    def prune_anniversary_images(self, images_dir):
+        """Drop anniversary images no event in events.json refers to."""
+        if not EVENTS_FILE.is_file():
+            return
+        with EVENTS_FILE.open(encoding='utf-8') as fp:
+            referenced = {event.get('img') for event in json.load(fp)}
+        referenced.add(MANIFEST_NAME)
+
+        for path in sorted(images_dir.rglob('*')):
+            if path.is_file() and path.name not in referenced:
+                self.remove_file(path)
+
+    def remove_empty_directories(self, root):
+        """Remove empty directories below (not including) `root`."""
+        if not self.no_dry_run:
+            return
+        for path in sorted(root.rglob('*'), reverse=True):
+            if path.is_dir() and not any(path.iterdir()):
+                path.rmdir()
+
+    @staticmethod
+    def directory_size(root):
+        """Total size of all files below `root` in bytes."""
+        return sum(
+            path.stat().st_size
+            for path in root.rglob('*')
+            if path.is_file()
+        )
+
+    def measure_load_time(self):
+        """Time it takes to load every archive file once (in seconds)."""
+        start = time.perf_counter()
+        for archive_dir in self.archive_directories():
+            for archive_file in archive_dir.rglob('file.json'):
+                self.read_archive(archive_file)
+        return time.perf_counter() - start
+
+    def report(self, load_time_before, load_time_after):
+        """Log a summary of the compaction."""
+        self.logger.info("=========================================")
+        if not self.no_dry_run:
+            self.logger.info('Dry run: nothing was changed.')
+        for key, value in self.stats.items():
+            self.logger.info('%s: %s', key, value)
+        if self.no_dry_run:
+            reclaimed = self.stats['bytes_before'] - self.stats['bytes_after']
+            self.logger.info('Space reclaimed: %.1f KB', reclaimed / 1024)
+        else:
+            self.logger.info(
+                'Space reclaimed (estimate): %.1f KB',
+                self.bytes_estimate / 1024
+            )
+        self.logger.info(
+            'Archive load time: %.2f ms before, %.2f ms after',
+            load_time_before * 1000,
+            load_time_after * 1000
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Compact the archive of posted links and images.'
+    )
+    parser.add_argument(
+        '--apply',
+        action='store_true',
+        help='Change the archive (default: only report).'
+    )
+    args = parser.parse_args()
+
+    compact_archive_handler = CompactArchive(no_dry_run=args.apply)
+    compact_archive_handler.compact_archive()
@@ -3,6 +3,10 @@
 # The URL of the mastodon instance your bot is on
 API_BASE_URL = 'https://botsin.space'
 
+# XRPC endpoint used to resolve Bluesky handles (a bot's `base_url`
+# overrides it, e.g. to point at benchmarks/fake_servers.py)
+BLUESKY_XRPC_URL = 'https://bsky.social/xrpc'
+
 # Tags that your bot will reboost
 TAGS = ['rladies']
 
@@ -16,3 +20,19 @@ IGNORE_SERVERS = []  # ['botsin.space', ]
 MASTODON_VISIBILITY = 'public'
 
 # ARCHIVE = 'archive_directory'
+
+# Upper bounds when downloading RSS/Atom feeds (None reads the full feed)
+FEED_MAX_BYTES = 2 * 1024 * 1024  # 2 MB
+
+FEED_MAX_ENTRIES = 20
+
+# Number of tag searches BoostTags runs in parallel (1 searches one by one)
+SEARCH_WORKERS = 4
+
+# Number of concurrent reblog/favourite requests on Mastodon (BoostTags
+# and BoostMentions)
+BOOST_WORKERS = 2
+
+# Bluesky handles resolved to DIDs that are kept in memory (entries, seconds)
+DID_CACHE_SIZE = 1024
+DID_CACHE_TTL = 24 * 60 * 60
@@ -1,4 +1,5 @@
 """Module to get RSS metadata from JSON files."""
+import argparse
 import re
 import os
 import json
@@ -7,6 +8,8 @@ import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+from helper.profiling import add_profile_arguments, profile_stage, profiled
+
 load_dotenv()
 
 REQUEST_TIMEOUT = 10  # seconds
@@ -37,9 +40,12 @@ class RSSData:
         """
         Retrieve and save RSS metadata.
         """
+        profile_stage("fetch")
         contents_list = self.get_json_data()
+        profile_stage("extract")
         meta_data = self.get_meta_data(contents_list)
 
+        profile_stage("save")
         if self.no_dry_run:
             with open(self.json_file, "w", encoding="utf-8") as fp:
                 json.dump(meta_data, fp, ensure_ascii=False, indent=2)
@@ -190,5 +196,10 @@ class RSSData:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     rss_data_handler = RSSData(config_dict=None, no_dry_run=True)
-    rss_data_handler.get_rss_data()
+    with profiled("get_rss_data", args.profile, args.profile_dir):
+        rss_data_handler.get_rss_data()
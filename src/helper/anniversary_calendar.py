@@ -0,0 +1,212 @@
+"""
+Module with the compiled anniversary calendar.
+
+`metadata/events.json` is compiled into one bucket file per day
+(`MM-DD.json`) holding the ready-to-send posts of that day's events, so
+the daily run only reads a single small file. The index records a hash
+of events.json; if it changed, the calendar is stale and is recompiled.
+The index also holds the resolved Bluesky DIDs and the handles that
+could not be resolved; while there are any, the calendar is recompiled
+on every run to retry them (reusing the resolved DIDs).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+EVENTS_FILE = Path('metadata/events.json')
+CALENDAR_DIR = Path('metadata/anniversary_calendar')
+INDEX_FILE = 'index.json'
+
+REQUIRED_FIELDS = (
+    'name',
+    'date',
+    'description_bluesky',
+    'description_mastodon',
+    'img',
+    'alt',
+    'wiki_link',
+)
+# Maximum post lengths (Bluesky counts graphemes, Mastodon characters)
+MAX_LENGTH = {
+    'mastodon': 500,
+    'bluesky': 300,
+}
+# Code points that do not start a new grapheme: variation selectors,
+# zero width joiner and emoji skin tone modifiers
+_EXTENDING = {'\ufe0e', '\ufe0f', '\u200d'} | {
+    chr(code_point) for code_point in range(0x1F3FB, 0x1F400)
+}
+
+
+def grapheme_length(text: str) -> int:
+    """
+    Approximate the number of graphemes of a text, which is how Bluesky
+    measures post length.
+    """
+    length = 0
+    previous = ''
+    for char in text:
+        if char in _EXTENDING or unicodedata.combining(char):
+            previous = char
+            continue
+        if previous != '\u200d':
+            length += 1
+        previous = char
+    return length
+
+
+def post_length(platform: str, text: str) -> int:
+    """Length of a post as the platform counts it."""
+    if platform == 'bluesky':
+        return grapheme_length(text)
+    return len(text)
+
+
+def events_hash(events_file=EVENTS_FILE) -> str:
+    """SHA-256 of the events file."""
+    return hashlib.sha256(Path(events_file).read_bytes()).hexdigest()
+
+
+def validate_event(event: dict) -> list:
+    """
+    Validate an event of events.json.
+
+    Returns:
+        list[str]: Problems found (empty if the event is valid).
+    """
+    name = event.get('name') or '<unnamed>'
+    problems = [
+        f"{name}: missing field '{field}'"
+        for field in REQUIRED_FIELDS
+        if field not in event
+    ]
+    if event.get('date'):
+        try:
+            datetime.strptime(f"2000-{event['date']}", '%Y-%m-%d')
+        except ValueError:
+            problems.append(f"{name}: invalid date '{event['date']}'")
+    return problems
+
+
+def compile_calendar(events: list, build_payloads) -> tuple:
+    """
+    Validate the events and group their precomputed posts by day.
+
+    Args:
+        events (list[dict]): Events of events.json.
+        build_payloads: Callable returning the payloads of an event per
+            platform ({'mastodon': {'text': ...}, 'bluesky': {...}}).
+
+    Returns:
+        tuple: (calendar, problems) with `calendar` mapping 'MM-DD' to the
+            list of compiled entries and `problems` listing validation
+            errors and posts exceeding the platform limits.
+    """
+    calendar = {}
+    problems = []
+    for event in events:
+        event_problems = validate_event(event)
+        problems.extend(event_problems)
+        if event_problems or not event.get('date'):
+            continue
+
+        payloads = build_payloads(event)
+        for platform, payload in payloads.items():
+            payload['length'] = post_length(platform, payload['text'])
+            if payload['length'] > MAX_LENGTH[platform]:
+                problems.append(
+                    f"{event['name']}: {platform} post has "
+                    f"{payload['length']} characters "
+                    f"(limit {MAX_LENGTH[platform]})"
+                )
+        calendar.setdefault(event['date'], []).append({
+            'event': event,
+            'payloads': payloads,
+        })
+    return calendar, problems
+
+
+def save_calendar(calendar: dict, source_hash: str,
+                  calendar_dir=CALENDAR_DIR, dids=None,
+                  unresolved_handles=None) -> None:
+    """
+    Write one bucket file per day and the index.
+
+    Args:
+        calendar (dict): Compiled entries per 'MM-DD'.
+        source_hash (str): Hash of the compiled events.json.
+        calendar_dir: Directory of the calendar.
+        dids (dict | None): Resolved DID per Bluesky handle.
+        unresolved_handles (list | None): Bluesky handles that could not
+            be resolved (retried on the next run).
+    """
+    calendar_dir = Path(calendar_dir)
+    calendar_dir.mkdir(parents=True, exist_ok=True)
+    for stale_bucket in calendar_dir.glob('[0-9][0-9]-[0-9][0-9].json'):
+        if stale_bucket.stem not in calendar:
+            stale_bucket.unlink()
+    for day, entries in calendar.items():
+        with open(calendar_dir / f'{day}.json', 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+    with open(calendar_dir / INDEX_FILE, 'w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'source_sha256': source_hash,
+                'days': sorted(calendar),
+                'dids': dict(sorted((dids or {}).items())),
+                'unresolved_handles': sorted(unresolved_handles or []),
+            },
+            f,
+            indent=2
+        )
+    logger.info(
+        ' > Compiled %s days of anniversaries to %s',
+        len(calendar),
+        calendar_dir
+    )
+
+
+def load_index(calendar_dir=CALENDAR_DIR) -> dict:
+    """Index of the calendar (empty if there is none)."""
+    try:
+        with open(Path(calendar_dir) / INDEX_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def is_stale(events_file=EVENTS_FILE, calendar_dir=CALENDAR_DIR) -> bool:
+    """
+    True if the calendar is missing, events.json changed since or Bluesky
+    handles are left to be resolved.
+    """
+    index = load_index(calendar_dir)
+    return (
+        index.get('source_sha256') != events_hash(events_file)
+        or bool(index.get('unresolved_handles'))
+    )
+
+
+def load_day(day: str, calendar_dir=CALENDAR_DIR) -> list:
+    """
+    Load the compiled entries of a day.
+
+    Args:
+        day (str): Day as 'MM-DD'.
+
+    Returns:
+        list[dict]: Entries with the 'event' and its 'payloads'.
+    """
+    path = Path(calendar_dir) / f'{day}.json'
+    if not os.path.isfile(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,116 @@
+"""
+Module to repost several Bluesky posts with few requests.
+
+The repost records are created in groups with
+`com.atproto.repo.applyWrites`. A group is written atomically, so if it
+is rejected (e.g. because one of the posts was deleted in the meantime)
+its posts are reposted one by one to find out which of them failed.
+"""
+
+import logging
+
+from atproto import models
+from atproto.exceptions import AtProtocolError
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+REPOST_COLLECTION = 'app.bsky.feed.repost'
+BATCH_SIZE = 25  # writes per applyWrites request (the PDS accepts 200)
+GET_POSTS_LIMIT = 25  # maximum number of URIs per app.bsky.feed.getPosts
+
+
+def reposted_by_viewer(client, uris) -> set:
+    """
+    Look up which posts the logged in account has already reposted.
+
+    The posts are resolved with `app.bsky.feed.getPosts` in groups of 25
+    and their `viewer.repost` is read.
+
+    Args:
+        client: Authenticated Bluesky client.
+        uris (Iterable[str]): URIs of the posts.
+
+    Returns:
+        set: URIs of the posts that were already reposted.
+    """
+    uris = list(dict.fromkeys(uris))
+    reposted = set()
+    for i in range(0, len(uris), GET_POSTS_LIMIT):
+        response = client.app.bsky.feed.get_posts(
+            params={'uris': uris[i:i + GET_POSTS_LIMIT]}
+        )
+        reposted.update(
+            post.uri for post in response.posts
+            if post.viewer and post.viewer.repost
+        )
+    return reposted
+
+
+def _repost_record(client, post):
+    return models.ComAtprotoRepoApplyWrites.Create(
+        collection=REPOST_COLLECTION,
+        value=models.AppBskyFeedRepost.Record(
+            created_at=client.get_current_time_iso(),
+            subject=models.ComAtprotoRepoStrongRef.Main(
+                uri=post['uri'],
+                cid=post['cid']
+            ),
+        ),
+    )
+
+
+def _repost_single(client, post) -> dict:
+    try:
+        response = client.repost(uri=post['uri'], cid=post['cid'])
+        return {'uri': post['uri'], 'repost_uri': response.uri, 'error': None}
+    except AtProtocolError as e:
+        return {'uri': post['uri'], 'repost_uri': None, 'error': str(e)}
+
+
+def repost_batch(client, posts, batch_size=BATCH_SIZE) -> list:
+    """
+    Repost posts in groups of `batch_size` with applyWrites, falling back
+    to single reposts for groups that are rejected.
+
+    Args:
+        client: Authenticated Bluesky client.
+        posts (list[dict]): Posts to repost, with 'uri' and 'cid'.
+        batch_size (int): Reposts per request.
+
+    Returns:
+        list[dict]: One result per post with the post's 'uri', the
+            'repost_uri' of the created record (if the server returned
+            it) and an 'error' message (None on success), in the order
+            of `posts`.
+    """
+    results = []
+    for i in range(0, len(posts), batch_size):
+        batch = posts[i:i + batch_size]
+        try:
+            response = client.com.atproto.repo.apply_writes(
+                models.ComAtprotoRepoApplyWrites.Data(
+                    repo=client.me.did,
+                    writes=[_repost_record(client, post) for post in batch],
+                )
+            )
+        except AtProtocolError as e:
+            logger.warning(
+                ' > Batch of %s reposts was rejected (%s), '
+                'reposting one by one',
+                len(batch),
+                e
+            )
+            results.extend(_repost_single(client, post) for post in batch)
+            continue
+
+        # Older PDS versions do not return the created records
+        created = response.results or []
+        for j, post in enumerate(batch):
+            results.append({
+                'uri': post['uri'],
+                'repost_uri': created[j].uri if j < len(created) else None,
+                'error': None,
+            })
+        logger.info(' > Reposted %s posts in one request', len(batch))
+    return results
@@ -0,0 +1,58 @@
+"""
+Module with a small in-memory cache with a size limit and expiry.
+
+Used for lookups that are repeated across jobs of a long-running process
+(e.g. resolving Bluesky handles), so the process stays warm without its
+memory growing with every run.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class BoundedCache:
+    """
+    Least recently used cache whose entries expire after `ttl` seconds.
+
+    Args:
+        max_entries (int): Maximum number of entries; the least recently
+            used entry is dropped when it is exceeded.
+        ttl (float): Seconds an entry stays valid.
+        clock: Callable returning the current time in seconds.
+    """
+    def __init__(self, max_entries: int, ttl: float, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the value of `key` if it is cached and not expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        """Cache `value` under `key`, evicting the oldest entries."""
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,123 @@
+"""
+Module to evaluate cron expressions like the ones of the workflows.
+
+Supports the five standard fields (minute, hour, day of month, month,
+day of week) with `*`, lists, ranges and steps (`*/6`, `1-31/2`). As in
+cron, if both day of month and day of week are restricted a day matches
+if either of them does. Times are interpreted in UTC, like GitHub
+Actions schedules.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+# (lowest, highest) value of each field
+FIELD_RANGES = (
+    (0, 59),  # minute
+    (0, 23),  # hour
+    (1, 31),  # day of month
+    (1, 12),  # month
+    (0, 6),   # day of week (0 is Sunday, 7 is accepted as Sunday too)
+)
+MAX_SEARCH_DAYS = 366 * 5
+
+
+def _parse_field(field: str, lowest: int, highest: int) -> set:
+    values = set()
+    for part in field.split(','):
+        value_range, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if value_range == '*':
+            start, end = lowest, highest
+        elif '-' in value_range:
+            start, end = (int(value) for value in value_range.split('-'))
+        else:
+            start = int(value_range)
+            end = highest if step > 1 else start
+        if step < 1 or start < lowest or end > highest + (highest == 6):
+            raise ValueError(f"Invalid cron field '{field}'")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    A parsed cron expression.
+
+    Args:
+        expression (str): Cron expression, e.g. '50 */6 * * *'.
+    """
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(
+                f"Cron expression '{expression}' needs five fields"
+            )
+        self.expression = expression
+        (self.minutes, self.hours, self.days, self.months,
+         weekdays) = (
+            _parse_field(field, *field_range)
+            for field, field_range in zip(fields, FIELD_RANGES)
+        )
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __repr__(self):
+        return f"CronSchedule('{self.expression}')"
+
+    def matches_day(self, moment: datetime) -> bool:
+        """True if the schedule fires on the day of `moment`."""
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def matches(self, moment: datetime) -> bool:
+        """True if the schedule fires in the minute of `moment`."""
+        return (
+            moment.month in self.months
+            and self.matches_day(moment)
+            and moment.hour in self.hours
+            and moment.minute in self.minutes
+        )
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        First time after `moment` the schedule fires.
+
+        Args:
+            moment (datetime): Reference time (naive times are taken as
+                UTC).
+
+        Returns:
+            datetime: The next firing time (timezone-aware, UTC).
+        """
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        candidate = (
+            moment.astimezone(timezone.utc).replace(second=0, microsecond=0)
+            + timedelta(minutes=1)
+        )
+        limit = candidate + timedelta(days=MAX_SEARCH_DAYS)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                month = candidate.month % 12 + 1
+                candidate = candidate.replace(
+                    year=candidate.year + (month == 1),
+                    month=month,
+                    day=1,
+                    hour=0,
+                    minute=0
+                )
+            elif not self.matches_day(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(
+                    hour=0, minute=0
+                )
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"'{self.expression}' never fires")
@@ -0,0 +1,117 @@
+"""Module to download RSS/Atom feeds with an upper bound on size"""
+
+import logging
+import re
+
+import requests
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+REQUEST_TIMEOUT = 15  # seconds
+CHUNK_SIZE = 16 * 1024  # bytes
+
+HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:20.0) '
+        'Gecko/20100101 Firefox/20.0'
+    )
+}
+
+# Closing tags of a single feed item (RSS 2.0/RDF and Atom/YouTube)
+ITEM_END_PATTERN = re.compile(rb'</(?:[\w-]+:)?(?:item|entry)\s*>', re.I)
+# Longest closing tag we expect, used to re-scan across chunk borders
+ITEM_END_OVERLAP = 64
+
+
+def _closing_tags(head: bytes) -> bytes:
+    """
+    Build the closing tags for a truncated feed document.
+
+    Args:
+        head (bytes): Beginning of the document (up to the first item).
+
+    Returns:
+        bytes: Closing tags that turn the truncated body into a
+            well-formed document again.
+    """
+    if re.search(rb'<(?:[\w-]+:)?feed[\s>]', head):
+        return b'</feed>'
+    if re.search(rb'<rdf:RDF[\s>]', head):
+        return b'</rdf:RDF>'
+    return b'</channel></rss>'
+
+
+def fetch_feed_bounded(
+    url: str,
+    max_bytes: int | None = None,
+    max_entries: int | None = None,
+) -> bytes:
+    """
+    Stream a feed and stop reading once enough complete items arrived.
+
+    The body is read in chunks. As soon as `max_entries` closing item tags
+    were seen, or `max_bytes` were read, the download is cut off after the
+    last complete item and the document is closed again so that it can
+    be handed to `feedparser`.
+
+    Args:
+        url (str): URL of the RSS/Atom feed.
+        max_bytes (int | None): Maximum number of bytes to read.
+        max_entries (int | None): Maximum number of (newest) entries to
+            keep.
+
+    Returns:
+        bytes: The (possibly truncated) feed document.
+
+    Raises:
+        requests.HTTPError: If the feed could not be fetched.
+    """
+    buffer = bytearray()
+    item_ends = []
+    truncated = False
+
+    with requests.get(
+        url,
+        headers=HEADERS,
+        stream=True,
+        timeout=REQUEST_TIMEOUT
+    ) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            scan_from = max(len(buffer) - ITEM_END_OVERLAP, 0)
+            if item_ends:
+                scan_from = max(scan_from, item_ends[-1])
+            buffer.extend(chunk)
+
+            for match in ITEM_END_PATTERN.finditer(buffer, scan_from):
+                item_ends.append(match.end())
+
+            if max_entries and len(item_ends) >= max_entries:
+                truncated = True
+                break
+            if max_bytes and len(buffer) >= max_bytes:
+                truncated = True
+                break
+
+    if not truncated:
+        return bytes(buffer)
+
+    if not item_ends:
+        logger.warning(
+            'No complete entry within the first %s bytes of %s',
+            len(buffer),
+            url
+        )
+        return bytes(buffer)
+
+    if max_entries:
+        item_ends = item_ends[:max_entries]
+    cut_at = item_ends[-1]
+    logger.info(
+        'Stopped reading %s after %s entries (%s bytes)',
+        url,
+        len(item_ends),
+        cut_at
+    )
+    return bytes(buffer[:cut_at]) + _closing_tags(bytes(buffer[:cut_at]))
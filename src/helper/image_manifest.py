@@ -0,0 +1,203 @@
+"""
+Module with the manifest of the anniversary images.
+
+The prepared images in `archive/anniversary_images` are listed in a
+`manifest.json` next to them, mapping the `img` of an event to the local
+file with its SHA-256, size and dimensions. Images are resolved locally
+first; only if an image is missing or does not match its hash it is
+downloaded, verified and recorded in the manifest.
+
+Usage (from the repository root):
+
+    python src/helper/image_manifest.py     # rebuild the manifest
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import requests
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+IMAGE_DIR = Path('archive/anniversary_images')
+MANIFEST_NAME = 'manifest.json'
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg')
+REQUEST_TIMEOUT = 10  # seconds
+CHUNK_SIZE = 64 * 1024
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def file_sha256(path) -> str:
+    """SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_size(path) -> tuple:
+    """
+    Read the dimensions of an image from its header.
+
+    Returns:
+        tuple: (width, height), or (None, None) if the file is not a PNG
+            or JPEG image.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(24)
+        if header[:8] == PNG_SIGNATURE and header[12:16] == b'IHDR':
+            return struct.unpack('>II', header[16:24])
+        if header[:2] != b'\xff\xd8':
+            return None, None
+
+        # JPEG: walk the segments up to the start of frame
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None, None
+            length = struct.unpack('>H', f.read(2))[0]
+            if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8,
+                                                                0xCC):
+                height, width = struct.unpack('>xHH', f.read(5))
+                return width, height
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def describe_image(path) -> dict:
+    """Manifest entry of an image file."""
+    width, height = image_size(path)
+    return {
+        'path': Path(path).as_posix(),
+        'sha256': file_sha256(path),
+        'size': os.path.getsize(path),
+        'width': width,
+        'height': height,
+    }
+
+
+def build_manifest(image_dir=IMAGE_DIR) -> dict:
+    """Describe every image of `image_dir`, keyed by file name."""
+    return {
+        path.name: describe_image(path)
+        for path in sorted(Path(image_dir).iterdir())
+        if path.suffix.lower() in IMAGE_SUFFIXES
+    }
+
+
+def load_manifest(image_dir=IMAGE_DIR) -> dict:
+    """Load the manifest of `image_dir` (empty if there is none)."""
+    try:
+        with open(Path(image_dir) / MANIFEST_NAME, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest: dict, image_dir=IMAGE_DIR) -> None:
+    """Write the manifest of `image_dir`."""
+    with open(Path(image_dir) / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def _is_current(entry) -> bool:
+    """True if the file of a manifest entry exists and matches its hash."""
+    return (
+        entry is not None
+        and os.path.isfile(entry['path'])
+        and os.path.getsize(entry['path']) == entry['size']
+        and file_sha256(entry['path']) == entry['sha256']
+    )
+
+
+def download(url: str, path) -> None:
+    """
+    Download `url` to `path`, only replacing `path` once the download is
+    complete and is a readable image.
+
+    Raises:
+        requests.RequestException: If the request failed.
+        ValueError: If the response is truncated or not an image.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    response = requests.get(url, stream=True, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+        expected = response.headers.get('Content-Length')
+        if expected and int(expected) != os.path.getsize(tmp_path):
+            raise ValueError(f'Truncated download of {url}')
+        if image_size(tmp_path) == (None, None):
+            raise ValueError(f'{url} is not a PNG or JPEG image')
+        os.replace(tmp_path, path)
+    finally:
+        response.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def resolve_image(img: str, base_url: str, image_dir=IMAGE_DIR) -> str:
+    """
+    Return the local path of an anniversary image, downloading it only if
+    the manifest has no current local copy.
+
+    A download is hashed and recorded in the manifest, so the next run
+    finds it locally. If the manifest already knew the image under a
+    different hash, the image changed upstream and the entry is replaced.
+
+    Args:
+        img (str): `img` of the event (file name of the image).
+        base_url (str): URL the images are published under.
+        image_dir: Directory with the local images and the manifest.
+
+    Returns:
+        str: Path of the verified local image.
+
+    Raises:
+        requests.RequestException: If the image had to be downloaded and
+            the request failed.
+        ValueError: If the downloaded file is not a complete image.
+    """
+    manifest = load_manifest(image_dir)
+    entry = manifest.get(img)
+    if _is_current(entry):
+        return entry['path']
+
+    url = f'{base_url}/{img}'
+    path = Path(image_dir) / img
+    logger.info(' > %s is not available locally, downloading %s', img, url)
+    download(url, path)
+
+    new_entry = describe_image(path)
+    if entry and entry['sha256'] != new_entry['sha256']:
+        logger.warning(
+            ' > %s changed upstream (sha256 %s, manifest had %s)',
+            img,
+            new_entry['sha256'][:12],
+            entry['sha256'][:12]
+        )
+    # Re-read in case another process updated the manifest meanwhile
+    manifest = load_manifest(image_dir)
+    manifest[img] = new_entry
+    save_manifest(manifest, image_dir)
+    return new_entry['path']
+
+
+if __name__ == '__main__':
+    manifest = build_manifest()
+    save_manifest(manifest)
+    logger.info(' > Wrote %s images to %s', len(manifest),
+                IMAGE_DIR / MANIFEST_NAME)
@@ -1,99 +1,275 @@
-import time
+"""
+AWS Lambda handler boosting and favouriting new Mastodon statuses with
+the configured tags.
+
+The client, the bot's account and the since_id state are created on the
+first invocation and reused while the container is kept warm. The
+statuses of a tag are boosted concurrently through the Mastodon adapter
+(bounded by `BOOST_WORKERS` and the account's rate limiter).
+"""
+
+import asyncio
+import json
+import logging
 import os
+import sys
+import time
 from urllib.parse import urlparse
-from mastodon import Mastodon
+
 from dotenv import load_dotenv
+from mastodon import Mastodon
+
+from helper.platform_adapter import MastodonAdapter
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 
 try:
     import config
 except ModuleNotFoundError:
-    print("ERROR: You must rename `config_example.py` to `config.py` and edit it with your account credentials.")
-    import sys; sys.exit()
+    logger.error(
+        "You must rename `config_example.py` to `config.py` and edit it "
+        "with your account credentials."
+    )
+    sys.exit()
 
 # Constants
 TIME_TO_SLEEP = 1800  # 1800 seconds = 30 minutes
-TIMELINE_DEPTH_LIMIT = 40  # How many of the latest statuses to pull per tag. 
+TIMELINE_DEPTH_LIMIT = 40  # How many of the latest statuses to pull per tag.
+TIMELINE_MAX_PAGES = 10  # Pages of new statuses to read per tag and run.
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 PASSWORD = os.getenv("PASSWORD")
 USERNAME = config.USERNAME
-CLIENT_CRED_FILE = '{}_clientcred.secret'.format(config.CLIENT_NAME.lower())
+CLIENT_CRED_FILE = f'{config.CLIENT_NAME.lower()}_clientcred.secret'
+# Newest boosted status id per tag. /tmp is the only writable directory on
+# Lambda and survives as long as the container is kept warm.
+STATE_FILE = os.getenv(
+    "STATE_FILE",
+    f'/tmp/{config.CLIENT_NAME.lower()}_since_id.json'
+)
+
+# Created on the first invocation and reused while the container is warm
+mastodon = None
+account = None
+since_ids = None
+
 
 def setup_client_cred_file():
+    """Create the client credentials file unless it exists."""
+    if os.path.isfile(CLIENT_CRED_FILE):
+        logger.info(' > Found pre-existing secrets file')
+        return
+
+    # If the CLIENT_CRED_FILE doesn't exist, connect to Mastodon, get
+    # secrets, and create the cred file.
+    logger.info(' > No secrets file found. Auto-generating a new one')
     try:
-        with open(CLIENT_CRED_FILE) as f:
-            print(' > Found pre-existing secrets file')
+        Mastodon.create_app(
+            config.CLIENT_NAME,
+            api_base_url=config.API_BASE_URL,
+            to_file=CLIENT_CRED_FILE
+        )
+    except Exception:
+        logger.error(
+            ' > Error connecting to Mastodon. Client secrets could not be '
+            'generated'
+        )
+        raise
+
+
+def get_client():
+    """
+    Return the logged in client and the bot's account, logging in on the
+    first call only.
+    """
+    global mastodon, account  # pylint: disable=global-statement
+
+    if mastodon is None:
+        logger.info("Initializing %s Bot", config.CLIENT_NAME)
+        logger.info("=================%s", "=" * len(config.CLIENT_NAME))
+        logger.info(" > Connecting to %s", config.API_BASE_URL)
+        setup_client_cred_file()
+
+        # Create client
+        client = Mastodon(
+            client_id=CLIENT_CRED_FILE,
+            api_base_url=config.API_BASE_URL,
+        )
+
+        logger.info(" > Logging in as %s with password <TRUNCATED>", USERNAME)
+        client.log_in(
+            USERNAME,
+            PASSWORD,
+        )
+        logger.info(" > Successfully logged in")
+
+        logger.info(" > Fetching account data")
+        account = client.me()
+        mastodon = client
+        logger.info(" > Fetched account data for %s", account.acct)
+
+    return mastodon, account
 
-    except IOError:
-        # If the CLIENT_CRED_FILE doesn't exist, connect to Mastodon, get secrets, and create the cred file.
-        print(' > No secrets file found. Auto-generating a new one')
+
+def load_since_ids():
+    """Return the newest boosted status id per tag."""
+    global since_ids  # pylint: disable=global-statement
+
+    if since_ids is None:
         try:
-            Mastodon.create_app(
-            config.CLIENT_NAME,
-            api_base_url = config.API_BASE_URL,
-            to_file = CLIENT_CRED_FILE)
-        except:
-            print(' > Error connecting to Mastodon. Client secrets could not be generated')
-            raise
-        
-
-print("")
-print("Initializing {} Bot".format(config.CLIENT_NAME))
-print("=================" + "="*len(config.CLIENT_NAME))
-print(" > Connecting to {}".format(config.API_BASE_URL))
-setup_client_cred_file()
-
-# Create client
-mastodon = Mastodon(
-    client_id = CLIENT_CRED_FILE,
-    api_base_url = config.API_BASE_URL,
-)   
-
-print(" > Logging in as {} with password <TRUNCATED>".format(USERNAME))
-
-# Then login. This can be done every time, or use persisted with to_file.
-mastodon.log_in(
-    USERNAME,
-    PASSWORD,
-    # to_file = 'hashtaggamedev_usercred.secret'
-)
+            with open(STATE_FILE, encoding='utf-8') as f:
+                since_ids = json.load(f)
+        except (IOError, ValueError):
+            since_ids = {}
+    return since_ids
+
+
+def save_since_ids():
+    """Persist the since_id state."""
+    try:
+        with open(STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(since_ids, f)
+    except IOError as e:
+        logger.error(" > Could not save the since_id state: %s", e)
+
+
+def fetch_new_statuses(client, tag):
+    """
+    Return the statuses tagged with `tag` that are newer than its since_id,
+    paging forward with `min_id` until a page is short. Without a since_id
+    (first run) only the newest page is read.
+    """
+    min_id = since_ids.get(tag)
+    max_pages = TIMELINE_MAX_PAGES if min_id is not None else 1
+
+    statuses = []
+    for _ in range(max_pages):
+        page = client.timeline_hashtag(
+            tag,
+            min_id=min_id,
+            limit=TIMELINE_DEPTH_LIMIT
+        )
+        if not page:
+            break
+        statuses.extend(page)
+        min_id = max((status.id for status in page), key=int)
+        if len(page) < TIMELINE_DEPTH_LIMIT:
+            break
+    else:
+        if since_ids.get(tag) is not None:
+            logger.warning(
+                " > Stopped after %s pages before reaching the newest toot",
+                max_pages
+            )
+    return statuses
 
-print(" > Successfully logged in")
-print(" > Fetching account data")
 
-def lambda_handler(event, context):
+def is_boostable(status, bot_account):
+    """Skip favourited statuses, own statuses and ignored servers."""
+    domain = urlparse(status.url).netloc
+    return (
+        not status.favourited
+        and status.account.acct != bot_account.acct
+        and domain not in config.IGNORE_SERVERS
+    )
 
-    account = mastodon.me()
 
-    print(f" > Fetched account data for {account.acct}")
+async def boost_tag(adapter, tag, statuses):
+    """
+    Boost and favourite the boostable statuses of a tag concurrently and
+    move its since_id to the newest status before the oldest failed
+    boost, so failed statuses are fetched again on the next invocation.
 
-    print(" > Beginning search-loop and toot and boost toots")
-    print("------------------------")
+    Returns:
+        int: Number of boosted statuses.
+    """
+    to_boost = [
+        status for status in statuses
+        if is_boostable(status, adapter.account)
+    ]
+    for status in to_boost:
+        logger.info(
+            "   * Boosting new toot by %s using tag #%s viewable at: %s",
+            status.account.username,
+            tag,
+            status.url
+        )
+    results = await adapter.boost(to_boost)
 
+    failed = {result['uri'] for result in results if not result['ok']}
+    for status in sorted(statuses, key=lambda s: int(s.id)):
+        if status.uri in failed:
+            break
+        since_ids[tag] = str(status.id)
+    return sum(result['ok'] for result in results)
+
+
+async def boost_tags(client, bot_account, timings):
+    """
+    Fetch and boost the new statuses of every tag, saving the since_id
+    state after each tag.
+
+    Returns:
+        int: Number of boosted statuses.
+    """
+    adapter = MastodonAdapter({
+        'username': USERNAME,
+        'boost_workers': config.BOOST_WORKERS,
+    })
+    # The client of the warm container is reused instead of logging in
+    adapter.client, adapter.account = client, bot_account
+
+    boosted = 0
     for tag in config.TAGS:
         tag = tag.lower().strip("# ")
-        print(f" > Reading timeline for new toots tagged #{tag}")
+        tag_start = time.perf_counter()
+        logger.info(" > Reading timeline for new toots tagged #%s", tag)
 
         try:
-            statuses = mastodon.timeline_hashtag(tag, limit=TIMELINE_DEPTH_LIMIT)
-        except:
-            print(" ! Network error while attempting to fetch statuses. Trying again...")
-            time.sleep(30)
+            statuses = await asyncio.to_thread(
+                fetch_new_statuses, client, tag
+            )
+        except Exception as e:
+            logger.error(
+                " > Network error while attempting to fetch statuses: %s",
+                e
+            )
             continue
 
-        # Sleep momentarily so we don't get rate limited.
-        time.sleep(0.1)
-        
-        print(" > Reading statuses to identify tootable statuses")
-        for status in statuses:
-            domain = urlparse(status.url).netloc
-            if not status.favourited and \
-                    status.account.acct != account.acct and \
-                    domain not in config.IGNORE_SERVERS:
-                # Boost and favorite the new status
-                print(f"   * Boosting new toot by {status.account.username} using tag #{tag} viewable at: {status.url}")
-                mastodon.status_reblog(status.id)
-                mastodon.status_favourite(status.id)
+        boosted += await boost_tag(adapter, tag, statuses)
+        save_since_ids()
+        timings[f'#{tag}'] = time.perf_counter() - tag_start
+    return boosted
+
+
+def lambda_handler(event, context):  # pylint: disable=unused-argument
+    """Boost the new statuses of the configured tags."""
+    timings = {}
+    start = time.perf_counter()
+    cold_start = mastodon is None
+
+    client, bot_account = get_client()
+    load_since_ids()
+    timings['login'] = time.perf_counter() - start
+
+    logger.info(" > Beginning search-loop and boost toots")
+    logger.info("------------------------")
+
+    boosted = asyncio.run(boost_tags(client, bot_account, timings))
+    timings['total'] = time.perf_counter() - start
+
+    logger.info(" > Timings: %s", ", ".join(
+        f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()
+    ))
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'cold_start': cold_start,
+            'boosted': boosted,
+            'timings': timings,
+        }),
+    }
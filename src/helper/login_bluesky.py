@@ -1,17 +1,83 @@
 """Module to login to Bluesky"""
 
 import logging
+import threading
 from atproto import Client
+from atproto.exceptions import AtProtocolError
+
+from helper.rate_limit import PacedRequest, rate_limiter_for
+from helper.session_cache import (
+    clear_session,
+    load_session,
+    save_session,
+    session_key,
+)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Clients logged in by this process, so jobs running in one process (see
+# run_jobs.py) share one login and HTTP connection pool per account
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def logged_in() -> list:
+    """Cache keys of the accounts logged in by this process."""
+    with _clients_lock:
+        return list(_clients)
+
+
+def forget_clients():
+    """Drop the clients logged in by this process."""
+    with _clients_lock:
+        _clients.clear()
+
+
 def login_bluesky(config_dict):
+    """
+    Log into Bluesky, reusing a cached session if possible. Refreshed
+    tokens are written back to the cache; a full login only happens if
+    there is no cached session or it is rejected. Requests are paced by
+    the account's rate limiter.
+
+    A client already logged in by this process is returned as is. The
+    optional `base_url` of the config points the client at another XRPC
+    server than bsky.social (e.g. a local stand-in for load tests).
+    """
+    key = session_key('bluesky', config_dict.get('username', ''))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _login(key, config_dict)
+        return _clients[key]
+
+
+def _login(key, config_dict):
+    rate_limiter = rate_limiter_for('bluesky', config_dict.get('username', ''))
+    base_url = config_dict.get('base_url')
+    client = Client(base_url, request=PacedRequest(rate_limiter))
+
+    def persist_session(_event, session):
+        save_session(key, {'session_string': session.export()})
+
+    client.on_session_change(persist_session)
+
+    session_string = load_session(key).get('session_string')
+    if session_string:
+        try:
+            client.login(session_string=session_string)
+            logger.info(' > Resumed cached session')
+            return client
+        except (AtProtocolError, ValueError) as e:
+            logger.info(' > Cached session was rejected: %s', e)
+            clear_session(key)
+            client = Client(base_url, request=PacedRequest(rate_limiter))
+            client.on_session_change(persist_session)
+
     logger.info(
         ' > Logging in as %s with password <TRUNCATED>',
         config_dict['username']
     )
-    client = Client()
     client.login(
         config_dict.get('username', ''), config_dict.get('password', '')
     )
@@ -1,21 +1,49 @@
 """Module to log into Mastodon"""
 
 import logging
-from mastodon import Mastodon
+import threading
+from mastodon import Mastodon, MastodonAPIError
+
+from helper.session_cache import load_session, save_session, session_key
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Clients logged in by this process, so jobs running in one process (see
+# run_jobs.py) share one login and HTTP connection pool per account
+_clients = {}
+_clients_lock = threading.Lock()
 
-def login_mastodon(config_dict):
+
+def logged_in() -> list:
+    """Cache keys of the accounts logged in by this process."""
+    with _clients_lock:
+        return list(_clients)
+
+
+def forget_clients():
+    """Drop the clients logged in by this process."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def _register_app(config_dict, credentials):
+    """Register the OAuth app and store its client id/secret."""
     client_id, client_secret = Mastodon.create_app(
                     config_dict["client_name"],
                     api_base_url=config_dict["api_base_url"])
+    credentials.update({
+        'client_id': client_id,
+        'client_secret': client_secret,
+    })
+    credentials.pop('access_token', None)
+
 
+def _password_login(config_dict, credentials):
+    """Log in with username/password and store the user token."""
     client = Mastodon(
-        client_id=client_id,
-        access_token=config_dict["access_token"],
-        client_secret=client_secret,
+        client_id=credentials['client_id'],
+        client_secret=credentials['client_secret'],
         api_base_url=config_dict["api_base_url"],
     )
     logger.info(
@@ -23,10 +51,72 @@ def login_mastodon(config_dict):
         config_dict['username']
         )
 
-    client.log_in(
+    credentials['access_token'] = client.log_in(
         config_dict["username"],
         config_dict["password"],
     )
+    return client
+
+
+def login_mastodon(config_dict):
+    """
+    Log into Mastodon. The app's client id/secret and the user token are
+    taken from the config (`client_id`, `client_secret`, `access_token`)
+    or the session cache, so the app is registered and the password
+    login done only if neither has them or the token is rejected.
+
+    A client already logged in by this process is returned as is.
+
+    Returns:
+        tuple: (account, client)
+    """
+    key = session_key(
+        'mastodon',
+        config_dict['username'],
+        config_dict['api_base_url']
+    )
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _login(key, config_dict)
+        return _clients[key]
+
+
+def _login(key, config_dict):
+    # The app credentials and token configured as secrets (CI) are used
+    # unless a local session cache holds newer ones
+    credentials = {
+        name: config_dict[name]
+        for name in ('client_id', 'client_secret', 'access_token')
+        if config_dict.get(name)
+    }
+    credentials.update(load_session(key))
+
+    if credentials.get('access_token'):
+        client = Mastodon(
+            client_id=credentials.get('client_id'),
+            client_secret=credentials.get('client_secret'),
+            access_token=credentials['access_token'],
+            api_base_url=config_dict["api_base_url"],
+        )
+        try:
+            account = client.me()
+            logger.info(' > Resumed cached session')
+            return account, client
+        except MastodonAPIError as e:
+            logger.info(' > Cached token was rejected: %s', e)
+
+    if not (credentials.get('client_id') and credentials.get('client_secret')):
+        _register_app(config_dict, credentials)
+
+    try:
+        client = _password_login(config_dict, credentials)
+    except MastodonAPIError as e:
+        # The cached app may have been removed on the server
+        logger.info(' > Cached app credentials were rejected: %s', e)
+        _register_app(config_dict, credentials)
+        client = _password_login(config_dict, credentials)
+
+    save_session(key, credentials)
     account = client.me()
 
     logger.info(' > Successfully logged in')
@@ -0,0 +1,94 @@
+"""
+Module to match posts against the tags a bot follows.
+
+Tags are extracted once per post, preferably from the structured
+`app.bsky.richtext.facet#tag` facets (and the post-level `tags` field),
+falling back to a regular expression over the text for posts without
+facets. All configured tags are then tested with a single set
+intersection against a normalized frozenset.
+"""
+
+import re
+import unicodedata
+
+TAG_FEATURE_TYPE = 'app.bsky.richtext.facet#tag'
+
+# A '#' (or full-width '＃') not preceded by a word character, followed by
+# word characters that may be joined by '-' or '_'. `\w` is Unicode-aware,
+# so trailing punctuation ('#rstats!', '(#python)') is not part of the tag.
+TAG_PATTERN = re.compile(r'(?<![\w#＃&])[#＃](\w+(?:[-_]\w+)*)')
+
+
+def normalize_tag(tag: str) -> str:
+    """Normalize a tag for comparison ('#PyLadies' -> 'pyladies')."""
+    if tag.isascii():
+        return tag.lstrip('#').lower()
+    return unicodedata.normalize('NFKC', tag).lstrip('#＃').casefold()
+
+
+def tag_set(tags) -> frozenset:
+    """
+    Build the normalized set of followed tags.
+
+    Args:
+        tags (Iterable[str]): Tags, with or without '#'.
+
+    Returns:
+        frozenset: Normalized tags.
+    """
+    return frozenset(
+        normalize_tag(tag.strip()) for tag in tags if tag.strip('#＃ ')
+    )
+
+
+def _get(obj, name):
+    """Read a field from a model or from a dict (e.g. recorded JSON)."""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def extract_tags(record) -> frozenset:
+    """
+    Extract the normalized tags of a Bluesky post record.
+
+    Args:
+        record: The post record (`post.record`), a model or a dict.
+
+    Returns:
+        frozenset: Normalized tags of the post.
+    """
+    tags = set()
+    has_tag_facets = False
+    for facet in _get(record, 'facets') or []:
+        for feature in _get(facet, 'features') or []:
+            feature_type = _get(feature, 'py_type') or _get(feature, '$type')
+            if feature_type == TAG_FEATURE_TYPE:
+                has_tag_facets = True
+                tags.add(normalize_tag(_get(feature, 'tag') or ''))
+
+    tags.update(normalize_tag(tag) for tag in _get(record, 'tags') or [])
+
+    text = _get(record, 'text') or ''
+    if not has_tag_facets and ('#' in text or '＃' in text):
+        tags.update(
+            normalize_tag(tag)
+            for tag in TAG_PATTERN.findall(text)
+            if not tag.isdigit()
+        )
+    tags.discard('')
+    return frozenset(tags)
+
+
+def matching_tags(record, followed: frozenset) -> frozenset:
+    """
+    Return the followed tags a post carries.
+
+    Args:
+        record: The post record (`post.record`), a model or a dict.
+        followed (frozenset): Normalized followed tags (see `tag_set`).
+
+    Returns:
+        frozenset: The followed tags found in the post (empty if none).
+    """
+    return followed & extract_tags(record)
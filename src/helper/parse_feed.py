@@ -0,0 +1,286 @@
+"""
+Module with a fast-path parser for RSS 2.0, Atom and YouTube feeds.
+
+Only the fields used when promoting blog posts are extracted (title, link,
+published, tags/category, summary, media_content and id). Anything the
+fast path cannot handle is parsed with `feedparser` instead.
+
+HTML summaries are cleaned like `feedparser` does: relative URLs are
+resolved against the feed URL (and `xml:base`) and the markup is
+sanitized with feedparser's own sanitizer.
+"""
+
+import io
+import logging
+from urllib.parse import urljoin
+
+import feedparser
+from feedparser.sanitizer import _sanitize_html
+from feedparser.urls import resolve_relative_uris
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+MEDIA_NS = '{http://search.yahoo.com/mrss/}'
+CONTENT_NS = '{http://purl.org/rss/1.0/modules/content/}'
+XHTML_NS = '{http://www.w3.org/1999/xhtml}'
+
+RSS_ITEM = 'item'
+ATOM_ENTRY = f'{ATOM_NS}entry'
+HTML_TYPE = 'text/html'
+# Atom text construct types holding markup
+ATOM_HTML_TYPES = {'html': HTML_TYPE, 'xhtml': 'application/xhtml+xml'}
+
+
+class UnsupportedFeedError(ValueError):
+    """Raised if a document is not a feed the fast path understands."""
+
+
+class FeedEntry(dict):
+    """
+    Dictionary with attribute access, mirroring the entries returned by
+    `feedparser` for the fields we use.
+    """
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError as exc:
+            raise AttributeError(key) from exc
+
+
+def _text(elem) -> str | None:
+    """Return the stripped text of an element or None if it is missing."""
+    if elem is None:
+        return None
+    return (elem.text or '').strip()
+
+
+def _atom_text(elem) -> str | None:
+    """Return the content of an Atom text construct (text, html, xhtml)."""
+    if elem is None:
+        return None
+    if elem.get('type') == 'xhtml':
+        children = list(elem)
+        if len(children) == 1 and children[0].tag == f'{XHTML_NS}div':
+            # The div wrapping XHTML content is not part of it
+            elem = children[0]
+        return ((elem.text or '') + ''.join(
+            etree.tostring(child, encoding='unicode', with_tail=True)
+            for child in elem
+        )).strip()
+    return ''.join(elem.itertext()).strip()
+
+
+def _clean_html(html: str, elem, base: str | None,
+                content_type: str = HTML_TYPE) -> str:
+    """
+    Resolve the relative URLs of an HTML fragment against the feed URL
+    and the `xml:base` of `elem`, and sanitize it the way feedparser does.
+    """
+    if '<' not in html and '&' not in html:
+        # Nothing to resolve or sanitize
+        return html
+    base_uri = urljoin(base or '', elem.base or '')
+    html = resolve_relative_uris(html, base_uri, 'utf-8', content_type)
+    return _sanitize_html(html, 'utf-8', content_type)
+
+
+def _media_content(elem) -> list[dict]:
+    """Collect the attributes of all `media:content` elements."""
+    return [
+        dict(media.attrib)
+        for media in elem.iter(f'{MEDIA_NS}content')
+        if media.get('url')
+    ]
+
+
+def _set_tags(entry: FeedEntry, terms: list[str]) -> None:
+    """Store tags the way feedparser does (`tags` and `category`)."""
+    terms = [term for term in terms if term]
+    if terms:
+        entry['tags'] = [
+            {'term': term, 'scheme': None, 'label': None}
+            for term in terms
+        ]
+        entry['category'] = terms[0]
+
+
+def _rss_entry(item, base: str | None = None) -> FeedEntry:
+    """Build an entry from an RSS 2.0 `<item>`."""
+    entry = FeedEntry()
+
+    title = _text(item.find('title'))
+    if title is not None:
+        entry['title'] = title
+
+    guid = item.find('guid')
+    if guid is not None:
+        entry['id'] = _text(guid)
+
+    link = _text(item.find('link'))
+    if not link and guid is not None and \
+            guid.get('isPermaLink', 'true') != 'false':
+        link = entry['id']
+    if link:
+        entry['link'] = link
+
+    published = _text(item.find('pubDate'))
+    if published is not None:
+        entry['published'] = published
+
+    summary = item.findtext('description')
+    if summary is None:
+        summary = item.findtext(f'{CONTENT_NS}encoded')
+    if summary is not None:
+        entry['summary'] = _clean_html(summary.strip(), item, base)
+
+    _set_tags(
+        entry,
+        [_text(category) for category in item.findall('category')]
+    )
+
+    media_content = _media_content(item)
+    if media_content:
+        entry['media_content'] = media_content
+
+    return entry
+
+
+def _atom_summary(elem, base: str | None) -> str | None:
+    """
+    Summary of an Atom entry: the summary, otherwise the content or the
+    YouTube video description. Markup is cleaned, plain text is kept.
+    """
+    for tag in (f'{ATOM_NS}summary', f'{ATOM_NS}content'):
+        text_elem = elem.find(tag)
+        if text_elem is not None:
+            summary = _atom_text(text_elem)
+            content_type = ATOM_HTML_TYPES.get(text_elem.get('type'))
+            if content_type is None:
+                return summary
+            return _clean_html(summary, text_elem, base, content_type)
+
+    # YouTube keeps the video description in a media group
+    description = elem.find(f'{MEDIA_NS}group/{MEDIA_NS}description')
+    if description is None:
+        return None
+    return _clean_html(_text(description), description, base)
+
+
+def _atom_entry(elem, base: str | None = None) -> FeedEntry:
+    """Build an entry from an Atom (or YouTube) `<entry>`."""
+    entry = FeedEntry()
+
+    title = _atom_text(elem.find(f'{ATOM_NS}title'))
+    if title is not None:
+        entry['title'] = title
+
+    entry_id = _text(elem.find(f'{ATOM_NS}id'))
+    if entry_id is not None:
+        entry['id'] = entry_id
+
+    for link in elem.findall(f'{ATOM_NS}link'):
+        if link.get('rel', 'alternate') == 'alternate' and link.get('href'):
+            entry['link'] = link.get('href')
+            break
+
+    published = _text(elem.find(f'{ATOM_NS}published'))
+    if published is not None:
+        entry['published'] = published
+
+    summary = _atom_summary(elem, base)
+    if summary is not None:
+        entry['summary'] = summary
+
+    _set_tags(
+        entry,
+        [
+            category.get('term', '').strip()
+            for category in elem.findall(f'{ATOM_NS}category')
+        ]
+    )
+
+    media_content = _media_content(elem)
+    if media_content:
+        entry['media_content'] = media_content
+
+    return entry
+
+
+def _release(elem) -> None:
+    """Free an element and its already processed siblings."""
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+def parse_feed_fast(body: bytes,
+                    base: str | None = None) -> list[FeedEntry]:
+    """
+    Parse an RSS 2.0, Atom or YouTube feed with `lxml.etree.iterparse`.
+
+    Args:
+        body (bytes): Raw feed document.
+        base (str | None): URL of the feed, used to resolve relative links
+            in summaries.
+
+    Returns:
+        list[FeedEntry]: Entries in document order.
+
+    Raises:
+        etree.XMLSyntaxError: If the document is not well-formed.
+        UnsupportedFeedError: If the document is neither RSS 2.0 nor Atom.
+    """
+    context = etree.iterparse(
+        io.BytesIO(body),
+        events=('end',),
+        tag=(RSS_ITEM, ATOM_ENTRY),
+        resolve_entities=False,
+        no_network=True,
+    )
+
+    entries = []
+    for _, elem in context:
+        if elem.tag == RSS_ITEM:
+            entries.append(_rss_entry(elem, base))
+        else:
+            entries.append(_atom_entry(elem, base))
+        _release(elem)
+
+    root_tag = context.root.tag if context.root is not None else None
+    if root_tag not in ('rss', f'{ATOM_NS}feed'):
+        raise UnsupportedFeedError(f'Unsupported feed root: {root_tag}')
+
+    return entries
+
+
+def parse_feed(body: bytes, feed_path: str | None = None) -> list:
+    """
+    Parse a feed with the fast path and fall back to `feedparser`.
+
+    Args:
+        body (bytes): Raw feed document.
+        feed_path (str | None): URL of the feed, used to resolve relative
+            links.
+
+    Returns:
+        list: Feed entries that support both attribute and key access.
+    """
+    try:
+        return parse_feed_fast(body, feed_path)
+    except (etree.XMLSyntaxError, UnsupportedFeedError) as e:
+        logger.info(
+            'Falling back to feedparser for %s: %s',
+            feed_path,
+            e
+        )
+
+    response_headers = {}
+    if feed_path:
+        response_headers['content-location'] = feed_path
+    return feedparser.parse(body, response_headers=response_headers).entries
@@ -0,0 +1,531 @@
+"""
+Module with the platform adapters the bots talk to Bluesky and Mastodon
+through.
+
+An adapter exposes the same async operations on every platform: log in,
+post, upload media, repost, favourite, search, list notifications,
+resolve identity and boost (repost and favourite several posts). The
+bots select the adapter with `adapter_for(config_dict)` and drive
+independent requests concurrently on one event loop (e.g. with
+`asyncio.gather`), so adding a platform means adding one adapter class
+to `ADAPTERS`.
+
+atproto and Mastodon.py are synchronous clients, and the session cache
+and rate limiters are built around them, so every operation runs the
+blocking call in a worker thread (`asyncio.to_thread`). A semaphore
+bounds the requests of an adapter in flight (`max_concurrency` of the
+config). Posts, notifications and media are returned as the platform's
+own objects; what `upload_media` returns is what `post` attaches.
+
+Adapters are created per run: their semaphore belongs to the event loop
+of that run.
+"""
+
+import asyncio
+import logging
+import time
+
+import requests
+from atproto import models
+from atproto.exceptions import AtProtocolError
+from mastodon import MastodonAPIError, MastodonError, MastodonNetworkError
+from mastodon.return_types import Status
+
+from helper.batch_repost import repost_batch
+from helper.login_bluesky import login_bluesky
+from helper.login_mastodon import login_mastodon
+from helper.rate_limit import MAX_RETRIES, rate_limiter_for
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_CONCURRENCY = 4  # requests of one adapter in flight
+REQUEST_TIMEOUT = 10  # seconds
+BLUESKY_XRPC_URL = 'https://bsky.social/xrpc'
+BLUESKY_SEARCH_LIMIT = 100  # maximum page size of app.bsky.feed.searchPosts
+BLUESKY_NOTIFICATION_LIMIT = 100  # maximum page size of notifications
+MASTODON_TIMELINE_LIMIT = 40  # maximum page size of Mastodon timelines
+MASTODON_NOTIFICATION_LIMIT = 80  # maximum page size of notifications
+# Polling of Mastodon media that is still processed server-side
+MEDIA_POLL_INTERVAL = 1  # seconds
+MEDIA_POLL_TIMEOUT = 60  # seconds
+
+
+def resolve_bluesky_handle(handle: str, base_url=BLUESKY_XRPC_URL):
+    """
+    Resolve a Bluesky handle to the account's DID. No login is needed.
+
+    Args:
+        handle (str): Handle with or without a leading '@'.
+        base_url (str): XRPC endpoint of the server.
+
+    Returns:
+        str | None: The DID or None if the handle could not be resolved.
+    """
+    handle = handle.lstrip('@')
+    url = f"{base_url}/com.atproto.identity.resolveHandle"
+    try:
+        response = requests.get(
+            url,
+            params={'handle': handle},
+            timeout=REQUEST_TIMEOUT
+        )
+    except requests.RequestException as e:
+        logger.info(' > Resolving %s failed: %s', handle, e)
+        return None
+
+    if response.status_code != 200:
+        logger.info(
+            ' > Resolving %s failed with status code %s',
+            handle,
+            response.status_code
+        )
+        return None
+    did = response.json().get('did')
+    if not did:
+        logger.info(' > The "did" field was not found for %s', handle)
+    return did
+
+
+class PlatformAdapter:
+    """
+    Async operations of one platform account.
+
+    Args:
+        config_dict (dict): Configuration of the bot.
+        max_concurrency (int | None): Requests in flight (default: the
+            config's `max_concurrency` or `DEFAULT_CONCURRENCY`).
+    """
+    platform = None
+    # Whether `boost` also favourites the posts unless told otherwise
+    favourite_on_boost = False
+
+    def __init__(self, config_dict, max_concurrency=None):
+        self.config_dict = config_dict
+        self.client = None
+        self.account = None
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency or (
+            config_dict.get('max_concurrency', DEFAULT_CONCURRENCY)
+        )))
+
+    async def _call(self, func, *args, **kwargs):
+        """Run a blocking client call in a worker thread."""
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def login(self):
+        """Log in (reusing the process' client) and return the adapter."""
+        raise NotImplementedError
+
+    async def post(self, text, media=None, **kwargs):
+        """Publish a post, attaching the result of `upload_media`."""
+        raise NotImplementedError
+
+    async def upload_media(self, filename, description=None, **kwargs):
+        """Upload an image so that it can be attached to a post."""
+        raise NotImplementedError
+
+    async def repost(self, post):
+        """Repost (boost) a post."""
+        raise NotImplementedError
+
+    async def favourite(self, post):
+        """Favourite (like) a post."""
+        raise NotImplementedError
+
+    async def search(self, tag, **params):
+        """Fetch one page of the posts tagged with `tag`."""
+        raise NotImplementedError
+
+    async def list_notifications(self, **params):
+        """Fetch one page of the account's notifications."""
+        raise NotImplementedError
+
+    async def resolve_identity(self, handle):
+        """Resolve a handle to the platform's account identifier."""
+        raise NotImplementedError
+
+    async def mark_seen(self, _seen_at):
+        """
+        Mark the notifications up to `_seen_at` (ISO timestamp) as seen.
+        Platforms without a read marker ignore it.
+        """
+        return None
+
+    async def boost(self, posts, favourite=None) -> list:
+        """
+        Repost (and favourite) posts concurrently.
+
+        Args:
+            posts (list): Posts to boost.
+            favourite (bool | None): Also favourite the posts (default:
+                `favourite_on_boost` of the platform).
+
+        Returns:
+            list[dict]: One result per post, in the order of `posts`,
+                with the post's 'uri', whether the repost succeeded
+                ('ok') and the 'error' of failed calls (None on success).
+        """
+        raise NotImplementedError
+
+
+class BlueskyAdapter(PlatformAdapter):
+    """
+    Bluesky account. Requests are paced by the client's rate limiter
+    (see `login_bluesky`); the optional `base_url` of the config points
+    the adapter at another XRPC server than bsky.social.
+    """
+    platform = 'bluesky'
+
+    def __init__(self, config_dict, max_concurrency=None):
+        super().__init__(config_dict, max_concurrency)
+        self.base_url = config_dict.get('base_url') or BLUESKY_XRPC_URL
+
+    async def login(self):
+        self.client = await asyncio.to_thread(login_bluesky, self.config_dict)
+        self.account = self.client.me
+        return self
+
+    async def post(self, text, media=None, **kwargs):
+        """
+        Publish a post. `text` is a string (pass its 'facets') or a
+        TextBuilder; `media` an embed returned by `upload_media`.
+        """
+        return await self._call(
+            self.client.send_post,
+            text=text,
+            embed=media,
+            **kwargs
+        )
+
+    async def upload_media(self, filename, description=None, **kwargs):
+        """
+        Upload an image. With a `link` (and `title`) it becomes the
+        thumbnail of an external link card, otherwise an image embed
+        with `description` as the alt text.
+
+        Returns:
+            The embed to pass to `post`.
+        """
+        with open(filename, 'rb') as f:
+            img_data = f.read()
+        response = await self._call(self.client.upload_blob, img_data)
+
+        link = kwargs.get('link')
+        if link:
+            return models.AppBskyEmbedExternal.Main(
+                external=models.AppBskyEmbedExternal.External(
+                    title=kwargs.get('title') or '',
+                    description=description or '',
+                    uri=link,
+                    thumb=response.blob,
+                )
+            )
+        return models.AppBskyEmbedImages.Main(
+            images=[
+                models.AppBskyEmbedImages.Image(
+                    alt=description or '',
+                    image=response.blob
+                )
+            ]
+        )
+
+    async def repost(self, post):
+        return await self._call(
+            self.client.repost,
+            uri=_field(post, 'uri'),
+            cid=_field(post, 'cid')
+        )
+
+    async def favourite(self, post):
+        return await self._call(
+            self.client.like,
+            uri=_field(post, 'uri'),
+            cid=_field(post, 'cid')
+        )
+
+    async def search(self, tag, **params):
+        """
+        Fetch one page of `app.bsky.feed.searchPosts` for `tag` (sorted
+        by 'latest' unless a `sort` is given; `cursor` pages back).
+        """
+        params = {
+            'q': tag,
+            'tag': [tag],
+            'sort': 'latest',
+            'limit': BLUESKY_SEARCH_LIMIT,
+            **{key: value for key, value in params.items() if value},
+        }
+        return await self._call(
+            self.client.app.bsky.feed.search_posts,
+            params=params
+        )
+
+    async def list_notifications(self, **params):
+        """
+        Fetch one page of `app.bsky.notification.listNotifications`
+        (e.g. `reasons=['mention']`; `cursor` pages back).
+        """
+        params = {
+            'limit': BLUESKY_NOTIFICATION_LIMIT,
+            **{key: value for key, value in params.items() if value},
+        }
+        return await self._call(
+            self.client.app.bsky.notification.list_notifications,
+            params=params
+        )
+
+    async def mark_seen(self, seen_at):
+        """Mark the notifications up to `seen_at` as seen."""
+        return await self._call(
+            self.client.app.bsky.notification.update_seen,
+            {'seen_at': seen_at}
+        )
+
+    async def resolve_identity(self, handle):
+        """Resolve a handle to the account's DID (None if unknown)."""
+        return await self._call(
+            resolve_bluesky_handle,
+            handle,
+            self.base_url
+        )
+
+    async def boost(self, posts, favourite=None) -> list:
+        """
+        Repost posts in batches (see `repost_batch`); the results also
+        hold the 'repost_uri' of the created records. Posts are only
+        liked if `favourite` is set.
+        """
+        if not posts:
+            return []
+        if favourite is None:
+            favourite = self.favourite_on_boost
+        results = await self._call(
+            repost_batch,
+            self.client,
+            [
+                {'uri': _field(post, 'uri'), 'cid': _field(post, 'cid')}
+                for post in posts
+            ]
+        )
+        if favourite:
+            likes = await asyncio.gather(
+                *(self.favourite(post) for post in posts),
+                return_exceptions=True
+            )
+            for result, like in zip(results, likes):
+                if isinstance(like, AtProtocolError) and not result['error']:
+                    result['error'] = str(like)
+        for result in results:
+            result['ok'] = result['error'] is None
+        return results
+
+
+class MastodonAdapter(PlatformAdapter):
+    """
+    Mastodon account. Every request takes a token of the account's rate
+    limiter first ('read' or 'write'); reads are retried with backoff on
+    network and API errors.
+    """
+    platform = 'mastodon'
+    favourite_on_boost = True
+
+    def __init__(self, config_dict, max_concurrency=None):
+        # `boost_workers` has bounded the concurrent writes so far
+        super().__init__(
+            config_dict,
+            max_concurrency or config_dict.get('boost_workers')
+        )
+        self.rate_limiter = rate_limiter_for(
+            'mastodon',
+            config_dict.get('username', '')
+        )
+
+    def _limited(self, endpoint_class, method, *args, **kwargs):
+        """Issue one request within the rate limit (in a worker thread)."""
+        retries = MAX_RETRIES if endpoint_class == 'read' else 0
+        for attempt in range(retries + 1):
+            self.rate_limiter.acquire(endpoint_class)
+            try:
+                return method(*args, **kwargs)
+            except (
+                MastodonNetworkError,
+                MastodonAPIError,
+                ConnectionError,
+                TimeoutError
+            ) as e:
+                if attempt == retries:
+                    raise
+                logger.error(' > Request failed (%s), retrying', e)
+                self.rate_limiter.backoff(endpoint_class, attempt)
+            finally:
+                self.rate_limiter.update_from_mastodon(
+                    endpoint_class,
+                    self.client
+                )
+        return None
+
+    async def _read(self, method, *args, **kwargs):
+        return await self._call(self._limited, 'read', method, *args,
+                                **kwargs)
+
+    async def _write(self, method, *args, **kwargs):
+        return await self._call(self._limited, 'write', method, *args,
+                                **kwargs)
+
+    async def login(self):
+        self.account, self.client = await asyncio.to_thread(
+            login_mastodon,
+            self.config_dict
+        )
+        return self
+
+    async def post(self, text, media=None, **kwargs):
+        """Publish a status with the media attachment(s) in `media`."""
+        return await self._write(
+            self.client.status_post,
+            text,
+            media_ids=media,
+            **kwargs
+        )
+
+    async def upload_media(self, filename, description=None, **kwargs):
+        """
+        Upload an image. The server processes it asynchronously; it is
+        polled until it can be attached.
+
+        Returns:
+            The media attachment to pass to `post`.
+        """
+        media = await self._write(
+            self.client.media_post,
+            filename,
+            description=description,
+            synchronous=False
+        )
+        deadline = time.monotonic() + MEDIA_POLL_TIMEOUT
+        while media.get('url') is None:
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"Media {media['id']} was not processed in time"
+                )
+            await asyncio.sleep(MEDIA_POLL_INTERVAL)
+            media = await self._read(self.client.media, media)
+        return media
+
+    async def repost(self, post):
+        return await self._write(self.client.status_reblog, post.id)
+
+    async def favourite(self, post):
+        return await self._write(self.client.status_favourite, post.id)
+
+    async def search(self, tag, **params):
+        """
+        Fetch one page of the hashtag timeline of `tag`, or of any of
+        `tag` and the tags in `any_tags` (`min_id` pages forward).
+        """
+        query = {'limit': MASTODON_TIMELINE_LIMIT}
+        if params.get('min_id') is not None:
+            query['min_id'] = params['min_id']
+        if params.get('any_tags'):
+            query['any[]'] = list(params['any_tags'])
+        # Mastodon.py's timeline_hashtag() has no `any[]` parameter.
+        # Without a return type the raw request yields plain dicts.
+        return await self._read(
+            self.client._Mastodon__api_request,  # pylint: disable=protected-access
+            'GET',
+            f'/api/v1/timelines/tag/{tag}',
+            query,
+            override_type=list[Status]
+        )
+
+    async def list_notifications(self, **params):
+        """Fetch one page of notifications (e.g. `types=['mention']`)."""
+        params.setdefault('limit', MASTODON_NOTIFICATION_LIMIT)
+        return await self._read(self.client.notifications, **params)
+
+    async def resolve_identity(self, handle):
+        """Resolve an 'user@server' handle to the account (None if unknown)."""
+        try:
+            return await self._read(
+                self.client.account_lookup,
+                handle.lstrip('@')
+            )
+        except MastodonError as e:
+            logger.info(' > Resolving %s failed: %s', handle, e)
+            return None
+
+    async def boost(self, posts, favourite=None) -> list:
+        """
+        Reblog (and favourite) statuses; all calls are independent and
+        run concurrently. The results also hold the status 'url' and
+        whether it was 'favourited'.
+        """
+        if favourite is None:
+            favourite = self.favourite_on_boost
+        async def attempt(call, post):
+            try:
+                await call(post)
+            except (MastodonError, ConnectionError, TimeoutError) as e:
+                return str(e)
+            return None
+
+        reblogs = [attempt(self.repost, post) for post in posts]
+        favourites = [
+            attempt(self.favourite, post) for post in posts
+        ] if favourite else []
+        errors = await asyncio.gather(*reblogs, *favourites)
+
+        results = []
+        for i, post in enumerate(posts):
+            reblog_error = errors[i]
+            favourite_error = errors[len(posts) + i] if favourite else None
+            failed = [e for e in (reblog_error, favourite_error) if e]
+            results.append({
+                'uri': post.uri,
+                'url': post.url,
+                'ok': reblog_error is None,
+                'favourited': favourite and favourite_error is None,
+                'error': '; '.join(failed) or None,
+            })
+            if failed:
+                logger.error(' > Boosting %s failed: %s', post.url,
+                             '; '.join(failed))
+        logger.info(
+            ' > Reblogged %s and favourited %s of %s statuses',
+            sum(result['ok'] for result in results),
+            sum(result['favourited'] for result in results),
+            len(results)
+        )
+        return results
+
+
+ADAPTERS = {
+    BlueskyAdapter.platform: BlueskyAdapter,
+    MastodonAdapter.platform: MastodonAdapter,
+}
+
+
+def adapter_for(config_dict, max_concurrency=None) -> PlatformAdapter:
+    """
+    Adapter of the platform configured in `config_dict['platform']`.
+
+    Args:
+        config_dict (dict): Configuration of the bot.
+        max_concurrency (int | None): Requests in flight (default: see
+            the adapter).
+
+    Raises:
+        ValueError: If the platform is not supported.
+    """
+    platform = config_dict.get('platform')
+    if platform not in ADAPTERS:
+        raise ValueError(f'Unsupported platform: {platform}')
+    return ADAPTERS[platform](config_dict, max_concurrency)
+
+
+def _field(post, name):
+    """Field of a post given as a dict or a model."""
+    if isinstance(post, dict):
+        return post[name]
+    return getattr(post, name)
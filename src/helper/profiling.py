@@ -0,0 +1,210 @@
+"""
+Module to profile a bot run.
+
+With `--profile` an entry point runs inside `profiled()`, which records
+
+- a cProfile of the run (`profile.pstats`, plus the top functions by
+  cumulative time in `profile.txt`),
+- the wall time and the allocations (tracemalloc top-N by size) of every
+  stage in `summary.json`.
+
+Stages are marked in the bots with `profile_stage('login')`; a stage
+lasts until the next one starts. Without an active profile the call does
+nothing, so the marks cost nothing in normal runs. The artifacts are
+written to `profiles/<name>-<timestamp>/` (git-ignored; `PROFILE_DIR`
+or `--profile-dir` change the location).
+
+cProfile only sees the thread that started the run; work done in worker
+pools shows up as time spent waiting for their futures. tracemalloc
+covers all threads.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+TOP_N = 15  # allocation sites per stage
+TOP_FUNCTIONS = 40  # functions in profile.txt
+
+_active = None
+
+
+class RunProfile:
+    """
+    Profile of one run, split into consecutive stages.
+
+    Args:
+        name (str): Name of the run (used for the artifact directory).
+        output_dir: Directory the artifacts are written to.
+        top (int): Number of allocation sites recorded per stage.
+    """
+    def __init__(self, name: str, output_dir=PROFILE_DIR, top: int = TOP_N):
+        self.name = name
+        self.output_dir = Path(output_dir)
+        self.top = top
+        self.prefix = ''
+        self.stages = []
+        self._stage = None
+        self._profiler = cProfile.Profile()
+        self._started_at = None
+        self._start = None
+
+    def __enter__(self):
+        self._started_at = datetime.now(timezone.utc)
+        tracemalloc.start()
+        self._start = time.perf_counter()
+        self._open_stage('setup')
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profiler.disable()
+        self._close_stage()
+        wall = time.perf_counter() - self._start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.write(wall, peak, failed=exc_type is not None)
+
+    def stage(self, name: str) -> None:
+        """End the current stage and start the stage `name`."""
+        self._profiler.disable()
+        self._close_stage()
+        self._open_stage(self.prefix + name)
+        self._profiler.enable()
+
+    def _open_stage(self, name):
+        self._stage = {
+            'name': name,
+            'start': time.perf_counter(),
+            'snapshot': tracemalloc.take_snapshot(),
+        }
+
+    def _close_stage(self):
+        if self._stage is None:
+            return
+        wall = time.perf_counter() - self._stage['start']
+        statistics = tracemalloc.take_snapshot().compare_to(
+            self._stage['snapshot'], 'lineno'
+        )
+        self.stages.append({
+            'name': self._stage['name'],
+            'wall_seconds': round(wall, 6),
+            'allocated_bytes': sum(
+                stat.size_diff for stat in statistics if stat.size_diff > 0
+            ),
+            'top_allocations': [
+                {
+                    'location': f'{stat.traceback[0].filename}:'
+                                f'{stat.traceback[0].lineno}',
+                    'size_diff': stat.size_diff,
+                    'count_diff': stat.count_diff,
+                }
+                for stat in statistics[:self.top]
+            ],
+        })
+        self._stage = None
+
+    def write(self, wall: float, peak: int, failed: bool = False) -> Path:
+        """Write the artifacts of the run and return their directory."""
+        timestamp = self._started_at.strftime('%Y%m%dT%H%M%SZ')
+        directory = self.output_dir / f'{self.name}-{timestamp}'
+        directory.mkdir(parents=True, exist_ok=True)
+
+        self._profiler.dump_stats(directory / 'profile.pstats')
+        text = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=text)
+        stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        (directory / 'profile.txt').write_text(
+            text.getvalue(), encoding='utf-8'
+        )
+
+        summary = {
+            'name': self.name,
+            'started_at': self._started_at.isoformat(),
+            'failed': failed,
+            'wall_seconds': round(wall, 6),
+            'peak_traced_bytes': peak,
+            'stages': self.stages,
+        }
+        with open(directory / 'summary.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+        logger.info(' > Profile of %s written to %s', self.name, directory)
+        for stage in self.stages:
+            logger.info(
+                '   %-32s %8.3f s %10.1f KiB',
+                stage['name'],
+                stage['wall_seconds'],
+                stage['allocated_bytes'] / 1024
+            )
+        return directory
+
+
+@contextmanager
+def profiled(name: str, enabled: bool = True, output_dir=None):
+    """
+    Profile the enclosed run if `enabled`.
+
+    Args:
+        name (str): Name of the run.
+        enabled (bool): Profile the run (e.g. `args.profile`).
+        output_dir: Directory for the artifacts (default `PROFILE_DIR`).
+    """
+    global _active
+    if not enabled:
+        yield None
+        return
+
+    with RunProfile(name, output_dir or PROFILE_DIR) as profile:
+        _active = profile
+        try:
+            yield profile
+        finally:
+            _active = None
+
+
+def profile_stage(name: str) -> None:
+    """Start the stage `name` of the active profile (if any)."""
+    if _active is not None:
+        _active.stage(name)
+
+
+@contextmanager
+def profile_scope(prefix: str):
+    """Prefix the stages started inside (e.g. with the job name)."""
+    if _active is None:
+        yield
+        return
+    previous = _active.prefix
+    _active.prefix = f'{previous}{prefix}/'
+    try:
+        yield
+    finally:
+        _active.prefix = previous
+
+
+def add_profile_arguments(parser) -> None:
+    """Add `--profile` and `--profile-dir` to an argument parser."""
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Profile the run (cProfile, wall time and allocations per '
+             'stage) and write the results to --profile-dir',
+    )
+    parser.add_argument(
+        '--profile-dir',
+        default=PROFILE_DIR,
+        help='Directory for the profiling artifacts (default: %(default)s)',
+    )
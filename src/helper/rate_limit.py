@@ -0,0 +1,323 @@
+"""
+Module to pace requests to Bluesky and Mastodon based on rate limits.
+
+Every account gets a `RateLimiter` with one token bucket per endpoint
+class ('read', 'write', 'auth'). A request takes one token, except for
+Bluesky writes, which take the points they cost of the write budget
+(e.g. 3 per record an applyWrites call creates). The buckets are
+corrected with the `ratelimit-*` (Bluesky) and `X-RateLimit-*`
+(Mastodon) headers the servers send back, so requests only wait when
+the budget requires it.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from atproto_client import exceptions
+from atproto_client.request import Request
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# (tokens per second, burst capacity) per endpoint class. Defaults
+# follow the documented limits: Bluesky allows 3000 requests per 5 min,
+# 5000 write points per hour (a bucket token is a point) and 30 logins
+# per 5 min; Mastodon allows 300 requests per 5 min.
+DEFAULT_LIMITS = {
+    'bluesky': {
+        'read': (10.0, 100),
+        'write': (5000 / 3600, 300),
+        'auth': (30 / 300, 5),
+    },
+    'mastodon': {
+        'read': (1.0, 60),
+        'write': (1.0, 30),
+        'auth': (30 / 300, 5),
+    },
+}
+# Requests we keep in reserve before waiting for the server's reset
+RESERVE = 1
+MAX_BACKOFF = 300  # seconds
+MAX_RETRIES = 3
+
+BLUESKY_WRITE_METHODS = (
+    'com.atproto.repo.createRecord',
+    'com.atproto.repo.deleteRecord',
+    'com.atproto.repo.putRecord',
+    'com.atproto.repo.applyWrites',
+    'com.atproto.repo.uploadBlob',
+)
+BLUESKY_AUTH_METHODS = (
+    'com.atproto.server.createSession',
+    'com.atproto.server.refreshSession',
+)
+# Points of the Bluesky write budget per created, updated and deleted
+# record; an upload is charged like a create
+BLUESKY_WRITE_POINTS = {'create': 3, 'update': 2, 'delete': 1}
+BLUESKY_METHOD_POINTS = {
+    'com.atproto.repo.createRecord': BLUESKY_WRITE_POINTS['create'],
+    'com.atproto.repo.putRecord': BLUESKY_WRITE_POINTS['update'],
+    'com.atproto.repo.deleteRecord': BLUESKY_WRITE_POINTS['delete'],
+    'com.atproto.repo.uploadBlob': BLUESKY_WRITE_POINTS['create'],
+}
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled at `rate` tokens per second.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def take(self, cost: float = 1) -> float:
+        """
+        Take `cost` tokens.
+
+        Returns:
+            float: Seconds to wait before the request may be sent.
+        """
+        self._refill()
+        self.tokens -= cost
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def limit(self, remaining: float) -> None:
+        """Never assume more tokens than the server says are left."""
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+def _parse_reset(value: str) -> float | None:
+    """
+    Parse a rate limit reset header into a Unix timestamp. Bluesky sends
+    seconds since the epoch, Mastodon an ISO 8601 timestamp.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def _header(headers, name: str) -> str | None:
+    """Case-insensitive header lookup for both header conventions."""
+    lowered = {key.lower(): value for key, value in (headers or {}).items()}
+    return lowered.get(name) or lowered.get(f'x-{name}')
+
+
+class RateLimiter:
+    """
+    Pace requests of one account per endpoint class.
+
+    Args:
+        platform (str): 'bluesky' or 'mastodon', selects default limits.
+        clock: Monotonic clock (injectable for tests).
+        sleep: Sleep function (injectable for tests).
+    """
+
+    def __init__(self, platform='bluesky', clock=time.monotonic,
+                 sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets = {
+            endpoint_class: TokenBucket(rate, capacity, clock)
+            for endpoint_class, (rate, capacity)
+            in DEFAULT_LIMITS[platform].items()
+        }
+        self._blocked_until = {}
+
+    def _bucket(self, endpoint_class: str) -> TokenBucket:
+        return self._buckets.get(endpoint_class, self._buckets['read'])
+
+    def acquire(self, endpoint_class: str = 'read', cost: float = 1) -> float:
+        """
+        Wait until a request of the given class (taking `cost` tokens)
+        may be sent.
+
+        Returns:
+            float: Seconds waited.
+        """
+        with self._lock:
+            wait = self._bucket(endpoint_class).take(cost)
+            blocked_until = self._blocked_until.get(endpoint_class, 0)
+            wait = max(wait, blocked_until - self.clock())
+        if wait > 0:
+            logger.info(
+                ' > Rate limit: waiting %.1fs for %s budget',
+                wait,
+                endpoint_class
+            )
+            self.sleep(wait)
+            return wait
+        return 0.0
+
+    def update(self, endpoint_class: str, headers) -> None:
+        """
+        Correct the budget with the rate limit headers of a response.
+        """
+        remaining = _header(headers, 'ratelimit-remaining')
+        if remaining is None:
+            return
+        try:
+            remaining = float(remaining)
+        except ValueError:
+            return
+        reset = _parse_reset(_header(headers, 'ratelimit-reset'))
+        self._update(endpoint_class, remaining, reset)
+
+    def update_from_mastodon(self, endpoint_class: str, client) -> None:
+        """
+        Correct the budget with the rate limit state Mastodon.py keeps
+        from the `X-RateLimit-*` headers of the last response.
+        """
+        remaining = getattr(client, 'ratelimit_remaining', None)
+        if remaining is None:
+            return
+        self._update(
+            endpoint_class,
+            float(remaining),
+            getattr(client, 'ratelimit_reset', None)
+        )
+
+    def _update(self, endpoint_class, remaining, reset) -> None:
+        with self._lock:
+            self._bucket(endpoint_class).limit(remaining)
+            if remaining <= RESERVE and reset:
+                self._blocked_until[endpoint_class] = (
+                    self.clock() + max(reset - time.time(), 0)
+                )
+
+    def backoff(self, endpoint_class: str, attempt: int, headers=None) -> None:
+        """
+        Wait after a 429 response: until the server's reset if it sent
+        one, otherwise exponentially.
+        """
+        wait = min(2 ** attempt, MAX_BACKOFF)
+        retry_after = _header(headers, 'retry-after')
+        reset = _parse_reset(_header(headers, 'ratelimit-reset'))
+        if retry_after is not None:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                pass
+        elif reset:
+            wait = max(reset - time.time(), 0)
+        wait = min(wait, MAX_BACKOFF)
+        with self._lock:
+            self._blocked_until[endpoint_class] = self.clock() + wait
+        logger.info(' > Rate limited (429): backing off %.1fs', wait)
+        self.sleep(wait)
+
+
+_rate_limiters = {}
+
+
+def rate_limiter_for(platform: str, account: str = '') -> RateLimiter:
+    """
+    Return the (shared) rate limiter of an account.
+
+    Args:
+        platform (str): 'bluesky' or 'mastodon'.
+        account (str): Account name; each account has its own budget.
+
+    Returns:
+        RateLimiter: The rate limiter of the account.
+    """
+    key = (platform, account)
+    if key not in _rate_limiters:
+        _rate_limiters[key] = RateLimiter(platform)
+    return _rate_limiters[key]
+
+
+def bluesky_endpoint_class(method: str, url: str) -> str:
+    """Classify an XRPC request as 'read', 'write' or 'auth'."""
+    nsid = urlsplit(url).path.rsplit('/', 1)[-1]
+    if nsid in BLUESKY_AUTH_METHODS:
+        return 'auth'
+    if method.upper() == 'POST' and nsid in BLUESKY_WRITE_METHODS:
+        return 'write'
+    return 'read'
+
+
+def bluesky_write_cost(url: str, data=None) -> int:
+    """
+    Points of the Bluesky write budget a write request costs: per record
+    for applyWrites (its JSON body `data` lists the writes), otherwise
+    per method.
+    """
+    nsid = urlsplit(url).path.rsplit('/', 1)[-1]
+    if nsid != 'com.atproto.repo.applyWrites':
+        return BLUESKY_METHOD_POINTS.get(nsid, BLUESKY_WRITE_POINTS['create'])
+    try:
+        writes = json.loads(data)['writes']
+    except (TypeError, ValueError, KeyError):
+        return BLUESKY_WRITE_POINTS['create']
+    return sum(
+        BLUESKY_WRITE_POINTS.get(
+            str(write.get('$type', '')).rsplit('#', 1)[-1],
+            BLUESKY_WRITE_POINTS['create']
+        )
+        for write in writes
+    ) or BLUESKY_WRITE_POINTS['create']
+
+
+class PacedRequest(Request):
+    """
+    atproto request handler that paces requests with a `RateLimiter` and
+    retries on 429 responses.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.rate_limiter = rate_limiter or RateLimiter('bluesky')
+
+    def _send_request(self, method, url, **kwargs):
+        endpoint_class = bluesky_endpoint_class(method, url)
+        cost = 1
+        if endpoint_class == 'write':
+            cost = bluesky_write_cost(url, kwargs.get('data'))
+        for attempt in range(MAX_RETRIES + 1):
+            self.rate_limiter.acquire(endpoint_class, cost)
+            try:
+                response = super()._send_request(method, url, **kwargs)
+            except exceptions.RequestException as e:
+                response = e.response
+                if response is None or response.status_code != 429 \
+                        or attempt == MAX_RETRIES:
+                    raise
+                self.rate_limiter.backoff(
+                    endpoint_class,
+                    attempt,
+                    response.headers
+                )
+                continue
+            self.rate_limiter.update(endpoint_class, response.headers)
+            return response
+        return None
+
+    def clone(self):
+        cloned_request = super().clone()
+        cloned_request.rate_limiter = self.rate_limiter
+        return cloned_request
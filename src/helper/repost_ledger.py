@@ -0,0 +1,234 @@
+"""
+Module with a persistent ledger of reposted posts.
+
+The ledger is shared by `BoostTags` and `BoostMentions` so that a post is
+reposted only once, no matter how old it is. It is an on-disk hash index
+(`dbm`) mapping post URIs to the time they were reposted, fronted by a
+Bloom filter so that the common case (a post we have never seen) is
+answered without touching the disk. Entries older than `max_age_days`
+are pruned.
+"""
+
+import dbm
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from helper.state_store import STATE_DIR
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+DEFAULT_MAX_AGE_DAYS = 180
+DEFAULT_CAPACITY = 100_000
+FALSE_POSITIVE_RATE = 0.01
+
+
+def ledger_name(config_dict: dict) -> str:
+    """Name of the ledger shared by all boosters of one bot account."""
+    return (
+        f"reposts_{config_dict.get('platform')}_"
+        f"{config_dict.get('client_name')}"
+    )
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings, persisted as a plain bit array behind a
+    header with the capacity and the number of ledger entries it covers.
+
+    Args:
+        capacity (int): Expected number of entries.
+        false_positive_rate (float): Target false positive rate.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY,
+                 false_positive_rate=FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.size = math.ceil(
+            -capacity * math.log(false_positive_rate) / math.log(2) ** 2
+        )
+        self.hash_count = max(
+            1,
+            round(self.size / capacity * math.log(2))
+        )
+        self.bits = bytearray(math.ceil(self.size / 8))
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, key: str) -> None:
+        """Add a key."""
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @classmethod
+    def load(cls, path: Path, entries: int):
+        """
+        Load a persisted filter.
+
+        Args:
+            path (Path): File written by `save`.
+            entries (int): Number of entries of the ledger now. A filter
+                saved for another number misses entries added since
+                (e.g. by a run that did not close the ledger).
+
+        Returns:
+            BloomFilter | None: The filter or None if it is missing,
+                corrupt or stale.
+        """
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        bloom = cls(int.from_bytes(data[:8], 'little') or 1)
+        if len(data) - 16 != len(bloom.bits):
+            return None
+        if int.from_bytes(data[8:16], 'little') != entries:
+            return None
+        bloom.bits = bytearray(data[16:])
+        return bloom
+
+    def save(self, path: Path, entries: int) -> None:
+        """
+        Persist the capacity and the number of ledger `entries` covered,
+        followed by the bit array.
+        """
+        path.write_bytes(
+            self.capacity.to_bytes(8, 'little')
+            + entries.to_bytes(8, 'little')
+            + bytes(self.bits)
+        )
+
+
+class RepostLedger:
+    """
+    Persistent set of reposted post URIs with a Bloom filter front.
+
+    Use it as a context manager so that it is persisted and closed:
+
+        with RepostLedger(ledger_name(config_dict)) as ledger:
+            if post.uri not in ledger:
+                ...
+                ledger.add(post.uri)
+
+    Args:
+        name (str): Name of the ledger (see `ledger_name`).
+        max_age_days (int): Entries older than this are pruned.
+        capacity (int): Expected number of entries (sizes the filter).
+    """
+
+    def __init__(self, name, max_age_days=DEFAULT_MAX_AGE_DAYS,
+                 capacity=DEFAULT_CAPACITY):
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+
+        directory = Path(STATE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._db_path = directory / name
+        self._bloom_path = directory / f'{name}.bloom'
+
+        self._capacity = capacity
+        self._db = self._open_db()
+        self._bloom = BloomFilter.load(self._bloom_path, len(self._db))
+        if self._bloom is None:
+            self._rebuild_bloom()
+
+    def _open_db(self):
+        try:
+            return dbm.open(str(self._db_path), 'c')
+        except dbm.error as e:
+            # e.g. written by a dbm implementation not available here
+            logger.warning(' > Ledger unreadable (%s), starting anew', e)
+            for path in self._db_path.parent.glob(f'{self._db_path.name}*'):
+                path.unlink()
+            return dbm.open(str(self._db_path), 'n')
+
+    def _rebuild_bloom(self) -> None:
+        self._bloom = BloomFilter(
+            max(self._capacity, len(self._db) * 2)
+        )
+        for key in self._db.keys():
+            self._bloom.add(key.decode('utf-8'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._db)
+
+    def __contains__(self, uri: str) -> bool:
+        if uri not in self._bloom:
+            return False
+        with self._lock:
+            return uri.encode('utf-8') in self._db
+
+    def is_empty(self) -> bool:
+        """True if nothing was recorded yet (e.g. first run)."""
+        return len(self._db) == 0
+
+    def add(self, uri: str, reposted_at: float | None = None) -> None:
+        """
+        Record a repost.
+
+        Args:
+            uri (str): URI of the reposted post.
+            reposted_at (float | None): Unix timestamp, defaults to now.
+        """
+        reposted_at = time.time() if reposted_at is None else reposted_at
+        with self._lock:
+            self._db[uri.encode('utf-8')] = str(reposted_at).encode('ascii')
+            self._bloom.add(uri)
+
+    def prune(self) -> int:
+        """
+        Remove entries older than `max_age_days`.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        cutoff = time.time() - self.max_age_days * SECONDS_PER_DAY
+        with self._lock:
+            expired = [
+                key for key in self._db.keys()
+                if float(self._db[key]) < cutoff
+            ]
+            for key in expired:
+                del self._db[key]
+            if expired:
+                self._rebuild_bloom()
+                # Entries are only removed here; as long as the saved
+                # filter is current, the entry count can only grow
+                self._save_bloom()
+        if expired:
+            logger.info(' > Pruned %s entries from the ledger', len(expired))
+        return len(expired)
+
+    def _save_bloom(self) -> None:
+        tmp_path = self._bloom_path.with_suffix('.tmp')
+        self._bloom.save(tmp_path, len(self._db))
+        os.replace(tmp_path, self._bloom_path)
+
+    def close(self) -> None:
+        """Persist the Bloom filter and close the index."""
+        with self._lock:
+            self._save_bloom()
+            self._db.close()
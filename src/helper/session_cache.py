@@ -0,0 +1,115 @@
+"""Module to persist login sessions and app credentials between runs"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+from cryptography.fernet import Fernet, InvalidToken
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Directory with cached sessions. It holds secrets and must never be
+# committed (it is listed in .gitignore). It may only be put in a CI cache
+# when encrypted: workflows of pull requests can restore caches.
+SESSION_CACHE_DIR = os.getenv('SESSION_CACHE_DIR', '.sessions')
+# Passphrase (a long random string) the cached sessions are encrypted
+# with. Without it they are stored in plain text (local and daemon runs).
+SESSION_CACHE_KEY = os.getenv('SESSION_CACHE_KEY')
+
+
+def session_key(platform: str, username: str, instance: str = '') -> str:
+    """
+    Build the cache key of an account.
+
+    Args:
+        platform (str): 'bluesky' or 'mastodon'.
+        username (str): Login name of the account.
+        instance (str): API base URL (Mastodon only).
+
+    Returns:
+        str: A key that is safe to use as file name.
+    """
+    key = '_'.join(part for part in (platform, instance, username) if part)
+    return re.sub(r'[^\w.-]', '_', key)
+
+
+def _session_path(key: str) -> Path:
+    return Path(SESSION_CACHE_DIR) / f'{key}.json'
+
+
+def _fernet() -> Fernet | None:
+    """Cipher derived from `SESSION_CACHE_KEY` or None if it is unset."""
+    if not SESSION_CACHE_KEY:
+        return None
+    digest = hashlib.sha256(SESSION_CACHE_KEY.encode('utf-8')).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+def load_session(key: str) -> dict:
+    """
+    Load a cached session, decrypting it if `SESSION_CACHE_KEY` is set.
+
+    Args:
+        key (str): Cache key from `session_key`.
+
+    Returns:
+        dict: The cached values or an empty dict if there are none (or
+            they cannot be decrypted).
+    """
+    try:
+        content = _session_path(key).read_bytes()
+    except OSError:
+        return {}
+
+    fernet = _fernet()
+    if fernet is not None:
+        try:
+            content = fernet.decrypt(content)
+        except InvalidToken:
+            logger.warning(' > Cached session could not be decrypted')
+            return {}
+    try:
+        return json.loads(content)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return {}
+
+
+def save_session(key: str, data: dict) -> None:
+    """
+    Persist a session, readable by the current user only and encrypted
+    if `SESSION_CACHE_KEY` is set.
+
+    Args:
+        key (str): Cache key from `session_key`.
+        data (dict): Values to cache.
+    """
+    path = _session_path(key)
+    content = json.dumps(data).encode('utf-8')
+    fernet = _fernet()
+    if fernet is not None:
+        content = fernet.encrypt(content)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+    except OSError as e:
+        logger.warning(' > Session could not be cached: %s', e)
+
+
+def clear_session(key: str) -> None:
+    """
+    Remove a cached session (e.g. after it was rejected).
+
+    Args:
+        key (str): Cache key from `session_key`.
+    """
+    try:
+        _session_path(key).unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,55 @@
+"""Module to persist small pieces of bot state (cursors, marks) between runs"""
+
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Directory with the state files. Like the session cache, it is
+# git-ignored and carried between workflow runs with actions/cache.
+STATE_DIR = os.getenv('STATE_DIR', '.state')
+
+
+def _state_path(name: str) -> Path:
+    file_name = re.sub(r'[^\w.-]', '_', name)
+    return Path(STATE_DIR) / f'{file_name}.json'
+
+
+def load_state(name: str) -> dict:
+    """
+    Load a state file.
+
+    Args:
+        name (str): Name of the state (e.g. 'boost_tags_bluesky_pyladies_bot').
+
+    Returns:
+        dict: The stored state or an empty dict if there is none.
+    """
+    try:
+        with _state_path(name).open(encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(name: str, state: dict) -> None:
+    """
+    Persist a state file atomically.
+
+    Args:
+        name (str): Name of the state.
+        state (dict): JSON-serializable state.
+    """
+    path = _state_path(name)
+    tmp_path = path.with_suffix('.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(' > State %s could not be saved: %s', name, e)
@@ -0,0 +1,185 @@
+"""
+Module with the building blocks of the streaming hashtag booster.
+
+`stream_events` yields the JSON messages of a WebSocket stream (Bluesky
+Jetstream or the Mastodon streaming API) and reconnects with backoff;
+the URL is rebuilt on every connect so that a stream resumes at the last
+cursor. `RepostQueue` hands matched posts to a single writer thread.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+from mastodon.return_types import Status
+from mastodon.types_base import try_cast_recurse
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidURI
+from websockets.sync.client import connect
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+JETSTREAM_URL = 'wss://jetstream2.us-east.bsky.network/subscribe'
+POST_COLLECTION = 'app.bsky.feed.post'
+# Jetstream cursors are Unix timestamps in microseconds. On reconnect we
+# rewind a little so that no event is lost (duplicates are skipped by
+# the repost ledger).
+CURSOR_REWIND_US = 5 * 1_000_000
+RECONNECT_MAX_DELAY = 60  # seconds
+RECV_TIMEOUT = 1  # seconds, how often the stop event is checked
+QUEUE_SIZE = 1000
+
+
+def jetstream_url(base_url: str, cursor: int | None = None) -> str:
+    """
+    Jetstream subscription URL for posts, resuming at `cursor`.
+
+    Args:
+        base_url (str): Jetstream `subscribe` endpoint.
+        cursor (int | None): `time_us` of the last processed event.
+    """
+    params = {'wantedCollections': POST_COLLECTION}
+    if cursor:
+        params['cursor'] = max(cursor - CURSOR_REWIND_US, 0)
+    return f'{base_url}?{urlencode(params)}'
+
+
+def mastodon_streaming_url(api_base_url: str) -> str:
+    """WebSocket streaming endpoint of a Mastodon instance."""
+    parts = urlsplit(api_base_url)
+    scheme = 'ws' if parts.scheme == 'http' else 'wss'
+    return urlunsplit((scheme, parts.netloc, '/api/v1/streaming', '', ''))
+
+
+def jetstream_post(event: dict):
+    """
+    Extract a newly created post from a Jetstream event.
+
+    Returns:
+        tuple | None: (uri, cid, record) or None for other events.
+    """
+    commit = event.get('commit') or {}
+    if (
+        event.get('kind') != 'commit'
+        or commit.get('operation') != 'create'
+        or commit.get('collection') != POST_COLLECTION
+    ):
+        return None
+    uri = f"at://{event['did']}/{POST_COLLECTION}/{commit['rkey']}"
+    return uri, commit.get('cid'), commit.get('record') or {}
+
+
+def mastodon_status(payload: str):
+    """Turn the payload of a Mastodon `update` event into a `Status`."""
+    return try_cast_recurse(Status, json.loads(payload))
+
+
+def stream_events(url_factory, stop_event, on_connect=None, headers=None):
+    """
+    Yield the JSON messages of a WebSocket stream until `stop_event` is
+    set, reconnecting with exponential backoff.
+
+    Args:
+        url_factory: Callable returning the URL to connect to; called on
+            every (re)connect so that the current cursor is used.
+        stop_event (threading.Event): Ends the stream when set.
+        on_connect: Optional callable receiving the connection, e.g. to
+            send subscriptions or catch up on missed events.
+        headers (dict | None): Additional HTTP headers of the handshake.
+
+    Yields:
+        dict: Parsed messages.
+    """
+    attempt = 0
+    while not stop_event.is_set():
+        url = url_factory()
+        try:
+            with connect(url, additional_headers=headers) as websocket:
+                logger.info(' > Connected to %s', urlsplit(url).netloc)
+                if on_connect:
+                    on_connect(websocket)
+                while not stop_event.is_set():
+                    try:
+                        message = websocket.recv(timeout=RECV_TIMEOUT)
+                    except TimeoutError:
+                        continue
+                    attempt = 0
+                    try:
+                        yield json.loads(message)
+                    except json.JSONDecodeError:
+                        logger.warning(' > Skipping malformed message')
+        except (ConnectionClosed, InvalidHandshake, InvalidURI, OSError) as e:
+            logger.warning(' > Stream disconnected: %s', e)
+
+        if stop_event.is_set():
+            break
+        delay = min(2 ** attempt, RECONNECT_MAX_DELAY)
+        attempt += 1
+        logger.info(' > Reconnecting in %ss', delay)
+        stop_event.wait(delay)
+
+
+class RepostQueue:
+    """
+    Queue of posts to repost, processed by a single writer thread so that
+    writes are issued one at a time through the account's rate limiter.
+
+    Args:
+        handler: Callable reposting one item.
+        maxsize (int): Upper bound of queued items; `put` blocks when the
+            writer falls behind.
+    """
+
+    def __init__(self, handler, maxsize=QUEUE_SIZE):
+        self._handler = handler
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def put(self, item) -> None:
+        """Queue an item for reposting."""
+        self._queue.put(item)
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._handler(item)
+            except Exception as e:
+                logger.error(' > Repost failed: %s', e)
+
+    def close(self, timeout=None) -> None:
+        """Process the queued items and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+class CursorSaver:
+    """
+    Persist a stream cursor at most every `interval` seconds.
+
+    Args:
+        save: Callable persisting the state.
+        interval (float): Minimum seconds between two saves.
+    """
+
+    def __init__(self, save, interval=10, clock=time.monotonic):
+        self._save = save
+        self._interval = interval
+        self._clock = clock
+        self._saved_at = clock()
+
+    def tick(self) -> None:
+        """Save if the interval has passed."""
+        if self._clock() - self._saved_at >= self._interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Save now."""
+        self._save()
+        self._saved_at = self._clock()
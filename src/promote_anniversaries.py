@@ -3,27 +3,43 @@ Module to promote anniversaries on Mastodon and Bluesky.
 Handles fetching events, building posts, and posting to platforms.
 """
 
+import argparse
+import asyncio
 import json
 import logging
 import os
-import posixpath
 import re
-import shutil
+import sys
 from datetime import datetime
-from urllib.parse import urlsplit
 
-import requests
 from dotenv import load_dotenv
 
 from atproto import client_utils, models
 
 import config
-from helper.login_bluesky import login_bluesky
-from helper.login_mastodon import login_mastodon
+from helper.anniversary_calendar import (
+    EVENTS_FILE,
+    compile_calendar,
+    events_hash,
+    is_stale,
+    load_day,
+    load_index,
+    save_calendar,
+)
+from helper.bounded_cache import BoundedCache
+from helper.image_manifest import resolve_image
+from helper.platform_adapter import adapter_for, resolve_bluesky_handle
+from helper.profiling import add_profile_arguments, profile_stage, profiled
 
 load_dotenv()
 
-REQUEST_TIMEOUT = 10  # seconds
+IMAGE_BASE_URL = (
+    "https://raw.githubusercontent.com/cosimameyer/illustrations/main/"
+    "amazing-women"
+)
+TAGS = "\n\n#amazingwomenintech #womenalsoknow #impactthefuture"
+# Resolved Bluesky handles, kept while the process runs (see scheduler.py)
+DID_CACHE = BoundedCache(config.DID_CACHE_SIZE, config.DID_CACHE_TTL)
 
 
 class PromoteAnniversary:
@@ -36,6 +52,9 @@ class PromoteAnniversary:
         self.logger = logging.getLogger(__name__)
         self.config_dict = config_dict
         self.no_dry_run = no_dry_run
+        # Bluesky handles resolved to a DID (or not) while compiling
+        self.dids = {}
+        self.unresolved_handles = []
 
     def promote_anniversary(self):
         """
@@ -78,35 +97,109 @@ class PromoteAnniversary:
                 self.config_dict["api_base_url"]
             )
 
-            if self.config_dict["platform"] == "mastodon":
-                _, client = login_mastodon(self.config_dict)
-            elif self.config_dict["platform"] == "bluesky":
-                client = login_bluesky(self.config_dict)
-        else:
-            client = None
+        profile_stage("compile")
+        if is_stale():
+            self.logger.info(
+                " > events.json changed or Bluesky handles are unresolved, "
+                "compiling the calendar"
+            )
+            self.compile_calendar()
+
+        if self.no_dry_run:
+            asyncio.run(self.post_today())
+
+    async def post_today(self):
+        """
+        Log in and post the anniversaries of today, using the calendar's
+        precomputed posts.
+        """
+        profile_stage("login")
+        adapter = await adapter_for(self.config_dict).login()
+
+        profile_stage("post")
+        # The posts of a day are independent and sent concurrently
+        await asyncio.gather(*(
+            self.send_post(
+                entry["event"],
+                adapter,
+                entry["payloads"].get(self.config_dict["platform"])
+            )
+            for entry in load_day(datetime.now().strftime('%m-%d'))
+        ))
+
+    def compile_calendar(self, write=True) -> list:
+        """
+        Compile events.json into the calendar of precomputed posts.
+
+        Args:
+            write (bool): Write the calendar (False only checks).
 
-        with open('metadata/events.json', encoding='utf-8') as f:
+        Bluesky handles that cannot be resolved are compiled without the
+        mention and recorded in the index, so the next run compiles again
+        and retries them. DIDs resolved before are reused.
+
+        Returns:
+            list[str]: Problems found (invalid events, posts too long).
+        """
+        with open(EVENTS_FILE, encoding='utf-8') as f:
             events = json.load(f)
 
-        if self.no_dry_run:
-            for event in events:
-                if self.is_matching_current_date(event["date"]):
-                    self.send_post(event, client)
-                    continue
-                    # if  self.config_dict["platform"] == "mastodon":
-                    #     send_post_to_mastodon(
-                    #         event,
-                    #         self.config_dict,
-                    #         client
-                    #     )
-                    #     continue
-                    # elif  self.config_dict["platform"] == "bluesky":
-                    #     send_post_to_bluesky(
-                    #         event,
-                    #         self.config_dict,
-                    #         client
-                    #     )
-                    #    continue
+        for handle, did in load_index().get('dids', {}).items():
+            DID_CACHE.set(handle, did)
+        self.dids = {}
+        self.unresolved_handles = []
+        calendar, problems = compile_calendar(events, self.build_payloads)
+        for problem in problems:
+            self.logger.warning("🚨 %s", problem)
+        for name, handle in self.unresolved_handles:
+            self.logger.warning(
+                " > %s: Bluesky handle '%s' could not be resolved, "
+                "retrying on the next run",
+                name,
+                handle
+            )
+        if write:
+            save_calendar(
+                calendar,
+                events_hash(),
+                dids=self.dids,
+                unresolved_handles=[
+                    handle for _, handle in self.unresolved_handles
+                ]
+            )
+        return problems
+
+    def build_payloads(self, event: dict) -> dict:
+        """
+        Build the posts of an event for all platforms.
+
+        Args:
+            event (dict): Dictionary with information
+
+        Returns:
+            dict: Per platform the post 'text' (plus the 'facets' on
+                Bluesky) and the 'image_url'.
+        """
+        image_url = f"{IMAGE_BASE_URL}/{event['img']}" if event["img"] else None
+        text_builder = self.build_post_bluesky(event)
+        return {
+            "mastodon": {
+                "text": self.build_post_mastodon(event),
+                "image_url": image_url,
+            },
+            "bluesky": {
+                "text": text_builder.build_text(),
+                "facets": [
+                    facet.model_dump(
+                        mode="json",
+                        by_alias=True,
+                        exclude_none=True
+                    )
+                    for facet in text_builder.build_facets()
+                ],
+                "image_url": image_url,
+            },
+        }
 
     @staticmethod
     def is_matching_current_date(date_str: str, date_format='%m-%d') -> bool:
@@ -125,45 +218,18 @@ class PromoteAnniversary:
         current_date = datetime.now().strftime(date_format)
         return date_str == current_date
 
-    def download_image(self, url: str) -> str:
+    def local_image(self, event: dict) -> str:
         """
-        Method downloads images. It's heavily inspired by:
-        https://github.com/zeratax/mastodon-img-bot/blob/master/bot.py
+        Method to get the image of an event from the local image archive,
+        downloading it only if the manifest has no verified copy.
 
         Args:
-            url: string with the url to the image
+            event (dict): Dictionary with information
 
         Returns:
-            string with the path to the saved image
+            string with the path to the image
         """
-        path = urlsplit(url).path
-        filename = posixpath.basename(path)
-
-        file_path = f"{self.config_dict['images']}/{filename}"
-        if not os.path.isfile(file_path):
-            if not os.path.isdir(self.config_dict['images']):
-                os.makedirs(self.config_dict['images'])
-
-            headers = {
-                'User-Agent': (
-                    'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:20.0) '
-                    'Gecko/20100101 Firefox/20.0'
-                )
-            }
-            response = requests.get(
-                url,
-                headers=headers,
-                stream=True,
-                timeout=REQUEST_TIMEOUT
-            )
-
-            with open(file_path, 'wb') as out_file:
-                shutil.copyfileobj(
-                    response.raw, out_file)
-            del response
-        else:
-            print("Image already downloaded")
-        return file_path
+        return resolve_image(event['img'], IMAGE_BASE_URL)
 
     def build_post(self, event: dict):
         """Method to build the toot
@@ -174,54 +240,79 @@ class PromoteAnniversary:
         Returns:
             Toot text
         """
-        tags = "\n\n#amazingwomenintech #womenalsoknow #impactthefuture"
-
         if self.config_dict["platform"] == "mastodon":
-            toot_str = ""
-            toot_str += (
-                f"Let's meet {event['name']} ✨\n\n"
-                f"{event['description_mastodon']}\n\n"
-                f"🔗 {event['wiki_link']}"
-            )
-            toot_str += tags
-            return toot_str
+            return self.build_post_mastodon(event)
         if self.config_dict["platform"] == "bluesky":
-            text_builder = client_utils.TextBuilder()
+            return self.build_post_bluesky(event)
+        return None
+
+    @staticmethod
+    def build_post_mastodon(event: dict) -> str:
+        """Build the text of the toot."""
+        toot_str = ""
+        toot_str += (
+            f"Let's meet {event['name']} ✨\n\n"
+            f"{event['description_mastodon']}\n\n"
+            f"🔗 {event['wiki_link']}"
+        )
+        toot_str += TAGS
+        return toot_str
+
+    def build_post_bluesky(self, event: dict):
+        """Build the Bluesky post (text with mention, tag and link facets)."""
+        text_builder = client_utils.TextBuilder()
+        did = (
+            self.get_bluesky_did(event["bluesky"])
+            if event["bluesky"] else None
+        )
+        if did:
+            self.dids[event["bluesky"].lstrip('@')] = did
+            text_builder.text("Let's meet ")
+            text_builder.mention(f"{event['bluesky']}", did)
+            text_builder.text(" ⭐️\n\n")
+        else:
             if event["bluesky"]:
-                did = self.get_bluesky_did(event["bluesky"])
-                text_builder.text("Let's meet ")
-                text_builder.mention(f"{event['bluesky']}", did)
-                text_builder.text(" ⭐️\n\n")
-            else:
-                text_builder.text(f"Let's meet {event['name']} ⭐️\n\n")
-            split_text = re.split(r'(#\w+)', event["description_bluesky"])
-            split_text = [
-                item.rstrip(' ')
-                for item in split_text
-                if item.strip()
-            ]
-            for text_chunk in split_text:
-                if text_chunk.startswith('#'):
-                    for tag in text_chunk.split("#"):
-                        tag_clean = tag.strip()
-                    if tag_clean:
-                        text_builder.tag(f"#{tag_clean}", tag_clean)
-                else:
-                    text_chunk_clean = self.add_whitespace_if_needed(
-                        text_chunk
-                    )
-                    text_builder.text(text_chunk_clean)
-            text_builder.text('\n\n🔗 ')
-            text_builder.link(event["wiki_link"], event["wiki_link"])
-            text_builder.text('\n\n')
-            for tag in tags.split("#"):
-                tag_clean = tag.strip()
+                self.unresolved_handles.append(
+                    (event["name"], event["bluesky"])
+                )
+            text_builder.text(f"Let's meet {event['name']} ⭐️\n\n")
+        split_text = re.split(r'(#\w+)', event["description_bluesky"])
+        split_text = [
+            item.rstrip(' ')
+            for item in split_text
+            if item.strip()
+        ]
+        for text_chunk in split_text:
+            if text_chunk.startswith('#'):
+                for tag in text_chunk.split("#"):
+                    tag_clean = tag.strip()
                 if tag_clean:
-                    text_builder.tag(f"#{tag_clean} ", tag_clean)
-            return text_builder
+                    text_builder.tag(f"#{tag_clean}", tag_clean)
+            else:
+                text_chunk_clean = self.add_whitespace_if_needed(
+                    text_chunk
+                )
+                text_builder.text(text_chunk_clean)
+        text_builder.text('\n\n🔗 ')
+        text_builder.link(event["wiki_link"], event["wiki_link"])
+        text_builder.text('\n\n')
+        for tag in TAGS.split("#"):
+            tag_clean = tag.strip()
+            if tag_clean:
+                text_builder.tag(f"#{tag_clean} ", tag_clean)
+        return text_builder
+
+    async def send_post(self, event, adapter, payload=None):
+        """
+        Send a post to the configured platform (Mastodon or Bluesky).
+        If the image cannot be uploaded, the post is sent without it.
 
-    def send_post(self, event, client):
-        """Send a post to the configured platform (Mastodon or Bluesky)."""
+        Args:
+            event (dict): The event.
+            adapter (PlatformAdapter): Logged in platform adapter.
+            payload (dict | None): Precomputed post of the compiled
+                calendar; the post is built if it is None.
+        """
 
         self.logger.info(
             """
@@ -231,37 +322,52 @@ class PromoteAnniversary:
             self.config_dict['platform']
         )
 
-        post_txt = self.build_post(event)
-        if self.config_dict["platform"] == "mastodon":
-            self.send_post_to_mastodon(event, client, post_txt)
-        elif self.config_dict["platform"] == "bluesky":
-            embed_external = self.build_embed_external(event, client)
-            self.send_post_to_bluesky(event, client, post_txt, embed_external)
-
-    def build_embed_external(self, event, client):
-        """Build external embed object for Bluesky posts."""
-        repo_url = (
-            "https://raw.githubusercontent.com/cosimameyer/illustrations/main"
-        )
-        base_path = f"{repo_url}/amazing-women"
-        url = f"{base_path}/{event['img']}"
-        filename = self.download_image(url)
-        with open(filename, 'rb') as f:
-            img_data = f.read()
-
-        thumb = client.upload_blob(img_data)
-
-        return models.AppBskyEmbedExternal.Main(
-            external=models.AppBskyEmbedExternal.External(
-                title=f"Image of {event['name']}",
-                description=event["alt"],
-                uri=url,
-                thumb=thumb.blob,
+        kwargs = {}
+        if payload is None:
+            post_txt = self.build_post(event)
+            image_url = (
+                f"{IMAGE_BASE_URL}/{event['img']}" if event["img"] else None
             )
+        else:
+            post_txt = payload["text"]
+            image_url = payload.get("image_url")
+            if payload.get("facets"):
+                kwargs["facets"] = [
+                    models.AppBskyRichtextFacet.Main.model_validate(facet)
+                    for facet in payload["facets"]
+                ]
+
+        media = None
+        if image_url:
+            try:
+                filename = await asyncio.to_thread(self.local_image, event)
+                media = await adapter.upload_media(
+                    filename,
+                    description=event["alt"] or str(event["name"]),
+                    link=image_url,
+                    title=f"Image of {event['name']}",
+                )
+            except Exception as e:
+                self.logger.info(
+                    "Urg, media could not be uploaded for %s: %s",
+                    event['name'],
+                    e
+                )
+
+        self.logger.info(
+            'Preview your post...\n\n%s',
+            post_txt if isinstance(post_txt, str) else post_txt.build_text()
         )
+        try:
+            await adapter.post(post_txt, media, **kwargs)
+            self.logger.info(
+                "Posted 🎉" if media or not image_url
+                else "Posted without image."
+            )
+        except Exception as e:
+            self.logger.exception("Urg, exception %s for %s", e, event['name'])
 
-    @staticmethod
-    def get_bluesky_did(platform_user_handle: str):
+    def get_bluesky_did(self, platform_user_handle: str):
         """
         Method to extract the Bluesky specific unique user ID (`did`).
 
@@ -271,42 +377,20 @@ class PromoteAnniversary:
         Returns:
             str: did
         """
-        url = (
-            f"https://bsky.social/xrpc/com.atproto.identity.resolveHandle?"
-            f"handle={platform_user_handle.lstrip('@')}"
-        )
-        try:
-            response = requests.get(
-                url,
-                timeout=REQUEST_TIMEOUT
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-
-                did = data.get("did")
-
-                if did:
-                    return did
-                print("The 'did' field was not found in the response.")
-            print(
-                f"Failed to retrieve data. Status code: {response.status_code}"
-            )
-
-        except requests.RequestException as e:
-            print("An error occurred:", e)
-
-    def send_post_to_bluesky(self, event, client, post_txt, embed_external):
-        """Send a post to Bluesky with optional media embed."""
-        self.logger.info(
-            'Preview your post...\n\n%s',
-            post_txt._buffer.getvalue().decode('utf-8')
+        handle = platform_user_handle.lstrip('@')
+        did = DID_CACHE.get(handle)
+        if did:
+            return did
+
+        # The calendar is compiled without a config
+        base_url = (self.config_dict or {}).get('base_url')
+        did = resolve_bluesky_handle(
+            handle,
+            base_url or config.BLUESKY_XRPC_URL
         )
-        try:
-            client.send_post(text=post_txt, embed=embed_external)
-            self.logger.info("Posted 🎉")
-        except Exception as e:
-            self.logger.exception("Urg, exception %s for %s", e, event['name'])
+        if did:
+            DID_CACHE.set(handle, did)
+        return did
 
     @staticmethod
     def add_whitespace_if_needed(text_chunk):
@@ -314,62 +398,36 @@ class PromoteAnniversary:
             text_chunk += ' '
         return text_chunk
 
-    def send_post_to_mastodon(self, event, client, post_txt):
-        """Send a post to Mastodon, with media if available."""
-        if event['img']:
-            try:
-                print("Uploading media to mastodon")
-                base_path = (
-                    "https://raw.githubusercontent.com/"
-                    "cosimameyer/illustrations/main/"
-                    "amazing-women"
-                )
-                url = f"{base_path}/{event['img']}"
-
-                filename = self.download_image(url)
-                media_upload_mastodon = client.media_post(filename)
-
-                print("adding description")
-                if event["alt"]:
-                    client.media_update(media_upload_mastodon,
-                                        description=event["alt"])
-                else:
-                    client.media_update(media_upload_mastodon,
-                                        description=str(event["name"]))
-
-                print("ready to post")
-                client.status_post(
-                    post_txt,
-                    media_ids=media_upload_mastodon
-                )
-
-                print("posted")
-            except Exception as e:
-                self.logger.info(
-                    """
-                    Urg, media could not be printed.\n
-                    Exception %s because of %s
-                    """,
-                    event['name'],
-                    e
-                )
-                client.status_post(post_txt)
-                self.logger.info("Posted toot without image.")
-        else:
-            try:
-                client.status_post(post_txt)
-                self.logger.info("posted")
-            except Exception as e:
-                self.logger.info(
-                    "Urg, exception %s. The reason was %s",
-                    event['toot'],
-                    e
-                )
-
 
 if __name__ == "__main__":
-    promote_anniversary_handler = PromoteAnniversary(
-        config_dict=None,
-        no_dry_run=True
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Compile events.json into the calendar and exit",
     )
-    promote_anniversary_handler.promote_anniversary()
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Validate events.json and the post lengths without writing",
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    with profiled("promote_anniversaries", args.profile, args.profile_dir):
+        if args.compile or args.check:
+            problems = PromoteAnniversary(no_dry_run=False).compile_calendar(
+                write=args.compile
+            )
+        else:
+            problems = []
+            promote_anniversary_handler = PromoteAnniversary(
+                config_dict=None,
+                no_dry_run=True
+            )
+            promote_anniversary_handler.promote_anniversary()
+
+    if problems:
+        sys.exit(1)
+    if args.compile or args.check:
+        print("All good! 🎉")
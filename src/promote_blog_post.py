@@ -1,24 +1,33 @@
 """Promote blog posts"""
+import argparse
+import asyncio
 import logging
 import os
 import json
 import posixpath
 import shutil
-import time
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import urlsplit
-from atproto import client_utils, models
+from atproto import client_utils
 import google.generativeai as genai
 
-import feedparser
 import requests
 from bs4 import BeautifulSoup
-from helper.login_mastodon import login_mastodon
-from helper.login_bluesky import login_bluesky
+from helper.bounded_cache import BoundedCache
+from helper.fetch_feed import fetch_feed_bounded
+from helper.parse_feed import parse_feed
+from helper.platform_adapter import adapter_for, resolve_bluesky_handle
+from helper.profiling import add_profile_arguments, profile_stage, profiled
 
 import config
 
+# Resolved Bluesky handles, kept while the process runs (see scheduler.py)
+DID_CACHE = BoundedCache(config.DID_CACHE_SIZE, config.DID_CACHE_TTL)
+# Index in the images directory mapping each downloaded image to the link
+# of the entry it was downloaded for (read by compact_archive.py)
+IMAGE_LINKS_NAME = 'links.json'
+
 
 class PromoteBlogPost():
     """
@@ -31,6 +40,7 @@ class PromoteBlogPost():
         self.process_images = False
         self.no_dry_run = no_dry_run
         self.config_dict = config_dict
+        self.runner = None
 
     def get_config(self):
         """
@@ -52,7 +62,9 @@ class PromoteBlogPost():
                 ),
                 "gen_ai_support": True,
                 "gemini_api_key": os.getenv("GEMINI_API_KEY"),
-                "gemini_model_name": "gemini-2.5-flash"
+                "gemini_model_name": "gemini-2.5-flash",
+                "feed_max_bytes": config.FEED_MAX_BYTES,
+                "feed_max_entries": config.FEED_MAX_ENTRIES,
             }
             if self.config_dict["platform"] == "mastodon":
                 self.config_dict["api_base_url"] = config.API_BASE_URL
@@ -97,33 +109,36 @@ class PromoteBlogPost():
                 self.config_dict.get('api_base_url', '')
             )
 
-            if self.config_dict["platform"] == "mastodon":
-                _, client = login_mastodon(self.config_dict)
-            elif self.config_dict["platform"] == "bluesky":
-                client = login_bluesky(self.config_dict)
-        else:
-            client = None
+        # One event loop per run: the feeds are processed one after the
+        # other, the requests of a post are driven concurrently on it
+        with asyncio.Runner() as runner:
+            self.runner = runner
+            adapter = None
+            if self.no_dry_run:
+                profile_stage("login")
+                adapter = runner.run(adapter_for(self.config_dict).login())
 
-        feeds = self.read_metadata_json()
-        counter_name = self.read_counter_name()
+            profile_stage("feeds")
+            feeds = self.read_metadata_json()
+            counter_name = self.read_counter_name()
 
-        # Initiate count to post a maximum of 2 posts per run
-        count_post = 0
+            # Initiate count to post a maximum of 2 posts per run
+            count_post = 0
 
-        # Drop empty rss_feeds
-        feeds = [x for x in feeds if x['rss_feed'] != '']
+            # Drop empty rss_feeds
+            feeds = [x for x in feeds if x['rss_feed'] != '']
 
-        if self.no_dry_run:
-            self.process_feeds(feeds, counter_name, count_post, client)
-        else:
-            for feed in feeds:
-                count_post = self.process_feed(
-                    feed,
-                    count_post,
-                    client
-                )
+            if self.no_dry_run:
+                self.process_feeds(feeds, counter_name, count_post, adapter)
+            else:
+                for feed in feeds:
+                    count_post = self.process_feed(
+                        feed,
+                        count_post,
+                        adapter
+                    )
 
-    def process_feeds(self, feeds, counter_name, count_post, client):
+    def process_feeds(self, feeds, counter_name, count_post, adapter):
         """
         Method to handle processing of all feeds.
         """
@@ -139,7 +154,7 @@ class PromoteBlogPost():
                 count_post = self.process_feed(
                     feed,
                     count_post,
-                    client
+                    adapter
                 )
 
                 # Add the counter_name
@@ -148,7 +163,7 @@ class PromoteBlogPost():
                     count_post = self.process_feed(
                         new_feed,
                         count_post,
-                        client
+                        adapter
                     )
 
                     self.logger.info(
@@ -161,7 +176,7 @@ class PromoteBlogPost():
                 count_post = self.process_feed(
                     feed,
                     count_post,
-                    client
+                    adapter
                 )
                 counter_name = ''
                 if is_last_feed:
@@ -234,8 +249,9 @@ class PromoteBlogPost():
                 domain = urlsplit(url).netloc
                 filename = posixpath.basename(urlsplit(url).path)
 
-            # Create folder structure based on the domain name
-            domain_dir = Path(self.config_dict['images']) / domain
+            # Create folder structure based on the domain name (a URL
+            # path is absolute and would replace the images directory)
+            domain_dir = Path(self.config_dict['images']) / domain.lstrip('/')
             domain_dir.mkdir(parents=True, exist_ok=True)
 
             # Full file path for the image
@@ -280,6 +296,26 @@ class PromoteBlogPost():
             if 'response' in locals():
                 response.close()
 
+    def record_image_link(self, filename, link):
+        """
+        Record the entry link an image was downloaded for, so the image
+        can be dropped once the entry is in the archive.
+        """
+        images_dir = Path(self.config_dict['images'])
+        index_file = images_dir / IMAGE_LINKS_NAME
+        try:
+            with index_file.open('rb') as fp:
+                image_links = json.load(fp)
+        except (OSError, json.JSONDecodeError):
+            image_links = {}
+
+        image = Path(filename).relative_to(images_dir).as_posix()
+        if image_links.get(image) == link:
+            return
+        image_links[image] = link
+        with index_file.open('w', encoding='utf-8') as fp:
+            json.dump(image_links, fp, ensure_ascii=False, indent=4)
+
     def parse_pub_date(self, entry):
         """Method to parse the publication date"""
         date_formats = [
@@ -342,47 +378,50 @@ class PromoteBlogPost():
         """
         Method to get Bluesky DID to uniquely identify (and tag) user.
         """
-        url = (
-            f"https://bsky.social/xrpc/com.atproto.identity.resolveHandle?"
-            f"handle={platform_user_handle.lstrip('@')}"
-        )
-        try:
-            response = requests.get(url)
-
-            if response.status_code == 200:
-                data = response.json()
-                did = data.get('did', None)
+        handle = platform_user_handle.lstrip('@')
+        did = DID_CACHE.get(handle)
+        if did:
+            return did
 
-                if did:
-                    return did
-                else:
-                    self.logger.info(
-                        'The "did" field was not found in the response.'
-                    )
-            else:
-                self.logger.info(
-                    'Failed to retrieve data. Status code: %s',
-                    response.status_code
-                )
+        did = resolve_bluesky_handle(
+            handle,
+            self.config_dict.get('base_url') or config.BLUESKY_XRPC_URL
+        )
+        if did:
+            DID_CACHE.set(handle, did)
+        return did
 
-        except requests.RequestException as e:
-            self.logger.info('An error occurred: %s', e)
+    async def resolve_did(self, platform_user_handle, adapter):
+        """
+        Resolve the Bluesky DID of a handle through the adapter, using the
+        DID cache.
+        """
+        handle = platform_user_handle.lstrip('@')
+        did = DID_CACHE.get(handle)
+        if did:
+            return did
+        did = await adapter.resolve_identity(handle)
+        if did:
+            DID_CACHE.set(handle, did)
+        return did
 
     def build_post_mastodon(
-        self, basis_text, platform_user_handle, tags, entry
+        self, basis_text, platform_user_handle, tags, entry,
+        summarized_blog_post=None
     ):
         """
-        Build Mastodon post.
+        Build Mastodon post. The summary is generated unless it was
+        already passed in.
         """
         platform_user_handle = self.check_platform_handle(platform_user_handle)
 
         if platform_user_handle:
             basis_text += f" ({platform_user_handle}) "
         if self.config_dict.get('gen_ai_support', None):
-            summarized_blog_post = self.summarize_text(entry)
+            if summarized_blog_post is None:
+                summarized_blog_post = self.summarize_text(entry)
             if summarized_blog_post:
-                basis_text.text('\n\n📖 ')
-                basis_text.text(summarized_blog_post)
+                basis_text += f"\n\n📖 {summarized_blog_post}"
         basis_text += f"\n\n🔗 {entry.get('link', '')}\n\n{tags}"
 
         self.logger.info('*****************************')
@@ -451,10 +490,13 @@ class PromoteBlogPost():
         basis_text,
         platform_user_handle,
         tags,
-        entry
+        entry,
+        did=None,
+        summarized_blog_post=None
     ):
         """
-        Build post for Bluesky.
+        Build post for Bluesky. The DID and summary are looked up unless
+        they were already passed in.
         """
         text_builder = client_utils.TextBuilder()
         text_builder.text(basis_text)
@@ -462,10 +504,12 @@ class PromoteBlogPost():
         platform_user_handle = self.check_platform_handle(platform_user_handle)
 
         if platform_user_handle:
-            did = self.get_bluesky_did(platform_user_handle)
+            if did is None:
+                did = self.get_bluesky_did(platform_user_handle)
             text_builder.mention(f" ({platform_user_handle})", did)
         if self.config_dict.get('gen_ai_support', None):
-            summarized_blog_post = self.summarize_text(entry)
+            if summarized_blog_post is None:
+                summarized_blog_post = self.summarize_text(entry)
             if summarized_blog_post:
                 text_builder.text('\n\n📖 ')
                 text_builder.text(summarized_blog_post)
@@ -479,8 +523,46 @@ class PromoteBlogPost():
                 text_builder.tag(f"#{tag_clean} ", tag_clean)
         return text_builder
 
-    def build_post(self, entry, feed):
-        """Take the entry dict and build a post"""
+    async def fetch_post_parts(self, entry, platform_user_handle, adapter):
+        """
+        Resolve the Bluesky DID and summarize the entry concurrently.
+
+        Returns:
+            tuple: (did, summarized_blog_post), each None if not needed.
+        """
+        platform_user_handle = self.check_platform_handle(
+            platform_user_handle or ''
+        )
+
+        async def no_result():
+            return None
+
+        did, summarized_blog_post = await asyncio.gather(
+            self.resolve_did(platform_user_handle, adapter)
+            if adapter.platform == 'bluesky' and platform_user_handle
+            else no_result(),
+            asyncio.to_thread(self.summarize_text, entry)
+            if self.config_dict.get('gen_ai_support', None)
+            else no_result(),
+            return_exceptions=True
+        )
+        if isinstance(did, Exception):
+            self.logger.info('DID could not be resolved: %s', did)
+            did = None
+        if isinstance(summarized_blog_post, Exception):
+            self.logger.info(
+                'Summary could not be generated: %s',
+                summarized_blog_post
+            )
+            summarized_blog_post = ''
+        return did, summarized_blog_post
+
+    def build_post(self, entry, feed, did=None, summarized_blog_post=None):
+        """
+        Take the entry dict and build a post. The DID and the summary are
+        looked up unless they were already passed in (see
+        `fetch_post_parts`).
+        """
 
         tags = self.define_tags(entry)
         platform = self.config_dict.get('platform', '')
@@ -502,134 +584,135 @@ class PromoteBlogPost():
                 basis_text,
                 platform_user_handle,
                 tags,
-                entry
+                entry,
+                summarized_blog_post=summarized_blog_post
             )
         elif self.config_dict.get('platform', '') == 'bluesky':
             return self.build_post_bluesky(
                 basis_text,
                 platform_user_handle,
                 tags,
-                entry
+                entry,
+                did=did,
+                summarized_blog_post=summarized_blog_post
             )
 
-    def send_post_to_mastodon(self, en, client, post_txt):
+    async def upload_media(self, en, adapter):
         """
-        Send post to Mastodon.
+        Download the entry's image and upload it to the platform.
+
+        Returns:
+            The media to attach (see `PlatformAdapter.upload_media`) or
+            None if there is no (usable) image.
         """
         media_content = en.get('media_content', None)
-        alt_text = en.get('alt_text', None)
-
-        if media_content:
-            try:
-                self.logger.info('Uploading media to mastodon')
-                filename = self.download_image(media_content)
-                media_upload_mastodon = client.media_post(filename)
-
-                if alt_text:
-                    self.logger.info('Adding description')
-                    client.media_update(media_upload_mastodon,
-                                        description=alt_text)
-
-                self.logger.info('Now ready to post... ⏳')
-                client.status_post(post_txt, media_ids=media_upload_mastodon)
-
-                self.logger.info('Posted 🎉')
-                return 'success'
-            except Exception as e:
-                self.logger.exception(
-                    'Urg, media could not be printed for %s. Exception: %s',
-                    en.get('link', 'unknown link'),
-                    e)
-                client.status_post(post_txt)
-                self.logger.info('Posted post without image.')
-                return 'failed'
-        else:
-            try:
-                client.status_post(post_txt)
-                self.logger.info('Posted 🎉')
-                return 'success'
-            except Exception as e:
-                self.logger.exception(
-                    'Urg, exception %s for %s',
-                    e,
-                    en.get('link', 'unknown link')
-                )
-                return 'failed'
+        if not media_content:
+            return None
 
-    def send_post_to_bluesky(self, en, client, post_txt, embed_external):
-        """
-        Send post to Bluesky.
-        """
         try:
-            if embed_external:
-                client.send_post(text=post_txt, embed=embed_external)
-            else:
-                client.send_post(text=post_txt)
-            self.logger.info("Posted 🎉")
-            return 'success'
+            self.logger.info('Uploading media to %s', adapter.platform)
+            filename = await asyncio.to_thread(
+                self.download_image,
+                media_content
+            )
+            if not filename:
+                return None
+            self.record_image_link(filename, en['link'])
+            return await adapter.upload_media(
+                filename,
+                description=en.get('alt_text') or en['title'],
+                link=en['link'],
+                title=en['title']
+            )
         except Exception as e:
-            self.logger.exception("Urg, exception %s for %s", e, en['link'])
-            return 'failed'
+            self.logger.exception(
+                'Urg, media could not be uploaded for %s. Exception: %s',
+                en.get('link', 'unknown link'),
+                e)
+            return None
 
-    def build_embed_external(self, en, client):
+    async def send_post(self, en, feed, adapter):
         """
-        Build embed external. This is a speciality of Bluesky's protocol.
-        """
-        if en['media_content']:
-            filename = self.download_image(en['media_content'])
-            with open(filename, 'rb') as f:
-                img_data = f.read()
-
-            thumb = client.upload_blob(img_data)
+        Turn the dict into post text and send the post.
 
-            return models.AppBskyEmbedExternal.Main(
-                external=models.AppBskyEmbedExternal.External(
-                    title=en['title'],
-                    description=en['title'],
-                    uri=en['link'],
-                    thumb=thumb.blob,
-                )
-            )
-        return None
+        The image download/upload, the DID lookup and the summary run
+        concurrently and are joined before the post is sent. If the post
+        cannot be sent with the image, it is sent without it.
 
-    def send_post(self, en, feed, client):
-        """Turn the dict into post text and send the post"""
-        result = None
+        Returns:
+            str: 'success' if the post (with or without the image) was
+                sent, otherwise 'failed'.
+        """
         self.logger.info(
             "Preparing the post on %s "
             "(%s) ...",
             self.config_dict['client_name'],
-            {self.config_dict['platform']}
+            self.config_dict['platform']
         )
 
+        platform_user_handle = feed.get(self.config_dict.get('platform', ''))
+        media, (did, summarized_blog_post) = await asyncio.gather(
+            self.upload_media(en, adapter),
+            self.fetch_post_parts(en, platform_user_handle, adapter)
+        )
         post_txt = self.build_post(
             en,
-            feed
+            feed,
+            did=did,
+            summarized_blog_post=summarized_blog_post
         )
-        if self.config_dict["platform"] == "mastodon":
-            result = self.send_post_to_mastodon(
-                en,
-                client,
-                post_txt
-            )
-        elif self.config_dict["platform"] == "bluesky":
-            embed_external = self.build_embed_external(
-                en,
-                client
+
+        try:
+            self.logger.info('Now ready to post... ⏳')
+            await adapter.post(post_txt, media)
+            self.logger.info('Posted 🎉')
+            return 'success'
+        except Exception as e:
+            self.logger.exception(
+                'Urg, exception %s for %s',
+                e,
+                en.get('link', 'unknown link')
             )
-            result = self.send_post_to_bluesky(
-                en,
-                client,
-                post_txt,
-                embed_external
+            if not media:
+                return 'failed'
+        try:
+            await adapter.post(post_txt)
+            self.logger.info('Posted post without image.')
+            return 'success'
+        except Exception as e:
+            self.logger.exception(
+                'Urg, exception %s for %s',
+                e,
+                en.get('link', 'unknown link')
             )
-        return result
+        return 'failed'
 
     @staticmethod
-    def load_feed(feed_path, d):
-        """Method to load RSS feed"""
-        full_fpd = feedparser.parse(feed_path)
-        return d + full_fpd.entries
+    def load_feed(feed_path, d, max_bytes=None, max_entries=None):
+        """
+        Method to load RSS feed.
+
+        If `max_bytes` or `max_entries` is set, the feed is streamed and
+        only its first (newest) complete entries are parsed. Feeds are
+        parsed with the lxml fast path and fall back to feedparser.
+        """
+        body = fetch_feed_bounded(feed_path, max_bytes, max_entries)
+        entries = parse_feed(body, feed_path)
+        if max_entries:
+            entries = entries[:max_entries]
+        return d + entries
+
+    @staticmethod
+    def _has_unseen_entries(d, rss_feed_archive):
+        """
+        Check whether any loaded entry is not yet in the archive. Used
+        instead of comparing counts when the feed was truncated.
+        """
+        archive_links = set(rss_feed_archive['link'])
+        return any(
+            entry.get('link') not in archive_links
+            for entry in d
+        )
 
     @staticmethod
     def get_rss_feed_archive(feed):
@@ -717,7 +800,7 @@ class PromoteBlogPost():
         feed['ARCHIVE'] = archive_paths
         return feed
 
-    def process_feed(self, feed, count_post, client):
+    def process_feed(self, feed, count_post, adapter):
         """
         Process the RSS feed and generate a post for any entry
         we haven't yet seen.
@@ -742,7 +825,12 @@ class PromoteBlogPost():
             #     feed_path = f"https://medium.com/feed/@{subdomain}"
             # # Load the feed
             try:
-                d = self.load_feed(feed_path, d)
+                d = self.load_feed(
+                    feed_path,
+                    d,
+                    self.config_dict.get('feed_max_bytes'),
+                    self.config_dict.get('feed_max_entries')
+                )
                 rss_feed_archive = self.get_rss_feed_archive(feed)
                 # Identify number of entries
                 (
@@ -759,9 +847,20 @@ class PromoteBlogPost():
                     'd': d
                 }
 
-                if number_of_entries_feed > number_of_entries_archive:
+                if (self.config_dict.get('feed_max_bytes')
+                        or self.config_dict.get('feed_max_entries')):
+                    has_new_entries = self._has_unseen_entries(
+                        d,
+                        rss_feed_archive
+                    )
+                else:
+                    has_new_entries = (
+                        number_of_entries_feed > number_of_entries_archive
+                    )
+
+                if has_new_entries:
                     count_post = self._process_feed(
-                        client,
+                        adapter,
                         count_post,
                         feed_config
                     )
@@ -818,7 +917,7 @@ class PromoteBlogPost():
 
     def _process_feed(
         self,
-        client,
+        adapter,
         count_post,
         feed_config
     ):
@@ -850,14 +949,14 @@ class PromoteBlogPost():
             if en['link'] not in feed_config['rss_feed_archive']['link']:
                 feed_config['rss_feed_archive']['link'].append(en['link'])
                 if self.no_dry_run:
-                    result = self.send_post(en, feed_config['feed'], client)
+                    result = self.runner.run(
+                        self.send_post(en, feed_config['feed'], adapter)
+                    )
                 if result == 'success':
                     count_post += 1
                     count += 1
-                    time.sleep(1)
                 elif result == 'failed':
                     count_fails += 1
-                    time.sleep(1)
 
         if self.no_dry_run:
             if result == 'success':
@@ -870,8 +969,13 @@ class PromoteBlogPost():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     promote_blog_post_handler = PromoteBlogPost(
         config_dict=None,
         no_dry_run=True
     )
-    promote_blog_post_handler.promote_blog_post()
+    with profiled("promote_blog_post", args.profile, args.profile_dir):
+        promote_blog_post_handler.promote_blog_post()
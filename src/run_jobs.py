@@ -0,0 +1,254 @@
+"""
+Module to run several bot jobs in one process.
+
+Every workflow runs one job of one bot in a fresh interpreter, so each
+run pays the start-up, the imports and a login. This runner takes a list
+of jobs and bots from `metadata/jobs.json` and runs them one after the
+other in a single process:
+
+- each job gets the environment its workflow would set (the `env` of the
+  bot plus the `env` of the job, with `${VAR}` taken from the process
+  environment), so the bots read their configuration as usual;
+- logins are cached per account by the login helpers, so every account
+  logs in once and its HTTP connection pool and rate limiter are shared
+  by all of its jobs;
+- a failing job is logged and reported, but does not stop the others.
+
+Usage (from the repository root):
+
+    python src/run_jobs.py --list
+    python src/run_jobs.py                               # all jobs
+    python src/run_jobs.py --jobs boost_tags boost_mentions
+    python src/run_jobs.py --jobs promote_blog --bots rladies_bluesky
+    python src/run_jobs.py --community pyladies      # one community
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from string import Template
+
+from dotenv import load_dotenv
+
+from helper.login_bluesky import logged_in as bluesky_logins
+from helper.login_mastodon import logged_in as mastodon_logins
+from helper.profiling import (
+    add_profile_arguments,
+    profile_scope,
+    profile_stage,
+    profiled,
+)
+
+load_dotenv()
+
+JOBS_FILE = Path('metadata/jobs.json')
+
+# Job type -> (module, class, method)
+JOB_TYPES = {
+    'rss': ('get_rss_data', 'RSSData', 'get_rss_data'),
+    'boost_tags': ('boost_tags', 'BoostTags', 'boost_tags'),
+    'boost_mentions': ('boost_mentions', 'BoostMentions', 'boost_mentions'),
+    'promote_blog': ('promote_blog_post', 'PromoteBlogPost',
+                     'promote_blog_post'),
+    'anniversaries': ('promote_anniversaries', 'PromoteAnniversary',
+                      'promote_anniversary'),
+}
+
+
+@contextmanager
+def job_environment(env: dict):
+    """Set environment variables for the duration of a job."""
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class JobRunner:
+    """
+    Class to run the jobs of `metadata/jobs.json` in one process.
+    """
+    def __init__(self, jobs_file=JOBS_FILE):
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+        with open(jobs_file, encoding='utf-8') as f:
+            jobs_config = json.load(f)
+        self.bots = jobs_config.get('bots', {})
+        self.jobs = [
+            {
+                **job,
+                'name': job.get('name') or f"{job['bot']}_{job['job']}",
+            }
+            for job in jobs_config.get('jobs', [])
+        ]
+
+    @staticmethod
+    def community(job: dict) -> str:
+        """
+        Community of a job: the prefix of its bot ('rladies_bluesky') or,
+        for jobs without a bot, of its name ('rladies_rss').
+        """
+        return (job.get('bot') or job['name']).split('_', 1)[0]
+
+    def select_jobs(self, job_filter=None, bot_filter=None,
+                    community=None) -> list:
+        """
+        Jobs matching the filters, in the order of the jobs file.
+
+        Args:
+            job_filter (list[str] | None): Job types or job names.
+            bot_filter (list[str] | None): Bots; jobs without a bot (e.g.
+                'rss') are selected if a bot of their community is.
+            community (str | None): Only jobs of this community.
+
+        Returns:
+            list[dict]: Selected jobs.
+        """
+        bot_communities = {
+            self.community({'bot': bot}) for bot in bot_filter or []
+        }
+        return [
+            job for job in self.jobs
+            if (not job_filter
+                or job['job'] in job_filter or job['name'] in job_filter)
+            and (not bot_filter
+                 or job.get('bot') in bot_filter
+                 or (not job.get('bot')
+                     and self.community(job) in bot_communities))
+            and (not community or self.community(job) == community)
+        ]
+
+    def environment(self, job: dict) -> dict:
+        """
+        Environment of a job: the bot's and the job's variables with
+        `${VAR}` substituted from the process environment.
+
+        Raises:
+            KeyError: If a referenced variable is not set.
+        """
+        env = {**self.bots.get(job.get('bot'), {}), **job.get('env', {})}
+        return {
+            name: Template(value).substitute(os.environ)
+            for name, value in env.items()
+        }
+
+    def run_job(self, job: dict) -> dict:
+        """
+        Run a single job, catching its errors.
+
+        Returns:
+            dict: The job 'name', whether it succeeded ('ok'), its
+                duration in 'seconds' and the 'error' if it failed.
+        """
+        self.logger.info("========================================")
+        self.logger.info(" > Running job %s", job['name'])
+        start = time.perf_counter()
+        error = None
+        try:
+            env = self.environment(job)
+        except KeyError as e:
+            env = None
+            error = f"environment variable {e} is not set"
+        if job['job'] not in JOB_TYPES:
+            error = f"unknown job type '{job['job']}'"
+
+        if error is None:
+            module_name, class_name, method_name = JOB_TYPES[job['job']]
+            try:
+                with job_environment(env), profile_scope(job['name']):
+                    profile_stage("setup")
+                    module = importlib.import_module(module_name)
+                    bot = getattr(module, class_name)(
+                        config_dict=None,
+                        no_dry_run=True
+                    )
+                    getattr(bot, method_name)()
+            # A job must not take the other jobs down with it
+            except (Exception, SystemExit) as e:  # pylint: disable=broad-except
+                error = f"{type(e).__name__}: {e}"
+                self.logger.exception(" > Job %s failed", job['name'])
+
+        seconds = time.perf_counter() - start
+        if error:
+            self.logger.error(" > Job %s failed: %s", job['name'], error)
+        return {
+            'name': job['name'],
+            'ok': error is None,
+            'seconds': seconds,
+            'error': error,
+        }
+
+    def run(self, jobs: list) -> list:
+        """Run jobs one after the other and log a summary."""
+        start = time.perf_counter()
+        results = [self.run_job(job) for job in jobs]
+        profile_stage("report")
+        self.report(results, time.perf_counter() - start)
+        return results
+
+    def report(self, results: list, seconds: float) -> None:
+        """Log the outcome and duration of every job."""
+        self.logger.info("========================================")
+        for result in results:
+            self.logger.info(
+                " %s %-32s %6.1f s%s",
+                '✅' if result['ok'] else '🚨',
+                result['name'],
+                result['seconds'],
+                f" ({result['error']})" if result['error'] else ''
+            )
+        self.logger.info(
+            " > %s of %s jobs succeeded in %.1f s with %s logins",
+            sum(result['ok'] for result in results),
+            len(results),
+            seconds,
+            len(bluesky_logins()) + len(mastodon_logins())
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--jobs",
+        nargs="+",
+        help=f"Job types ({', '.join(JOB_TYPES)}) or job names to run",
+    )
+    parser.add_argument("--bots", nargs="+", help="Bots to run the jobs for")
+    parser.add_argument(
+        "--community",
+        help="Only run the jobs of this community (e.g. rladies)",
+    )
+    parser.add_argument("--jobs-file", default=JOBS_FILE)
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List the selected jobs without running them",
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    runner = JobRunner(args.jobs_file)
+    selected = runner.select_jobs(args.jobs, args.bots, args.community)
+    if args.list:
+        for selected_job in selected:
+            print(selected_job['name'])
+        sys.exit(0)
+
+    with profiled("run_jobs", args.profile, args.profile_dir):
+        job_results = runner.run(selected)
+    sys.exit(0 if all(result['ok'] for result in job_results) else 1)
@@ -0,0 +1,262 @@
+"""
+Module to keep the bots running in one long-lived process.
+
+Instead of a workflow per job and schedule, the scheduler runs the jobs
+of `metadata/jobs.json` (see run_jobs.py) on their `schedule`, a cron
+expression evaluated in UTC like the workflow crons. Between runs the
+process stays resident, so logins, HTTP connection pools, rate limiters
+and caches stay warm:
+
+- the time of every job run is persisted to the state directory after
+  the job, so a restarted scheduler continues where it stopped (runs
+  missed while it was down are caught up once);
+- in-memory caches are bounded (see `DID_CACHE_SIZE` in config.py), the
+  logged in clients are dropped after a failed job so the next run logs
+  in again, and with `--max-rss-mb` the scheduler exits once its memory
+  exceeds the limit, to be restarted by its supervisor (systemd,
+  Docker's restart policy, ...);
+- `--simulate HOURS` advances a virtual clock instead of waiting and only
+  logs which jobs would run, to check the schedule.
+
+Usage (from the repository root):
+
+    python src/scheduler.py
+    python src/scheduler.py --jobs boost_tags boost_mentions --max-rss-mb 300
+    python src/scheduler.py --simulate 48 --start 2025-03-01T00:00
+"""
+import argparse
+import gc
+import logging
+import resource
+import signal
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+from helper.cron import CronSchedule
+from helper.login_bluesky import forget_clients as forget_bluesky_clients
+from helper.login_mastodon import forget_clients as forget_mastodon_clients
+from helper.state_store import load_state, save_state
+from run_jobs import JOBS_FILE, JobRunner
+
+STATE_NAME = 'scheduler'
+MAX_SLEEP = 60  # seconds; wake up regularly to notice a stop request
+
+
+class SystemClock:
+    """Wall clock (UTC)."""
+    @staticmethod
+    def now() -> datetime:
+        """Current time."""
+        return datetime.now(timezone.utc)
+
+    @staticmethod
+    def sleep(seconds: float, stop_event: threading.Event) -> None:
+        """Wait `seconds` or until `stop_event` is set."""
+        stop_event.wait(seconds)
+
+
+class VirtualClock:
+    """
+    Clock that only moves when it is advanced, to run the schedule of
+    days in an instant.
+
+    Args:
+        start (datetime): Initial time (naive times are taken as UTC).
+    """
+    def __init__(self, start: datetime):
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        self.current = start
+
+    def now(self) -> datetime:
+        """Current virtual time."""
+        return self.current
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward."""
+        self.current += timedelta(seconds=seconds)
+
+    def sleep(self, seconds: float, _stop_event=None) -> None:
+        """Advance the clock instead of waiting."""
+        self.advance(seconds)
+
+
+def max_rss_mb() -> float:
+    """Peak resident memory of the process in MB."""
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Scheduler:
+    """
+    Class to run jobs on their cron schedule.
+
+    Args:
+        runner (JobRunner): Runner executing the jobs.
+        jobs (list[dict]): Jobs with a 'schedule'.
+        clock: `SystemClock` or `VirtualClock`.
+        execute: Callable running a job and returning its result (by
+            default `runner.run_job`).
+        max_rss (float | None): Memory limit in MB.
+        state_name (str | None): State the run times are persisted to
+            (None keeps them in memory only).
+    """
+    def __init__(self, runner, jobs, clock=None, execute=None,
+                 max_rss=None, state_name=STATE_NAME):
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+
+        self.clock = clock or SystemClock()
+        self.execute = execute or runner.run_job
+        self.max_rss = max_rss
+        self.jobs = [job for job in jobs if job.get('schedule')]
+        self.schedules = {
+            job['name']: CronSchedule(job['schedule']) for job in self.jobs
+        }
+        self.state_name = state_name
+        self.state = load_state(state_name) if state_name else {}
+
+        started = self.clock.now()
+        self.next_runs = {}
+        for job in self.jobs:
+            last_run = self.state.get(job['name'], {}).get('last_run')
+            reference = (
+                datetime.fromisoformat(last_run) if last_run else started
+            )
+            self.next_runs[job['name']] = (
+                self.schedules[job['name']].next_after(reference)
+            )
+
+    def run_pending(self) -> list:
+        """
+        Run every job that is due, one after the other.
+
+        Returns:
+            list[dict]: Results of the jobs that ran.
+        """
+        results = []
+        for job in self.jobs:
+            now = self.clock.now()
+            if self.next_runs[job['name']] > now:
+                continue
+
+            result = self.execute(job)
+            results.append(result)
+            self.state[job['name']] = {
+                'last_run': now.isoformat(),
+                'ok': result['ok'],
+            }
+            if self.state_name:
+                save_state(self.state_name, self.state)
+            self.next_runs[job['name']] = (
+                self.schedules[job['name']].next_after(now)
+            )
+            if not result['ok']:
+                # The session may be the reason; log in again next time
+                forget_bluesky_clients()
+                forget_mastodon_clients()
+            gc.collect()
+            self.logger.info(
+                " > Next run of %s at %s (peak memory %.0f MB)",
+                job['name'],
+                self.next_runs[job['name']].isoformat(),
+                max_rss_mb()
+            )
+        return results
+
+    def over_memory_limit(self) -> bool:
+        """True if the process grew beyond `max_rss`."""
+        return self.max_rss is not None and max_rss_mb() > self.max_rss
+
+    def run_forever(self, stop_event=None, until=None) -> None:
+        """
+        Run jobs when they are due until `stop_event` is set, the clock
+        reaches `until` or the memory limit is exceeded.
+        """
+        stop_event = stop_event or threading.Event()
+        if not self.jobs:
+            self.logger.warning(" > No scheduled jobs selected")
+            return
+        self.logger.info(" > Scheduling %s jobs", len(self.jobs))
+
+        while not stop_event.is_set():
+            self.run_pending()
+            if self.over_memory_limit():
+                self.logger.warning(
+                    " > Peak memory %.0f MB exceeds %.0f MB, stopping",
+                    max_rss_mb(),
+                    self.max_rss
+                )
+                return
+
+            now = self.clock.now()
+            if until is not None and now >= until:
+                return
+            wake_up = min(self.next_runs.values())
+            if until is not None:
+                wake_up = min(wake_up, until)
+            seconds = (wake_up - now).total_seconds()
+            if isinstance(self.clock, SystemClock):
+                seconds = min(seconds, MAX_SLEEP)
+            self.clock.sleep(max(seconds, 0), stop_event)
+
+
+def simulate(job, clock):
+    """Log a job instead of running it (`--simulate`)."""
+    logging.getLogger(__name__).info(
+        " > %s  %s", clock.now().strftime('%a %Y-%m-%d %H:%M'), job['name']
+    )
+    return {'name': job['name'], 'ok': True, 'seconds': 0.0, 'error': None}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--jobs", nargs="+",
+                        help="Job types or job names to schedule")
+    parser.add_argument("--bots", nargs="+",
+                        help="Bots to schedule the jobs for")
+    parser.add_argument("--jobs-file", default=JOBS_FILE)
+    parser.add_argument("--max-rss-mb", type=float,
+                        help="Stop once the peak memory exceeds this")
+    parser.add_argument(
+        "--simulate",
+        type=float,
+        metavar="HOURS",
+        help="Advance a virtual clock by HOURS and log the job runs",
+    )
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        help="Start of the simulation (UTC, default: now)",
+    )
+    args = parser.parse_args()
+
+    job_runner = JobRunner(args.jobs_file)
+    selected = job_runner.select_jobs(args.jobs, args.bots)
+
+    if args.simulate:
+        virtual_clock = VirtualClock(args.start or SystemClock.now())
+        scheduler = Scheduler(
+            job_runner,
+            selected,
+            clock=virtual_clock,
+            execute=lambda job: simulate(job, virtual_clock),
+            state_name=None
+        )
+        scheduler.run_forever(
+            until=virtual_clock.now() + timedelta(hours=args.simulate)
+        )
+        sys.exit(0)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    scheduler = Scheduler(job_runner, selected, max_rss=args.max_rss_mb)
+    scheduler.run_forever(stop)
+    # A non-zero exit lets the supervisor restart a scheduler that
+    # outgrew its memory limit
+    sys.exit(1 if scheduler.over_memory_limit() else 0)